@@ -50,13 +50,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'student_assistance_system.instrumentation.QueryInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'SAS.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'student_assistance_system.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -106,6 +107,80 @@ AUTH_PASSWORD_VALIDATORS = [
 LOGIN_REDIRECT_URL = '/'
 
 
+# Cache
+# https://docs.djangoproject.com/en/1.10/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'student-assistance-system',
+    }
+}
+
+# Seconds for which degree audits are cached. They are also invalidated whenever their inputs change.
+
+SAS_AUDIT_CACHE_TIMEOUT = 60 * 60
+
+# Seconds for which the facet counts of a search are cached. They are also invalidated whenever the catalog changes.
+
+SAS_FACET_CACHE_TIMEOUT = 10 * 60
+
+# Seconds for which rendered schedule and requirement fragments are cached. They are also invalidated whenever
+# the schedule, the student's courses, the requirements or the catalog change.
+
+SAS_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Seconds after which each process reloads its snapshot of the open seats in every section. Enrollment changes
+# made by a process are applied to its own snapshot at once, so this bounds how stale the others can be.
+
+SAS_AVAILABILITY_MAX_AGE = 5
+
+
+# Logging
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'student_assistance_system.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'student_assistance_system.availability': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+# Fraction of requests whose queries are recorded and logged when DEBUG is off
+
+SAS_QUERY_SAMPLE_RATE = 0.0
+
+# Maximum number of SQL queries issued by each view, by URL name, once its cached fragments, audits and facets
+# are warm. Each is one above the most the view issues in the test suite, which fails when they are exceeded.
+
+SAS_QUERY_BUDGETS = {
+    'index': 8,
+    'view_schedule': 8,
+    'edit_schedule': 8,
+    'generate_schedule': 9,
+    'degree_plan': 7,
+    'view_section': 9,
+    'profile': 9,
+    'search': 5,
+    'courses': 10,
+    'api_sections': 5,
+    'api_schedule': 8,
+    'api_audit': 13,
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.10/topics/i18n/
 
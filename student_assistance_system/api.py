@@ -0,0 +1,255 @@
+from __future__ import unicode_literals
+
+import hashlib
+import json
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils import six
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.http import condition
+
+from . import prereqs
+from .audit import REQUIREMENTS_VERSION_KEY, RequirementAuditor, get_versions, profile_version_key
+from .enrollment import SEATS_VERSION_KEY, EnrollmentError, drop, enroll, enrollment_status
+from .facets import VERSION_KEY as CATALOG_VERSION_KEY
+from .models import ScheduleChangeError, Section
+from .pagination import CursorPaginator, InvalidCursor
+from .views import CURSOR_ORDERING, IndexView, SearchResultsView
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_SUGGESTIONS = 20
+
+
+def api_login_required(view):
+    """
+    Like login_required, but answers anonymous requests with a 401 instead of redirecting them to the login page
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error('Authentication required', 401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def error(message, status):
+    return JsonResponse(dict(error=message), status=status)
+
+
+def is_id_list(value):
+    """
+    :return: Whether a value decoded from JSON is a list of integers
+    """
+    return isinstance(value, list) and all(isinstance(pk, six.integer_types) and not isinstance(pk, bool)
+                                           for pk in value)
+
+
+def section_json(section):
+    course = section.course
+    return dict(id=section.pk, course_id=course.pk, department=course.department.abbr_name,
+                number=course.course_number, name=course.name, credit_hours=course.credit_hours,
+                professor=section.professor, location=section.location, enrolled=section.enrolled,
+                capacity=section.capacity, times=section.condensed_meeting_times())
+
+
+def schedule_json(schedule):
+    sections = schedule.sections.select_related('course__department').prefetch_related('meeting_times')
+    return dict(id=schedule.pk, name=schedule.name, updated=schedule.updated.isoformat(),
+                sections=[section_json(section) for section in sections])
+
+
+def schedule_state(request, schedule_id, version_keys=()):
+    """
+    Looks up when one of the user's schedules was last updated, along with the versions of everything else its
+    responses show, once per request
+    :return: An (updated, versions) pair, or None if the user has no such schedule
+    """
+    cache_attr = '_schedule_state_%s_%s' % (schedule_id, '.'.join(version_keys))
+    if not hasattr(request, cache_attr):
+        updated = request.user.profile.schedule_set.filter(pk=schedule_id).values_list('updated', flat=True).first()
+        keys = [profile_version_key(request.user.profile.pk), REQUIREMENTS_VERSION_KEY, CATALOG_VERSION_KEY]
+        setattr(request, cache_attr, (updated, get_versions(keys + list(version_keys))) if updated else None)
+    return getattr(request, cache_attr)
+
+
+def state_etag(state, name):
+    if state is not None:
+        updated, versions = state
+        return hashlib.md5(('%s:%s:%s' % (name, updated.isoformat(), ':'.join(str(version) for version in versions)))
+                           .encode('utf-8')).hexdigest()
+
+
+def schedule_etag(request, schedule_id):
+    return state_etag(schedule_state(request, schedule_id, [SEATS_VERSION_KEY]), 'schedule')
+
+
+def audit_etag(request, schedule_id):
+    # Seats are only shown by suggestions
+    version_keys = [prereqs.VERSION_KEY] + ([SEATS_VERSION_KEY] if request.GET.get('suggestions') else [])
+    return state_etag(schedule_state(request, schedule_id, version_keys), 'audit:%s' % request.GET.urlencode())
+
+
+@method_decorator(api_login_required, name='dispatch')
+class SectionSearchApiView(View):
+    """
+    Searches sections with the parameters of the search results page, a page of results at a time. Pages are
+    selected with the cursors of earlier responses.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            return error('limit must be a number', 400)
+        sections = SearchResultsView(request=request).get_queryset()
+        try:
+            page = CursorPaginator(sections, CURSOR_ORDERING, limit).page(request.GET.get('cursor'))
+        except InvalidCursor:
+            return error('Invalid cursor', 400)
+        return JsonResponse(dict(sections=[section_json(section) for section in page], next=page.next_cursor,
+                                 previous=page.previous_cursor))
+
+
+@method_decorator(api_login_required, name='dispatch')
+class ScheduleApiView(View):
+    # Seats and catalog details change without touching Schedule.updated, so only the ETag can tell them apart
+    @method_decorator(condition(etag_func=schedule_etag))
+    def get(self, request, schedule_id, *args, **kwargs):
+        schedule = request.user.profile.schedule_set.filter(pk=schedule_id).first()
+        if schedule is None:
+            return error('No such schedule', 404)
+        return JsonResponse(schedule_json(schedule))
+
+
+@method_decorator(api_login_required, name='dispatch')
+class ScheduleSectionApiView(View):
+    """
+    Adds sections to a schedule with POST, and removes them with DELETE. Both respond with the updated schedule.
+    """
+
+    def change(self, request, schedule_id, section_id, add):
+        schedule = request.user.profile.schedule_set.filter(pk=schedule_id).first()
+        section = Section.objects.filter(pk=section_id).first() if section_id else None
+        if schedule is None or section is None:
+            return error('No such schedule' if schedule is None else 'No such section', 404)
+        if add:
+            schedule.add_section(section)
+        else:
+            schedule.delete_section(section)
+        response = JsonResponse(schedule_json(schedule))
+        response['ETag'] = '"%s"' % schedule_etag(request, schedule_id)
+        return response
+
+    def post(self, request, schedule_id, *args, **kwargs):
+        section_id = request.POST.get('section')
+        if section_id and not section_id.isdigit():
+            return error('section must be an id', 400)
+        return self.change(request, schedule_id, section_id, True)
+
+    def delete(self, request, schedule_id, section_id, *args, **kwargs):
+        return self.change(request, schedule_id, section_id, False)
+
+
+@method_decorator(api_login_required, name='dispatch')
+class ScheduleBatchApiView(View):
+    """
+    Applies a list of section adds and removes to a schedule at once, with Schedule.change_sections. The ids are
+    given as repeated add and remove parameters, or as lists in a JSON body. Responds with the updated schedule,
+    or with the ids of the sections at fault if the changes cannot be made.
+    """
+
+    def post(self, request, schedule_id, *args, **kwargs):
+        schedule = request.user.profile.schedule_set.filter(pk=schedule_id).first()
+        if schedule is None:
+            return error('No such schedule', 404)
+        try:
+            if request.content_type == 'application/json':
+                changes = json.loads(request.body.decode('utf-8'))
+                add, remove = changes.get('add', []), changes.get('remove', [])
+                # Strings would otherwise be taken apart into digits
+                if not (is_id_list(add) and is_id_list(remove)):
+                    raise ValueError
+            else:
+                add, remove = request.POST.getlist('add'), request.POST.getlist('remove')
+            add, remove = [int(pk) for pk in add], [int(pk) for pk in remove]
+        except (ValueError, TypeError, AttributeError):
+            return error('add and remove must be lists of section ids', 400)
+        try:
+            schedule.change_sections(add, remove)
+        except ScheduleChangeError as e:
+            return JsonResponse(dict(error='%s' % e, reason=e.reason, sections=e.section_ids),
+                                status=400 if e.reason == 'missing' else 409)
+        response = JsonResponse(schedule_json(schedule))
+        response['ETag'] = '"%s"' % schedule_etag(request, schedule_id)
+        return response
+
+
+@method_decorator(api_login_required, name='dispatch')
+class SectionEnrollmentApiView(View):
+    """
+    The user's enrollment in a section. POST enrolls the user, or puts them on the waitlist if the section is
+    full, and DELETE drops the section or leaves its waitlist. All respond with the user's enrollment status.
+    """
+
+    def status(self, request, section_id):
+        section = Section.objects.filter(pk=section_id).values('enrolled', 'capacity').first()
+        if section is None:
+            return error('No such section', 404)
+        status, position = enrollment_status(request.user.profile, section_id)
+        return JsonResponse(dict(section=int(section_id), status=status, waitlist_position=position, **section))
+
+    def get(self, request, section_id, *args, **kwargs):
+        return self.status(request, section_id)
+
+    def post(self, request, section_id, *args, **kwargs):
+        try:
+            enroll(request.user.profile, int(section_id))
+        except EnrollmentError as e:
+            return JsonResponse(dict(error='%s' % e, reason=e.reason), status=404 if e.reason == 'missing' else 409)
+        return self.status(request, section_id)
+
+    def delete(self, request, section_id, *args, **kwargs):
+        try:
+            drop(request.user.profile, int(section_id))
+        except EnrollmentError as e:
+            return JsonResponse(dict(error='%s' % e, reason=e.reason), status=409)
+        return self.status(request, section_id)
+
+
+@method_decorator(api_login_required, name='dispatch')
+class AuditApiView(View):
+    """
+    Audits the user's requirements against a schedule. Unfulfilled requirements come with up to the number of
+    suggested sections given by the suggestions parameter.
+    """
+
+    def requirement_json(self, result, schedule, limit, completed):
+        requirement = dict(id=result.requirement.pk, name=result.requirement.name, status=result.status,
+                           courses=[dict(id=course.pk, name=course.name, status=status)
+                                    for course, status in result.course_statuses.items()])
+        if limit and result.status == 'U':
+            requirement['suggestions'] = [section_json(section) for section in result.requirement.get_course_suggestions(
+                result.course_statuses, schedule, limit, completed)]
+        return requirement
+
+    # Audits also change with the student's courses and the requirements, which Schedule.updated does not follow
+    @method_decorator(condition(etag_func=audit_etag))
+    def get(self, request, schedule_id, *args, **kwargs):
+        profile = request.user.profile
+        schedule = profile.schedule_set.filter(pk=schedule_id).first()
+        if schedule is None:
+            return error('No such schedule', 404)
+        try:
+            limit = min(max(int(request.GET.get('suggestions', 0)), 0), MAX_SUGGESTIONS)
+        except ValueError:
+            return error('suggestions must be a number', 400)
+        audit = RequirementAuditor(profile, schedule).cached_audit(IndexView().get_requirement_sets(profile))
+        # Suggestions are only offered for courses the user has the prerequisites for
+        completed = set(profile.completedcourse_set.values_list('course_id', flat=True)) if limit else None
+        return JsonResponse(dict(schedule=schedule.pk, requirement_sets=[
+            dict(id=req_set.pk, type=req_set.type_name(), name=req_set.name,
+                 requirements=[self.requirement_json(result, schedule, limit, completed) for result in results])
+            for req_set, results in audit]))
@@ -5,3 +5,8 @@ from django.apps import AppConfig
 
 class StudentAssistanceSystemConfig(AppConfig):
     name = 'student_assistance_system'
+
+    def ready(self):
+        # Connects the signals that keep the search index, cached audits and facet counts, prerequisite graph,
+        # cross-listing classes and seat availability snapshot up to date
+        from . import audit, availability, crosslistings, facets, prereqs, search
@@ -0,0 +1,200 @@
+from __future__ import unicode_literals
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import (CompletedCourse, Course, Profile, Requirement, RequirementCourse, RequirementSet, Schedule,
+                     Section, UserMajor)
+
+REQUIREMENTS_VERSION_KEY = 'audit:requirements'
+
+
+def profile_version_key(profile_id):
+    return 'audit:profile:%d' % profile_id
+
+
+def get_versions(keys):
+    """
+    Gets the current values of audit version counters, starting missing ones from the current time so that
+    a counter that was evicted from the cache never returns to a value used before
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, int(time.time() * 1000))
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass  # Counters start from a fresh value when next read
+
+
+def invalidate_profile_audits(profile_ids):
+    """
+    Discards the cached audits of the given profiles
+    """
+    for profile_id in set(profile_ids):
+        bump_version(profile_version_key(profile_id))
+
+
+def invalidate_all_audits():
+    """
+    Discards every cached audit, after requirements or courses change
+    """
+    bump_version(REQUIREMENTS_VERSION_KEY)
+
+
+class RequirementResult(object):
+    def __init__(self, requirement, course_statuses):
+        self.requirement = requirement
+        self.course_statuses = course_statuses
+        self.status = requirement.fulfillment_status(course_statuses)
+
+
+class RequirementAuditor(object):
+    """
+    Computes the statuses of every requirement in a group of requirement sets at once.
+    The number of queries issued is fixed, regardless of how many requirements are audited.
+    """
+
+    def __init__(self, profile, schedule):
+        self.profile = profile
+        self.schedule = schedule
+
+    def load_course_sets(self, requirements):
+        """
+        Loads the course sets of all of the given requirements in a single query
+        :param requirements:
+        :return: A dict mapping requirement ids to lists of courses
+        """
+        course_sets = dict((req.pk, []) for req in requirements)
+        if not requirements:
+            return course_sets
+        courses = dict()
+        memberships = RequirementCourse.objects.filter(requirement__in=requirements).select_related('course')
+        for membership in memberships.order_by('course_id'):
+            course = courses.setdefault(membership.course_id, membership.course)
+            course_sets[membership.requirement_id].append(course)
+        return course_sets
+
+    def completed_course_keys(self):
+        """
+        :return: The canonical keys of the completed courses, so that cross-listed courses match one another
+        """
+        rows = CompletedCourse.objects.filter(user=self.profile).values_list('course_id', 'course__canonical_id')
+        return set(canonical_id or course_id for course_id, canonical_id in rows)
+
+    def scheduled_course_keys(self):
+        if self.schedule is None:
+            return set()
+        if self.schedule.sections_prefetched():
+            rows = [(section.course_id, section.course.canonical_id) for section in self.schedule.sections.all()]
+        else:
+            rows = self.schedule.sections.values_list('course_id', 'course__canonical_id')
+        return set(canonical_id or course_id for course_id, canonical_id in rows)
+
+    def audit(self, req_sets):
+        """
+        Gets the statuses of every requirement in the given requirement sets
+        :param req_sets:
+        :return: A list of (requirement set, list of RequirementResults) pairs
+        """
+        prefetch_related_objects(req_sets, 'requirements')
+        requirements = list(dict((req.pk, req) for req_set in req_sets for req in req_set.requirements.all()).values())
+        course_sets = self.load_course_sets(requirements)
+        completed = self.completed_course_keys()
+        scheduled = self.scheduled_course_keys()
+
+        results = dict()
+        for req in requirements:
+            course_statuses = dict.fromkeys(course_sets[req.pk], 'U')
+            for course in course_statuses:
+                if course.canonical_key in completed:
+                    course_statuses[course] = 'F'
+                elif course.canonical_key in scheduled:
+                    course_statuses[course] = 'S'
+            results[req.pk] = RequirementResult(req, course_statuses)
+        return [(req_set, [results[req.pk] for req in req_set.requirements.all()]) for req_set in req_sets]
+
+    def cache_key(self, req_sets):
+        profile_version, requirements_version = get_versions([profile_version_key(self.profile.pk),
+                                                              REQUIREMENTS_VERSION_KEY])
+        return 'audit:%d:%s:%s:%d:%d' % (self.profile.pk, self.schedule.pk if self.schedule else 'none',
+                                         '.'.join(str(req_set.pk) for req_set in req_sets),
+                                         profile_version, requirements_version)
+
+    def cached_audit(self, req_sets):
+        """
+        Gets the same results as audit, from the cache when none of their inputs have changed since they were
+        last computed. Cached audits are invalidated by the signal receivers below.
+        """
+        key = self.cache_key(req_sets)
+        audit = cache.get(key)
+        if audit is None:
+            audit = self.audit(req_sets)
+            cache.set(key, audit, getattr(settings, 'SAS_AUDIT_CACHE_TIMEOUT', 60 * 60))
+        return audit
+
+
+@receiver(post_save, sender=CompletedCourse)
+@receiver(post_delete, sender=CompletedCourse)
+def invalidate_completed_course_audits(sender, instance, **kwargs):
+    invalidate_profile_audits([instance.user_id])
+
+
+@receiver(post_save, sender=UserMajor)
+@receiver(post_delete, sender=UserMajor)
+def invalidate_major_audits(sender, instance, **kwargs):
+    invalidate_profile_audits([instance.name_id])
+
+
+@receiver(m2m_changed, sender=Profile.minors.through)
+def invalidate_minor_audits(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_profile_audits([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_profile_audits(pk_set)
+    elif action == 'pre_clear':
+        invalidate_profile_audits(instance.profile_set.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Schedule.sections.through)
+def invalidate_schedule_audits(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_profile_audits([instance.user_id])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_profile_audits(Schedule.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+    elif action == 'pre_clear':
+        invalidate_profile_audits(instance.schedule_set.values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Section)
+@receiver(pre_delete, sender=Section)
+def invalidate_section_audits(sender, instance, created=False, **kwargs):
+    # A section's course may have changed, or the section may be leaving schedules
+    if not created:
+        invalidate_profile_audits(instance.schedule_set.values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Requirement)
+@receiver(post_delete, sender=Requirement)
+@receiver(post_save, sender=RequirementCourse)
+@receiver(post_delete, sender=RequirementCourse)
+@receiver(post_save, sender=RequirementSet)
+@receiver(post_delete, sender=RequirementSet)
+@receiver(m2m_changed, sender=RequirementSet.requirements.through)
+def invalidate_requirement_audits(sender, **kwargs):
+    invalidate_all_audits()
@@ -0,0 +1,124 @@
+from __future__ import unicode_literals
+
+import json
+import logging
+import time
+from array import array
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Section
+
+logger = logging.getLogger(__name__)
+
+# Held by ids with no section
+NO_SECTION = -1
+
+
+class AvailabilitySnapshot(object):
+    """
+    The open seats of every section, in an array indexed by section id, so that suggestions can read them
+    without touching the database
+    """
+
+    def __init__(self, seats):
+        self.seats = seats
+        self.loaded_at = time.time()
+
+    @classmethod
+    def load(cls):
+        rows = list(Section.objects.values_list('pk', 'capacity', 'enrolled').order_by())
+        seats = array(str('i'), [NO_SECTION]) * (max(pk for pk, capacity, enrolled in rows) + 1 if rows else 0)
+        for pk, capacity, enrolled in rows:
+            seats[pk] = max(capacity - enrolled, 0)
+        return cls(seats)
+
+    def age(self):
+        return time.time() - self.loaded_at
+
+    def open_seats(self, section_id):
+        """
+        :return: The number of open seats in a section, which is 0 for sections that are not in the snapshot
+        """
+        return max(self.seats[section_id], 0) if section_id < len(self.seats) else 0
+
+    def has_open_seats(self, section_id):
+        return self.open_seats(section_id) > 0
+
+    def set(self, section_id, seats):
+        if section_id >= len(self.seats):
+            self.seats.extend([NO_SECTION] * (section_id + 1 - len(self.seats)))
+        self.seats[section_id] = seats
+
+    def update(self, section_ids):
+        """
+        Reloads the open seats of some sections
+        """
+        found = Section.objects.filter(pk__in=section_ids).values_list('pk', 'capacity', 'enrolled')
+        seats = dict((pk, max(capacity - enrolled, 0)) for pk, capacity, enrolled in found)
+        for section_id in section_ids:
+            self.set(section_id, seats.get(section_id, NO_SECTION))
+
+
+_snapshot = None
+metrics = dict(refreshes=0, refresh_seconds=0.0, last_refresh_seconds=0.0, updates=0)
+
+
+def get_availability():
+    """
+    Gets this process's availability snapshot, reloading it once it is older than SAS_AVAILABILITY_MAX_AGE.
+    Changes made by this process are applied to the snapshot as they happen, so the age only bounds how long
+    changes made by other processes go unseen.
+    """
+    global _snapshot
+    if _snapshot is None or _snapshot.age() > settings.SAS_AVAILABILITY_MAX_AGE:
+        start = time.time()
+        _snapshot = AvailabilitySnapshot.load()
+        elapsed = time.time() - start
+        metrics['refreshes'] += 1
+        metrics['refresh_seconds'] += elapsed
+        metrics['last_refresh_seconds'] = elapsed
+        logger.debug(json.dumps(dict(availability_refresh=round(elapsed, 4), size=len(_snapshot.seats))))
+    return _snapshot
+
+
+def availability_metrics():
+    """
+    :return: The refresh counts and times of this process's snapshot, with its current age and size
+    """
+    return dict(metrics, age=_snapshot.age() if _snapshot else None, size=len(_snapshot.seats) if _snapshot else 0)
+
+
+def invalidate_availability():
+    """
+    Discards this process's snapshot, after changes to sections that send no signals
+    """
+    global _snapshot
+    _snapshot = None
+
+
+def seats_changed(section_ids):
+    """
+    Brings this process's snapshot, if it has one, up to date with changes to the enrollment of some sections
+    """
+    if _snapshot is not None:
+        _snapshot.update(section_ids)
+        metrics['updates'] += 1
+
+
+@receiver(post_save, sender=Section)
+def update_saved_section(sender, instance, **kwargs):
+    if _snapshot is not None:
+        if hasattr(instance.capacity, 'resolve_expression') or hasattr(instance.enrolled, 'resolve_expression'):
+            # Saved with F() expressions, whose values are only known to the database
+            _snapshot.update([instance.pk])
+        else:
+            _snapshot.set(instance.pk, max(instance.capacity - instance.enrolled, 0))
+
+
+@receiver(post_delete, sender=Section)
+def update_deleted_section(sender, instance, **kwargs):
+    if _snapshot is not None:
+        _snapshot.set(instance.pk, NO_SECTION)
@@ -0,0 +1,76 @@
+from __future__ import unicode_literals
+
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+
+from .audit import invalidate_all_audits
+from .facets import invalidate_facets
+from .models import Course
+
+
+class UnionFind(object):
+    """
+    Disjoint sets of ids, each represented by its lowest id
+    """
+
+    def __init__(self):
+        self.parents = dict()
+
+    def find(self, x):
+        self.parents.setdefault(x, x)
+        root = x
+        while self.parents[root] != root:
+            root = self.parents[root]
+        # Compress the path so later lookups are constant time
+        while x != root:
+            self.parents[x], x = root, self.parents[x]
+        return root
+
+    def union(self, x, y):
+        x, y = self.find(x), self.find(y)
+        if x != y:
+            self.parents[max(x, y)] = min(x, y)
+
+
+def canonical_course_ids():
+    """
+    Computes the cross-listing classes from Course.also_offered_as with a single query
+    :return: A dict mapping the id of every cross-listed course to the lowest id in its class
+    """
+    classes = UnionFind()
+    for course_id, other_id in Course.also_offered_as.through.objects.values_list('from_course_id', 'to_course_id'):
+        classes.union(course_id, other_id)
+    return dict((course_id, classes.find(course_id)) for course_id in list(classes.parents))
+
+
+def update_canonical_courses():
+    """
+    Brings Course.canonical up to date with Course.also_offered_as, writing only the courses whose class changed
+    :return: The number of courses updated
+    """
+    canonical_ids = canonical_course_ids()
+    current = dict(Course.objects.exclude(canonical=None).values_list('pk', 'canonical_id'))
+    changes = dict()
+    for course_id in set(canonical_ids) | set(current):
+        canonical_id = canonical_ids.get(course_id)
+        if current.get(course_id) != canonical_id:
+            changes.setdefault(canonical_id, []).append(course_id)
+    for canonical_id, course_ids in changes.items():
+        Course.objects.filter(pk__in=course_ids).update(canonical=canonical_id)
+    if changes:
+        # Queryset updates send no signals
+        invalidate_all_audits()
+        invalidate_facets()
+    return sum(len(course_ids) for course_ids in changes.values())
+
+
+@receiver(m2m_changed, sender=Course.also_offered_as.through)
+def update_cross_listings(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        update_canonical_courses()
+
+
+@receiver(post_delete, sender=Course)
+def remove_deleted_cross_listing(sender, instance, **kwargs):
+    if instance.canonical_id is not None:
+        update_canonical_courses()
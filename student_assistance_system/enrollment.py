@@ -0,0 +1,102 @@
+from __future__ import unicode_literals
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .audit import bump_version
+from .availability import seats_changed
+from .models import Enrollment, Section, WaitlistEntry
+
+ENROLLED = 'enrolled'
+WAITLISTED = 'waitlisted'
+# Version of everything that shows how many seats sections have taken. Enrollments change it instead of the
+# catalog version, so that they only invalidate what displays seats.
+SEATS_VERSION_KEY = 'enrollment:seats'
+
+
+class EnrollmentError(ValueError):
+    def __init__(self, message, reason):
+        """
+        :param reason: 'missing', 'enrolled', 'waitlisted' or 'not enrolled'
+        """
+        super(EnrollmentError, self).__init__(message)
+        self.reason = reason
+
+
+def enroll(profile, section):
+    """
+    Takes a seat in a section for a student, or puts them at the end of its waitlist if it is full. Seats are
+    taken with a conditional UPDATE of Section.enrolled, so concurrent requests can never overbook a section.
+    The UPDATE is also the first statement of the transaction, so that on SQLite it takes the write lock at once;
+    a transaction that reads first has to upgrade its lock later, and fails rather than waiting if another has it.
+    :param profile: The student's Profile, or its id
+    :param section: The Section, or its id
+    :return: ENROLLED or WAITLISTED
+    :raises EnrollmentError: If there is no such section, or the student is already enrolled or waitlisted
+    """
+    profile_id, section_id = getattr(profile, 'pk', profile), getattr(section, 'pk', section)
+    status = None
+    try:
+        with transaction.atomic():
+            if Section.objects.filter(pk=section_id, enrolled__lt=F('capacity')).update(enrolled=F('enrolled') + 1):
+                status = ENROLLED
+                Enrollment.objects.create(section_id=section_id, user_id=profile_id)
+                # Seats can open up without a drop, when the capacity is raised
+                WaitlistEntry.objects.filter(section_id=section_id, user_id=profile_id).delete()
+            elif not Section.objects.filter(pk=section_id).exists():
+                raise EnrollmentError('No such section', 'missing')
+            elif Enrollment.objects.filter(section_id=section_id, user_id=profile_id).exists():
+                raise EnrollmentError('Already enrolled', ENROLLED)
+            else:
+                status = WAITLISTED
+                WaitlistEntry.objects.create(section_id=section_id, user_id=profile_id)
+    except IntegrityError:
+        raise EnrollmentError('Already enrolled' if status == ENROLLED else 'Already waitlisted', status)
+    if status == ENROLLED:
+        bump_version(SEATS_VERSION_KEY)
+        seats_changed([section_id])
+    return status
+
+
+def drop(profile, section):
+    """
+    Gives up a student's seat in a section, which passes to the first student on its waitlist, if any.
+    Students on the waitlist are taken off it instead.
+    :param profile: The student's Profile, or its id
+    :param section: The Section, or its id
+    :return: The id of the Profile that was given the seat, or None
+    :raises EnrollmentError: If the student is neither enrolled nor waitlisted
+    """
+    profile_id, section_id = getattr(profile, 'pk', profile), getattr(section, 'pk', section)
+    promoted = None
+    with transaction.atomic():
+        # As in enroll, the first statement writes
+        if Enrollment.objects.filter(section_id=section_id, user_id=profile_id).delete()[0]:
+            head = WaitlistEntry.objects.select_for_update().filter(section_id=section_id).order_by('pk').first()
+            if head is None:
+                Section.objects.filter(pk=section_id).update(enrolled=F('enrolled') - 1)
+            else:
+                promoted = head.user_id
+                head.delete()
+                Enrollment.objects.create(section_id=section_id, user_id=promoted)
+        elif WaitlistEntry.objects.filter(section_id=section_id, user_id=profile_id).delete()[0]:
+            return None
+        else:
+            raise EnrollmentError('Not enrolled', 'not enrolled')
+    if promoted is None:
+        bump_version(SEATS_VERSION_KEY)
+        seats_changed([section_id])
+    return promoted
+
+
+def enrollment_status(profile, section):
+    """
+    :return: An (ENROLLED, None), (WAITLISTED, position) or (None, None) pair, where position counts from 1
+    """
+    profile_id, section_id = getattr(profile, 'pk', profile), getattr(section, 'pk', section)
+    if Enrollment.objects.filter(section_id=section_id, user_id=profile_id).exists():
+        return ENROLLED, None
+    entry = WaitlistEntry.objects.filter(section_id=section_id, user_id=profile_id).values_list('pk', flat=True).first()
+    if entry is None:
+        return None, None
+    return WAITLISTED, WaitlistEntry.objects.filter(section_id=section_id, pk__lte=entry).count()
@@ -0,0 +1,97 @@
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.http import urlencode
+
+from .audit import bump_version, get_versions, profile_version_key
+from .enrollment import SEATS_VERSION_KEY
+from .models import Course, Department, MeetingTime, Section
+
+VERSION_KEY = 'facets:catalog'
+# Parameters that only page through the results of a search
+PAGING_PARAMETERS = ('page', 'cursor')
+# Maximum number of values listed for facets with many values
+FACET_LIMIT = 20
+
+
+def invalidate_facets():
+    """
+    Discards every cached facet count, after the catalog changes
+    """
+    bump_version(VERSION_KEY)
+
+
+def normalize_query(params):
+    """
+    Reduces search parameters to a canonical string, so that equivalent searches share their facet counts
+    :param params: A QueryDict or dict of search parameters
+    """
+    items = []
+    for key in sorted(params):
+        value = ('%s' % params.get(key, '')).strip().lower()
+        if key not in PAGING_PARAMETERS and value:
+            items.append((key, value))
+    return urlencode(items)
+
+
+def count_facets(sections):
+    """
+    Counts the sections with each value of every facet, with one grouped query per facet
+    :param sections: A queryset of the sections to count
+    :return: A dict of lists of (value, count) pairs by facet name, most common values first. Sections
+    are counted under each day they meet on.
+    """
+    sections = sections.order_by().prefetch_related(None)
+
+    def grouped(field, limit=None):
+        rows = sections.values_list(field).annotate(count=Count('pk')).order_by('-count', field)
+        return [tuple(row) for row in (rows[:limit] if limit else rows)]
+
+    days = [0] * 7
+    for day_mask, count in sections.values_list('day_mask').annotate(count=Count('pk')).order_by():
+        for day in range(0, 7):
+            if day_mask & 1 << day:
+                days[day] += count
+    return dict(department=grouped('course__department__abbr_name', FACET_LIMIT),
+                credits=grouped('course__credit_hours'),
+                day=[(day, count) for day, count in enumerate(days) if count],
+                professor=grouped('professor', FACET_LIMIT))
+
+
+def get_facets(sections, params, profile=None):
+    """
+    Gets the facet counts of a search, from the cache unless the catalog has changed
+    :param sections: A queryset of the search's results
+    :param params: The search parameters
+    :param profile: The profile of the student searching, when the results depend on their completed courses
+    """
+    keys = [VERSION_KEY] + ([profile_version_key(profile.pk)] if profile else [])
+    if params.get('open'):
+        # Searches for open sections depend on enrollments as well
+        keys.append(SEATS_VERSION_KEY)
+    key = 'facets:%s:%s' % (hashlib.md5(normalize_query(params).encode('utf-8')).hexdigest(),
+                            ':'.join(str(version) for version in get_versions(keys)))
+    facets = cache.get(key)
+    if facets is None:
+        facets = count_facets(sections)
+        cache.set(key, facets, getattr(settings, 'SAS_FACET_CACHE_TIMEOUT', 10 * 60))
+    return facets
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=MeetingTime)
+@receiver(post_delete, sender=MeetingTime)
+@receiver(m2m_changed, sender=Section.meeting_times.through)
+def invalidate_catalog_facets(sender, **kwargs):
+    invalidate_facets()
@@ -0,0 +1,117 @@
+from __future__ import unicode_literals
+
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+_local = threading.local()
+
+SLOWEST_QUERIES = 5
+
+
+class RequestStats(object):
+    def __init__(self, url_name, queries, template_time, duration):
+        self.url_name = url_name
+        self.queries = queries
+        self.query_count = len(queries)
+        self.sql_time = sum(float(query['time']) for query in queries)
+        self.template_time = template_time
+        self.duration = duration
+        self.budget = getattr(settings, 'SAS_QUERY_BUDGETS', {}).get(url_name)
+
+    def over_budget(self):
+        return self.budget is not None and self.query_count > self.budget
+
+    def slowest_queries(self, count=SLOWEST_QUERIES):
+        return sorted(self.queries, key=lambda query: -float(query['time']))[:count]
+
+    def as_dict(self):
+        return dict(url_name=self.url_name,
+                    query_count=self.query_count,
+                    query_budget=self.budget,
+                    sql_time=round(self.sql_time, 4),
+                    template_time=round(self.template_time, 4),
+                    duration=round(self.duration, 4),
+                    slowest_queries=[dict(sql=query['sql'][:200], time=query['time']) for query in self.slowest_queries()])
+
+
+class InstrumentedTemplate(object):
+    """
+    Wraps a backend template to add the time spent rendering it to the current request's statistics
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        depth = getattr(_local, 'depth', 0)
+        _local.depth = depth + 1
+        start = time.time()
+        try:
+            return self.template.render(context, request)
+        finally:
+            _local.depth = depth
+            if depth == 0:
+                _local.template_time = getattr(_local, 'template_time', 0.0) + time.time() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing every top level template render
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super(InstrumentedDjangoTemplates, self).from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super(InstrumentedDjangoTemplates, self).get_template(template_name))
+
+
+class QueryInstrumentationMiddleware(object):
+    """
+    Records the queries, SQL time and template render time of requests. The statistics are attached
+    to the response as query_stats, sent as X-Query-* headers when DEBUG is on, and logged as JSON otherwise.
+    Requests that issue more queries than their URL name's entry in SAS_QUERY_BUDGETS are logged as warnings.
+    Recording every query has a cost, so outside DEBUG only the fraction SAS_QUERY_SAMPLE_RATE of requests
+    is instrumented.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DEBUG and random.random() >= getattr(settings, 'SAS_QUERY_SAMPLE_RATE', 0):
+            return self.get_response(request)
+        force_debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        first_query = len(connection.queries_log)
+        _local.template_time = 0.0
+        start = time.time()
+        try:
+            response = self.get_response(request)
+        finally:
+            connection.force_debug_cursor = force_debug_cursor
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        stats = RequestStats(url_name, list(connection.queries_log)[first_query:], _local.template_time,
+                             time.time() - start)
+        response.query_stats = stats
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(stats.query_count)
+            response['X-Query-Time'] = '%.4f' % stats.sql_time
+            response['X-Template-Time'] = '%.4f' % stats.template_time
+        else:
+            logger.info(json.dumps(stats.as_dict()))
+        if stats.over_budget():
+            logger.warning('%s issued %d queries, over its budget of %d', url_name, stats.query_count, stats.budget)
+        return response
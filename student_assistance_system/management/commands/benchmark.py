@@ -0,0 +1,176 @@
+import json
+import logging
+import platform
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from student_assistance_system.audit import RequirementAuditor
+from student_assistance_system.availability import AvailabilitySnapshot, invalidate_availability
+from student_assistance_system.models import Course, Section
+from student_assistance_system.prereqs import invalidate_prerequisite_graph
+from student_assistance_system.views import IndexView
+
+
+class Command(BaseCommand):
+    help = ('Times the main views and model methods against the current database, with empty (":cold") and with '
+            'warm caches, optionally saving the results as JSON and comparing them with an earlier run. Use '
+            'generate_catalog to build a realistic database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Student to benchmark as (default: the one with the most completed courses)')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs of every case')
+        parser.add_argument('--output', help='File to write the results to as JSON')
+        parser.add_argument('--compare', help='JSON results of an earlier run to check for regressions')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Fraction by which a median time may grow before it counts as a regression')
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError('No user named %s' % username)
+        users = User.objects.filter(profile__schedule__isnull=False)
+        user = users.annotate(completed=Count('profile__completedcourse', distinct=True)).order_by('-completed', 'pk').first()
+        if user is None:
+            raise CommandError('No students with schedules; run generate_catalog first')
+        return user
+
+    def view_cases(self, client, user, schedule):
+        department = Section.objects.filter(pk__in=schedule.sections.all()).values_list(
+            'course__department__abbr_name', flat=True).first() or ''
+        search = reverse('student_assistance_system:courses')
+        cases = [
+            ('view:index', reverse('student_assistance_system:index'), None),
+            ('view:view_schedule', reverse('student_assistance_system:view_schedule', kwargs={'schedule_id': schedule.pk}), None),
+            ('view:edit_schedule', reverse('student_assistance_system:edit_schedule', kwargs={'schedule_id': schedule.pk}), None),
+            ('view:courses:department', search, {'dep': department}),
+            ('view:courses:number_range', search, {'num1': '200', 'num2': '299'}),
+            ('view:courses:keywords', search, {'q': 'introduction algebra'}),
+            ('view:courses:days', search, {'mon': 'on', 'wed': 'on', 'stime': '08:00', 'etime': '12:00'}),
+            ('view:courses:open_seats', search, {'dep': department, 'open': 'on'}),
+        ]
+        for name, url, data in cases:
+            yield name, self.view_runner(client, url, data)
+
+    def view_runner(self, client, url, data):
+        def run():
+            response = client.get(url, data)
+            if response.status_code != 200:
+                raise CommandError('%s returned %d' % (url, response.status_code))
+            return response.query_stats.query_count
+        return run
+
+    def model_cases(self, user, schedule):
+        profile = user.profile
+        req_sets = IndexView().get_requirement_sets(profile)
+        requirements = [requirement for req_set in req_sets for requirement in req_set.requirements.all()]
+        sections = list(schedule.sections.all())
+        candidates = list(Section.objects.order_by('pk')[:500])
+        course_statuses = requirements[0].get_course_statuses(user, schedule) if requirements else {}
+
+        yield 'model:RequirementAuditor.audit', lambda: RequirementAuditor(profile, schedule).audit(req_sets)
+        yield 'model:Requirement.get_course_statuses', lambda: [r.get_course_statuses(user, schedule) for r in requirements]
+        yield 'model:Requirement.fulfillment_status', lambda: requirements[0].fulfillment_status(course_statuses)
+        yield 'model:Requirement.get_course_suggestions', lambda: [r.get_course_suggestions(course_statuses, schedule, 5)
+                                                                   for r in requirements[:1]]
+        yield 'model:Schedule.occupancy', schedule.occupancy
+        yield 'model:AvailabilitySnapshot.load', lambda: AvailabilitySnapshot.load().seats
+        yield 'model:Section.conflicts_with', lambda: [c.conflicts_with(s) for c in candidates for s in sections]
+        yield 'model:Course.section_set', lambda: list(Course.objects.filter(pk__in=[s.course_id for s in sections])
+                                                       .prefetch_related('section_set'))
+
+    def clear_caches(self):
+        """
+        Empties the shared cache and this process's availability snapshot and prerequisite graph
+        """
+        cache.clear()
+        invalidate_availability()
+        invalidate_prerequisite_graph()
+
+    def measure(self, func, cold):
+        """
+        :param cold: Whether every run starts with empty caches, rather than with the caches of a first, untimed run
+        :return: A dict of the minimum and median times of the runs, in seconds, and the queries of one run
+        """
+        if not cold:
+            func()
+        timings, queries = [], 0
+        for i in range(0, self.repeat):
+            if cold:
+                self.clear_caches()
+            first_query = len(connection.queries_log)
+            start = time.time()
+            result = func()
+            timings.append(time.time() - start)
+            # Views report their own query counts, which exclude session and authentication queries
+            queries = result if isinstance(result, int) else len(connection.queries_log) - first_query
+        timings.sort()
+        return dict(min=round(timings[0], 5), median=round(timings[len(timings) // 2], 5), queries=queries)
+
+    def compare(self, results, path):
+        with open(path) as f:
+            baseline = json.load(f)['results']
+        regressions = []
+        for name, result in sorted(results.items()):
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            ratio = result['median'] / before['median'] if before['median'] else 1.0
+            slower = ratio > 1 + self.threshold
+            more_queries = result['queries'] > before['queries']
+            flag = 'REGRESSION' if slower or more_queries else ''
+            self.stdout.write('%-47s %7.1f%% %5d -> %-5d %s' % (name, (ratio - 1) * 100, before['queries'],
+                                                                 result['queries'], flag))
+            if flag:
+                regressions.append(name)
+        return regressions
+
+    def handle(self, *args, **options):
+        self.repeat = max(1, options['repeat'])
+        self.threshold = options['threshold']
+        user = self.get_user(options['username'])
+        schedule = user.profile.schedule_set.order_by('-updated').first()
+        if schedule is None:
+            raise CommandError('%s has no schedules' % user.username)
+
+        client = Client()
+        client.force_login(user)
+        results = dict()
+        force_debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        # The per-request statistics are reported here instead
+        logger = logging.getLogger('student_assistance_system.instrumentation')
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['*'], SAS_QUERY_SAMPLE_RATE=1.0):
+                cases = list(self.view_cases(client, user, schedule)) + list(self.model_cases(user, schedule))
+                # Cached results would hide the cost of computing them, so every case is timed with and without
+                for case, func in cases:
+                    for name, cold in ((case + ':cold', True), (case, False)):
+                        results[name] = self.measure(func, cold)
+                        self.stdout.write('%-47s %8.4fs %5d queries' % (name, results[name]['median'],
+                                                                       results[name]['queries']))
+        finally:
+            connection.force_debug_cursor = force_debug_cursor
+            logger.setLevel(level)
+
+        if options['output']:
+            meta = dict(date=timezone.now().isoformat(), python=platform.python_version(), database=connection.vendor,
+                        username=user.username, repeat=self.repeat, courses=Course.objects.count(),
+                        sections=Section.objects.count())
+            with open(options['output'], 'w') as f:
+                json.dump(dict(meta=meta, results=results), f, indent=2, sort_keys=True)
+        if options['compare']:
+            regressions = self.compare(results, options['compare'])
+            if regressions:
+                raise CommandError('%d regressions: %s' % (len(regressions), ', '.join(regressions)))
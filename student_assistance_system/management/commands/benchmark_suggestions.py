@@ -0,0 +1,85 @@
+import random
+import time
+from datetime import time as clock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from student_assistance_system.models import (Course, Department, MeetingTime, Schedule, Section,
+                                              summarize_meeting_times)
+from student_assistance_system.suggestions import get_suggestions
+
+PATTERNS = [((0, 2, 4), 50), ((1, 3), 75), ((0, 2), 75)]
+
+
+def reference_suggestions(course_statuses, schedule):
+    """
+    The original suggestion algorithm, which compares every candidate against every scheduled section
+    """
+    unfulfilled_sections = [s for c, st in course_statuses.items() if st == 'U' for s in c.section_set.all()]
+    return [s for s in unfulfilled_sections if not any([s.conflicts_with_pairwise(s2) for s2 in schedule.sections.all()])]
+
+
+class Command(BaseCommand):
+    help = 'Times the suggestion engine against the original implementation on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sections', type=int, default=3000, help='Number of candidate sections to generate')
+        parser.add_argument('--scheduled', type=int, default=5, help='Number of sections on the schedule')
+        parser.add_argument('--limit', type=int, default=5, help='Number of suggestions requested by the page')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def meeting_times(self, rng):
+        days, length = rng.choice(PATTERNS)
+        start = rng.randrange(8 * 60, 18 * 60, 5)
+        end = start + length
+        return [MeetingTime.get_or_intern(day, clock(start // 60, start % 60), clock(end // 60, end % 60))
+                for day in days]
+
+    def build_catalog(self, options):
+        rng = random.Random(options['seed'])
+        department = Department.objects.create(full_name='Benchmark', abbr_name='BENCH')
+        Course.objects.bulk_create([Course(name='Course %d' % i, description='', course_number=str(100 + i % 900),
+                                           department=department, credit_hours=3)
+                                    for i in range(0, options['sections'] // 3 + 1)])
+        courses = list(Course.objects.filter(department=department))
+        patterns = [self.meeting_times(rng) for i in range(0, 200)]
+
+        sections, section_times = [], []
+        for i in range(0, options['sections'] + options['scheduled']):
+            times = rng.choice(patterns)
+            sections.append(Section(course=courses[i % len(courses)], capacity=30, enrolled=0, professor='Staff',
+                                    location='TBA', **summarize_meeting_times(times)))
+            section_times.append(times)
+        Section.objects.bulk_create(sections)
+        sections = list(Section.objects.filter(course__department=department).order_by('pk'))
+        Section.meeting_times.through.objects.bulk_create([
+            Section.meeting_times.through(section_id=section.pk, meetingtime_id=meeting_time.pk)
+            for section, times in zip(sections, section_times) for meeting_time in times])
+
+        user = User.objects.create_user('benchmark-%d' % rng.randint(0, 1 << 30))
+        schedule = Schedule.objects.create(name='Benchmark', user=user.profile)
+        scheduled = sections[options['sections']:]
+        schedule.sections.add(*scheduled)
+        candidates = set(courses) - set(section.course for section in scheduled)
+        return dict.fromkeys(candidates, 'U'), schedule
+
+    def timed(self, label, func):
+        start = time.time()
+        result = func()
+        self.stdout.write('%-32s %8.3fs  %d suggestions' % (label, time.time() - start, len(result)))
+        return result
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            course_statuses, schedule = self.build_catalog(options)
+            candidates = [course.pk for course in course_statuses]
+
+            self.timed('engine, first %d' % options['limit'],
+                       lambda: get_suggestions(candidates, schedule, options['limit']))
+            engine = self.timed('engine, all', lambda: get_suggestions(candidates, schedule))
+            reference = self.timed('reference, all', lambda: reference_suggestions(course_statuses, schedule))
+            if set(s.pk for s in engine) != set(s.pk for s in reference):
+                self.stderr.write('Suggestion engine and reference implementation disagree')
+            transaction.set_rollback(True)
@@ -0,0 +1,251 @@
+import datetime
+import random
+import time
+from datetime import time as clock
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from student_assistance_system.availability import invalidate_availability
+from student_assistance_system.crosslistings import update_canonical_courses
+from student_assistance_system.facets import invalidate_facets
+from student_assistance_system.models import (CompletedCourse, Course, Department, MeetingTime, Profile,
+                                              RequirementSet, Schedule, Section, UserMajor, create_requirement,
+                                              parse_course_number, summarize_meeting_times)
+from student_assistance_system.prereqs import invalidate_prerequisite_graph
+from student_assistance_system.search import get_search_backend
+
+BATCH_SIZE = 500
+DEPARTMENTS = ['ANTH', 'ARTH', 'ASTR', 'BIOL', 'CHEM', 'CLSC', 'COGS', 'DSCI', 'EBME', 'ECHE', 'ECON', 'EECS',
+               'EMAE', 'ENGL', 'ESCI', 'ETHS', 'FRCH', 'GEOL', 'HSTY', 'MATH', 'MUSC', 'NURS', 'PHIL', 'PHYS',
+               'POSC', 'PSCL', 'RLGN', 'SOCI', 'SPAN', 'STAT', 'THTR', 'WLIT']
+SUBJECTS = ['Algebra', 'Analysis', 'Biology', 'Chemistry', 'Computation', 'Culture', 'Design', 'Dynamics', 'Economics',
+            'Ethics', 'Evolution', 'Geometry', 'History', 'Literature', 'Logic', 'Materials', 'Mechanics', 'Music',
+            'Networks', 'Optics', 'Philosophy', 'Politics', 'Probability', 'Signals', 'Society', 'Statistics',
+            'Structures', 'Systems', 'Theory', 'Thermodynamics']
+LEVELS = ['Introduction to', 'Foundations of', 'Topics in', 'Advanced', 'Seminar in', 'Applied']
+SURNAMES = ['Adams', 'Baker', 'Chen', 'Davis', 'Evans', 'Garcia', 'Howard', 'Ito', 'Johnson', 'Kim', 'Lopez',
+            'Miller', 'Nguyen', 'Olsen', 'Patel', 'Quinn', 'Rossi', 'Smith', 'Tanaka', 'Wilson']
+BUILDINGS = ['Olin', 'Nord', 'Strosacker', 'Rockefeller', 'Clark', 'Sears', 'Bingham', 'Wickenden']
+YEARS = ['Freshman', 'Sophomore', 'Junior', 'Senior']
+GRADES = 'AAABBBCCD'
+# (days, start times in minutes after midnight, length in minutes) of the usual meeting patterns
+PATTERNS = [((0, 2, 4), range(8 * 60, 17 * 60, 60), 50),
+            ((1, 3), range(8 * 60 + 30, 17 * 60, 90), 75),
+            ((0, 2), range(9 * 60, 17 * 60, 90), 75),
+            ((0,), [18 * 60], 170),
+            ((2,), [18 * 60], 170),
+            ((3,), [18 * 60], 170)]
+
+
+def new_rows(model, last_pk):
+    """
+    Gets the rows of a model inserted after last_pk, in insertion order. bulk_create does not set primary keys
+    on every database, so inserted objects are reloaded this way.
+    """
+    return list(model.objects.filter(pk__gt=last_pk).order_by('pk'))
+
+
+def last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with a reproducible synthetic university catalog for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=len(DEPARTMENTS))
+        parser.add_argument('--courses', type=int, default=10000)
+        parser.add_argument('--sections', type=int, default=30000)
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='student', help='Prefix of the generated usernames')
+        parser.add_argument('--password', default='benchmark', help='Password of every generated student')
+
+    def stage(self, label, func, *args):
+        start = time.time()
+        result = func(*args)
+        self.stdout.write('%-24s %8.2fs' % (label, time.time() - start))
+        return result
+
+    def create_departments(self, count):
+        names = [DEPARTMENTS[i % len(DEPARTMENTS)] + ('' if i < len(DEPARTMENTS) else str(i // len(DEPARTMENTS)))
+                 for i in range(0, count)]
+        start = last_pk(Department)
+        Department.objects.bulk_create([Department(full_name='Department of %s' % name.title(), abbr_name=name)
+                                        for name in names])
+        return new_rows(Department, start)
+
+    def create_courses(self, departments, count):
+        courses = []
+        for i in range(0, count):
+            department = departments[i % len(departments)]
+            number = str(self.rng.choice([100, 200, 300, 400]) + self.rng.randrange(0, 100))
+            if self.rng.random() < 0.1:
+                number += self.rng.choice('ABCD')
+            subject = self.rng.choice(SUBJECTS)
+            course = Course(department=department, course_number=number, credit_hours=self.rng.choice([1, 3, 3, 3, 4]),
+                            name='%s %s' % (self.rng.choice(LEVELS), subject),
+                            description=' '.join(self.rng.sample(SUBJECTS, 8)).lower())
+            # bulk_create bypasses Course.save, which normally fills in the normalized course number
+            course.number_int, course.number_suffix = parse_course_number(number)
+            courses.append(course)
+        start = last_pk(Course)
+        Course.objects.bulk_create(courses, batch_size=BATCH_SIZE)
+        return new_rows(Course, start)
+
+    def link_courses(self, courses):
+        """
+        Gives upper level courses prerequisites among lower level courses of the same department, so the
+        prerequisite graph is acyclic, and cross-lists a few courses with a course of another department.
+        """
+        by_department = dict()
+        for course in courses:
+            by_department.setdefault(course.department_id, []).append(course)
+        prereqs, cross_listings = [], []
+        for department_courses in by_department.values():
+            department_courses.sort(key=lambda c: (c.number_int, c.number_suffix))
+            for i, course in enumerate(department_courses):
+                lower = [c for c in department_courses[max(0, i - 50):i] if c.number_int // 100 < course.number_int // 100]
+                for prereq in self.rng.sample(lower, min(len(lower), self.rng.randint(0, 2))):
+                    prereqs.append(Course.prereqs.through(from_course_id=course.pk, to_course_id=prereq.pk))
+        for course in self.rng.sample(courses, len(courses) // 30):
+            other = self.rng.choice(courses)
+            if other.department_id != course.department_id:
+                cross_listings.append(Course.also_offered_as.through(from_course_id=course.pk, to_course_id=other.pk))
+                cross_listings.append(Course.also_offered_as.through(from_course_id=other.pk, to_course_id=course.pk))
+        Course.prereqs.through.objects.bulk_create(prereqs, batch_size=BATCH_SIZE)
+        Course.also_offered_as.through.objects.bulk_create(cross_listings, batch_size=BATCH_SIZE)
+        # bulk_create does not send the m2m_changed signal that maintains Course.canonical
+        update_canonical_courses()
+        return len(prereqs), len(cross_listings) // 2
+
+    def create_meeting_patterns(self):
+        """
+        :return: A list of (meeting times, summary) pairs, one for every meeting pattern sections may use
+        """
+        patterns = []
+        for days, starts, length in PATTERNS:
+            for start in starts:
+                end = start + length
+                times = [MeetingTime.get_or_intern(day, clock(start // 60, start % 60), clock(end // 60, end % 60))
+                         for day in days]
+                patterns.append((times, summarize_meeting_times(times)))
+        return patterns
+
+    def create_sections(self, courses, count):
+        patterns = self.create_meeting_patterns()
+        # Every course is offered at least once when there are enough sections
+        offered = courses[:count] + [self.rng.choice(courses) for i in range(len(courses), count)]
+        sections, section_patterns = [], []
+        for course in offered:
+            times, summary = self.rng.choice(patterns)
+            capacity = self.rng.choice([20, 30, 40, 60, 120])
+            # bulk_create does not send the signals that maintain the meeting time summary, so it is filled in here
+            sections.append(Section(course=course, capacity=capacity, enrolled=self.rng.randint(0, capacity),
+                                    professor='%s %s' % (self.rng.choice('ABCDEFGHJKLMNPRSTW'), self.rng.choice(SURNAMES)),
+                                    location='%s %d' % (self.rng.choice(BUILDINGS), self.rng.randint(100, 499)),
+                                    **summary))
+            section_patterns.append(times)
+        start = last_pk(Section)
+        Section.objects.bulk_create(sections, batch_size=BATCH_SIZE)
+        sections = new_rows(Section, start)
+        Section.meeting_times.through.objects.bulk_create([
+            Section.meeting_times.through(section_id=section.pk, meetingtime_id=meeting_time.pk)
+            for section, times in zip(sections, section_patterns) for meeting_time in times], batch_size=BATCH_SIZE)
+        return sections
+
+    def create_requirement_sets(self, departments):
+        """
+        Gives every department a major with core, elective and outside requirements, and a minor
+        """
+        effective_date = datetime.date(2016, 8, 29)
+        majors, minors = [], []
+        for department in departments:
+            courses = Course.objects.filter(department=department)
+            outside = self.rng.choice([d for d in departments if d != department] or departments)
+            major = RequirementSet.objects.create(name='%s Major' % department.abbr_name, department=department,
+                                                  type=0, effective_date=effective_date)
+            major.requirements.add(
+                create_requirement('%s Core' % department.abbr_name, None, 4, courses.filter(number_int__lt=300)),
+                create_requirement('%s Electives' % department.abbr_name, 12, None, courses.filter(number_int__gte=300)),
+                create_requirement('%s Breadth' % outside.abbr_name, 6, None, Course.objects.filter(department=outside)))
+            minor = RequirementSet.objects.create(name='%s Minor' % department.abbr_name, department=department,
+                                                  type=1, effective_date=effective_date)
+            minor.requirements.add(create_requirement('%s Minor Courses' % department.abbr_name, None, 3,
+                                                      courses.filter(number_int__lt=400)))
+            majors.append(major)
+            minors.append(minor)
+        return majors, minors
+
+    def create_students(self, count, prefix, password, majors, minors, courses, sections):
+        usernames = ['%s%05d' % (prefix, i) for i in range(0, count)]
+        if User.objects.filter(username__in=usernames).exists():
+            raise CommandError('Students named %s* already exist; use a different --prefix' % prefix)
+        # Hashing is deliberately slow, so every student shares one hash
+        password = make_password(password)
+        start = last_pk(User)
+        User.objects.bulk_create([User(username=username, password=password) for username in usernames],
+                                 batch_size=BATCH_SIZE)
+        users = new_rows(User, start)
+        # bulk_create does not send the post_save signal that creates profiles
+        start = last_pk(Profile)
+        Profile.objects.bulk_create([Profile(user=user, name=user.username, year=self.rng.choice(YEARS))
+                                     for user in users], batch_size=BATCH_SIZE)
+        profiles = new_rows(Profile, start)
+
+        courses_by_department = dict()
+        for course in courses:
+            courses_by_department.setdefault(course.department_id, []).append(course)
+        majors_by_department = dict((major.department_id, major) for major in majors)
+        user_majors, user_minors, completed, schedules, schedule_sections = [], [], [], [], []
+        for profile in profiles:
+            major = self.rng.choice(majors)
+            user_majors.append(UserMajor(name=profile, major=major))
+            if self.rng.random() < 0.3:
+                user_minors.append(Profile.minors.through(profile_id=profile.pk, requirementset_id=self.rng.choice(minors).pk))
+            # Students mostly take courses in their major, lower levels first
+            history_size = YEARS.index(profile.year) * 10 + self.rng.randint(0, 8)
+            department_courses = sorted(courses_by_department.get(major.department_id, []), key=lambda c: c.number_int)
+            history = department_courses[:history_size // 2] + self.rng.sample(courses, min(len(courses), history_size // 2))
+            completed.extend(CompletedCourse(user=profile, course=course, grade=self.rng.choice(GRADES))
+                             for course in set(history))
+            schedules.append(Schedule(name='%s Spring' % profile.name, user=profile))
+        UserMajor.objects.bulk_create(user_majors, batch_size=BATCH_SIZE)
+        Profile.minors.through.objects.bulk_create(user_minors, batch_size=BATCH_SIZE)
+        CompletedCourse.objects.bulk_create(completed, batch_size=BATCH_SIZE)
+        start = last_pk(Schedule)
+        Schedule.objects.bulk_create(schedules, batch_size=BATCH_SIZE)
+        for schedule in new_rows(Schedule, start):
+            occupancy, chosen = 0, []
+            for section in self.rng.sample(sections, min(len(sections), 12)):
+                if len(chosen) < 5 and not occupancy & section.occupancy():
+                    occupancy |= section.occupancy()
+                    chosen.append(Schedule.sections.through(schedule_id=schedule.pk, section_id=section.pk))
+            schedule_sections.extend(chosen)
+        Schedule.sections.through.objects.bulk_create(schedule_sections, batch_size=BATCH_SIZE)
+        return profiles, len(completed), len(schedule_sections)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        with transaction.atomic():
+            departments = self.stage('departments', self.create_departments, options['departments'])
+            courses = self.stage('courses', self.create_courses, departments, options['courses'])
+            prereqs, cross_listings = self.stage('prerequisites', self.link_courses, courses)
+            sections = self.stage('sections', self.create_sections, courses, options['sections'])
+            majors, minors = self.stage('requirements', self.create_requirement_sets, departments)
+            profiles, completed, scheduled = self.stage('students', self.create_students, options['students'],
+                                                        options['prefix'], options['password'], majors, minors,
+                                                        courses, sections)
+            self.stage('search index', get_search_backend().rebuild)
+        # bulk_create sends no signals
+        invalidate_facets()
+        invalidate_availability()
+        invalidate_prerequisite_graph()
+        self.stdout.write('Created %d departments, %d courses (%d prerequisites, %d cross-listings), %d sections, '
+                          '%d requirement sets and %d students (%d completed courses, %d scheduled sections)'
+                          % (len(departments), len(courses), prereqs, cross_listings, len(sections),
+                             len(majors) + len(minors), len(profiles), completed, scheduled))
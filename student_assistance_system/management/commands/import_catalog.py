@@ -0,0 +1,291 @@
+import csv
+import datetime
+import json
+import re
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from student_assistance_system.audit import invalidate_all_audits
+from student_assistance_system.availability import invalidate_availability
+from student_assistance_system.facets import invalidate_facets
+from student_assistance_system.models import (Course, Department, MeetingTime, Requirement, Section, parse_course_number,
+                                              summarize_meeting_times)
+from student_assistance_system.search import get_search_backend
+
+BATCH_SIZE = 500
+# Upper bound on the parameters of a single id IN (...) lookup, below SQLite's limit of 999
+LOOKUP_SIZE = 500
+DAYS = ['M', 'T', 'W', 'Th', 'F', 'Sa', 'Su']
+DAY_PATTERN = re.compile('Th|Sa|Su|M|T|W|F')
+MEETING_PATTERN = re.compile(r'^([A-Za-z]+)\s+(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})$')
+COURSE_FIELDS = ('name', 'description', 'credit_hours')
+SECTION_FIELDS = ('course_id', 'capacity', 'enrolled', 'professor', 'location', 'meeting_mask', 'day_mask',
+                  'earliest_start', 'latest_end')
+MAX_REPORTED_ERRORS = 10
+
+
+def chunked(items, size):
+    """
+    Splits any iterable into lists of at most size items, without reading ahead of the current list
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_meetings(meetings):
+    """
+    Parses meetings written as days and a time range, e.g. 'MWF 9:00-9:50; TTh 13:00-14:15'
+    :param meetings: A string of meetings separated by semicolons, or a list of meetings
+    :return: A list of (day, start time, end time) tuples
+    """
+    if not isinstance(meetings, list):
+        meetings = ('%s' % (meetings or '')).split(';')
+    times = []
+    for meeting in meetings:
+        meeting = meeting.strip()
+        if not meeting:
+            continue
+        match = MEETING_PATTERN.match(meeting)
+        days = DAY_PATTERN.findall(match.group(1)) if match else []
+        if not match or ''.join(days) != match.group(1):
+            raise ValueError('Cannot parse meeting %r' % meeting)
+        start, end = [datetime.time(*[int(part) for part in t.split(':')]) for t in match.group(2, 3)]
+        times.extend((DAYS.index(day), start, end) for day in days)
+    return times
+
+
+def clean_row(row):
+    """
+    Checks and converts a row of a catalog export
+    :return: A dict of the row's values
+    """
+    def text(key, required=True):
+        value = '%s' % (row.get(key) if row.get(key) is not None else '')
+        value = value.strip()
+        if required and not value:
+            raise ValueError('Missing %s' % key)
+        return value
+
+    def number(key, default=None):
+        value = text(key, default is None)
+        try:
+            return int(value) if value else default
+        except ValueError:
+            raise ValueError('%s is not a number: %r' % (key, value))
+
+    return dict(department=text('department').upper(), department_name=text('department_name', False),
+                course_number=text('course_number').upper(), name=text('name'),
+                description=text('description', False), credit_hours=number('credit_hours'), crn=text('crn'),
+                professor=text('professor', False), location=text('location', False), capacity=number('capacity'),
+                enrolled=number('enrolled', 0), meetings=parse_meetings(row.get('meetings')))
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, dict((key, value.decode('utf-8') if isinstance(value, bytes) else value)
+                                    for key, value in row.items() if key)
+
+
+def read_jsonl(lines):
+    for line_number, line in enumerate(lines, 1):
+        if line.strip():
+            yield line_number, json.loads(line)
+
+
+class Command(BaseCommand):
+    help = ('Imports a registrar catalog export in CSV or JSON Lines, one row per section. Courses are matched by '
+            'department and course number and sections by CRN; existing rows are updated and the rest are created.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the extension of the file')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='The number of rows written in each transaction')
+
+    def load(self):
+        """
+        Loads the natural keys of the existing catalog, so rows can be matched without a query each
+        """
+        self.departments = dict((abbr.upper(), pk) for abbr, pk in Department.objects.values_list('abbr_name', 'pk'))
+        self.courses = dict(((department_id, number.upper()), pk) for pk, department_id, number in
+                            Course.objects.values_list('pk', 'department_id', 'course_number'))
+        self.sections = dict(Section.objects.exclude(crn=None).values_list('crn', 'pk'))
+        MeetingTime.intern_all()
+        self.meeting_times = dict()
+        self.imported_courses = set()
+
+    def read_rows(self, path, format):
+        """
+        Yields the valid rows of the export one at a time; invalid rows are counted and skipped
+        """
+        reader = read_csv if format == 'csv' else read_jsonl
+        with open(path, 'rb' if format == 'csv' else 'r') as f:
+            for line_number, row in reader(f):
+                try:
+                    yield clean_row(row)
+                except (ValueError, AttributeError) as e:
+                    self.counts['skipped'] += 1
+                    if len(self.errors) < MAX_REPORTED_ERRORS:
+                        self.errors.append('Line %d: %s' % (line_number, e))
+
+    def department_id(self, row):
+        if row['department'] not in self.departments:
+            self.departments[row['department']] = Department.objects.create(
+                abbr_name=row['department'], full_name=row['department_name'] or row['department']).pk
+            self.counts['departments created'] += 1
+        return self.departments[row['department']]
+
+    def meeting_time(self, key):
+        """
+        :return: The meeting time, created the first time it is seen
+        """
+        if key not in self.meeting_times:
+            self.meeting_times[key] = MeetingTime.get_or_intern(*key)
+        return self.meeting_times[key]
+
+    def import_courses(self, rows):
+        """
+        Creates the courses of the rows that do not exist yet and updates the others, once per import
+        :return: The ids of the created courses, and the ids of the updated courses
+        """
+        new, existing, created = dict(), dict(), []
+        for row in rows:
+            key = (self.department_id(row), row['course_number'])
+            if key not in self.imported_courses:
+                self.imported_courses.add(key)
+                if key in self.courses:
+                    existing[self.courses[key]] = row
+                else:
+                    new[key] = row
+        if new:
+            courses = []
+            for (department_id, number), row in new.items():
+                course = Course(department_id=department_id, course_number=number,
+                                **dict((field, row[field]) for field in COURSE_FIELDS))
+                # bulk_create bypasses Course.save, which normally fills in the normalized course number
+                course.number_int, course.number_suffix = parse_course_number(number)
+                courses.append(course)
+            Course.objects.bulk_create(courses, batch_size=self.batch_size)
+            for numbers in chunked(set(number for department_id, number in new), LOOKUP_SIZE):
+                for pk, department_id, number in Course.objects.filter(course_number__in=numbers).values_list(
+                        'pk', 'department_id', 'course_number'):
+                    if (department_id, number) in new:
+                        self.courses[(department_id, number)] = pk
+                        created.append(pk)
+            self.counts['courses created'] += len(new)
+
+        updated = []
+        for ids in chunked(existing, LOOKUP_SIZE):
+            for values in Course.objects.filter(pk__in=ids).values_list('pk', *COURSE_FIELDS):
+                row = existing[values[0]]
+                if values[1:] != tuple(row[field] for field in COURSE_FIELDS):
+                    Course.objects.filter(pk=values[0]).update(**dict((field, row[field]) for field in COURSE_FIELDS))
+                    updated.append(values[0])
+        self.counts['courses updated'] += len(updated)
+        return created, updated
+
+    def section_values(self, row):
+        """
+        :return: The (field values, meeting time ids) of the row's section
+        """
+        meeting_times = [self.meeting_time(key) for key in row['meetings']]
+        # bulk_create and update do not send the signals that maintain the meeting time summary, so it is filled in here
+        values = dict(course_id=self.courses[(self.departments[row['department']], row['course_number'])],
+                      capacity=row['capacity'], enrolled=row['enrolled'], professor=row['professor'],
+                      location=row['location'], **summarize_meeting_times(meeting_times))
+        return values, set(meeting_time.pk for meeting_time in meeting_times)
+
+    def import_sections(self, rows):
+        """
+        Creates the sections of the rows that do not exist yet and updates the others
+        :return: The ids of the created and updated sections
+        """
+        # The last row for a CRN wins
+        rows = dict((row['crn'], self.section_values(row)) for row in rows)
+        new = [crn for crn in rows if crn not in self.sections]
+        existing = dict((self.sections[crn], rows[crn]) for crn in rows if crn in self.sections)
+        Section.objects.bulk_create([Section(crn=crn, **rows[crn][0]) for crn in new], batch_size=self.batch_size)
+        for crns in chunked(new, LOOKUP_SIZE):
+            self.sections.update(Section.objects.filter(crn__in=crns).values_list('crn', 'pk'))
+        meetings = [(self.sections[crn], rows[crn][1]) for crn in new]
+
+        updated = []
+        for ids in chunked(existing, LOOKUP_SIZE):
+            current_meetings = dict((pk, set()) for pk in ids)
+            for section_id, meeting_time_id in Section.meeting_times.through.objects.filter(
+                    section_id__in=ids).values_list('section_id', 'meetingtime_id'):
+                current_meetings[section_id].add(meeting_time_id)
+            moved = []
+            for current in Section.objects.filter(pk__in=ids).values('pk', *SECTION_FIELDS):
+                pk = current.pop('pk')
+                values, meeting_time_ids = existing[pk]
+                if current != values:
+                    Section.objects.filter(pk=pk).update(**values)
+                if current_meetings[pk] != meeting_time_ids:
+                    moved.append(pk)
+                    meetings.append((pk, meeting_time_ids))
+                if current != values or current_meetings[pk] != meeting_time_ids:
+                    updated.append(pk)
+            Section.meeting_times.through.objects.filter(section_id__in=moved).delete()
+
+        Section.meeting_times.through.objects.bulk_create([
+            Section.meeting_times.through(section_id=section_id, meetingtime_id=meeting_time_id)
+            for section_id, meeting_time_ids in meetings for meeting_time_id in meeting_time_ids],
+            batch_size=self.batch_size)
+        self.counts['sections created'] += len(new)
+        self.counts['sections updated'] += len(updated)
+        return [self.sections[crn] for crn in new] + updated
+
+    def handle(self, *args, **options):
+        path, format, self.batch_size = options['path'], options['format'], options['batch_size']
+        if format is None:
+            format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        if self.batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        try:
+            open(path).close()
+        except IOError as e:
+            raise CommandError('Cannot read %s: %s' % (path, e))
+
+        self.counts = dict.fromkeys(['departments created', 'courses created', 'courses updated', 'sections created',
+                                     'sections updated', 'meeting times created', 'skipped'], 0)
+        self.errors = []
+        start, imported = time.time(), 0
+        meeting_times = MeetingTime.objects.count()
+        self.load()
+        search = get_search_backend()
+        requirements = list(Requirement.objects.all())
+        for rows in chunked(self.read_rows(path, format), self.batch_size):
+            with transaction.atomic():
+                created_courses, updated_courses = self.import_courses(rows)
+                # Requirements match courses with stored queries, whose compiled memberships are brought up to date
+                for course_ids in chunked(created_courses + updated_courses, LOOKUP_SIZE):
+                    for requirement in requirements:
+                        requirement.refresh_courses(course_ids)
+                section_ids = set(self.import_sections(rows))
+                # Queryset writes send no signals, so the search index is brought up to date here
+                for course_ids in chunked(updated_courses, LOOKUP_SIZE):
+                    section_ids.update(Section.objects.filter(course__in=course_ids).values_list('pk', flat=True))
+                search.index_sections(section_ids)
+            imported += len(rows)
+            self.stdout.write('%9d rows %9.0f rows/s' % (imported, imported / max(time.time() - start, 1e-6)))
+        self.counts['meeting times created'] = MeetingTime.objects.count() - meeting_times
+        if any(count for name, count in self.counts.items() if name != 'skipped'):
+            invalidate_all_audits()
+            invalidate_facets()
+            invalidate_availability()
+
+        for error in self.errors:
+            self.stderr.write(error)
+        elapsed = time.time() - start
+        self.stdout.write('Imported %d rows in %.2fs (%.0f rows/s): %s' % (
+            imported, elapsed, imported / max(elapsed, 1e-6),
+            ', '.join('%d %s' % (self.counts[name], name) for name in sorted(self.counts))))
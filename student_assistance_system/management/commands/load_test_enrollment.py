@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count, F
+
+from student_assistance_system.enrollment import EnrollmentError, drop, enroll
+from student_assistance_system.facets import invalidate_facets
+from student_assistance_system.management.commands.generate_catalog import BATCH_SIZE, last_pk, new_rows
+from student_assistance_system.models import Course, Department, Enrollment, Profile, Section, WaitlistEntry
+
+DEPARTMENT = 'LOADTEST'
+# Attempts at a request that fails because the database is locked, as SQLite reports when a lock wait times out
+ATTEMPTS = 10
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+class Command(BaseCommand):
+    help = ('Fires concurrent enroll and drop requests at a few sections from a pool of threads, then checks that '
+            'no section was overbooked and reports the throughput')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sections', type=int, default=5)
+        parser.add_argument('--capacity', type=int, default=30)
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--drop-rate', type=float, default=0.2, help='Fraction of the requests that are drops')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the sections and students afterwards')
+
+    def create_data(self, options):
+        if Department.objects.filter(abbr_name=DEPARTMENT).exists():
+            raise CommandError('A %s department already exists; delete it or the rows of an earlier --keep run' % DEPARTMENT)
+        department = Department.objects.create(full_name='Load test', abbr_name=DEPARTMENT)
+        course = Course.objects.create(name='Load test', description='', course_number='100', department=department,
+                                       credit_hours=3)
+        Section.objects.bulk_create([Section(course=course, capacity=options['capacity'], enrolled=0, professor='Staff',
+                                             location='TBA') for i in range(0, options['sections'])])
+        sections = list(Section.objects.filter(course=course).order_by('pk').values_list('pk', flat=True))
+
+        password = make_password(None)
+        start = last_pk(User)
+        User.objects.bulk_create([User(username='loadtest%05d' % i, password=password)
+                                  for i in range(0, options['students'])], batch_size=BATCH_SIZE)
+        users = new_rows(User, start)
+        # bulk_create does not send the post_save signal that creates profiles
+        start = last_pk(Profile)
+        Profile.objects.bulk_create([Profile(user=user, name=user.username, year='') for user in users],
+                                    batch_size=BATCH_SIZE)
+        profiles = [profile.pk for profile in new_rows(Profile, start)]
+        return department, sections, users, profiles
+
+    def worker(self, requests, outcomes, latencies, lock):
+        counts, times = Counter(), []
+        try:
+            for profile, section, action in requests:
+                start = time.time()
+                for attempt in range(0, ATTEMPTS):
+                    try:
+                        if action is enroll:
+                            counts[enroll(profile, section)] += 1
+                        else:
+                            counts['dropped' if drop(profile, section) is None else 'dropped, seat passed on'] += 1
+                    except EnrollmentError as e:
+                        counts['rejected (%s)' % e.reason] += 1
+                    except OperationalError:
+                        counts['retries'] += 1
+                        time.sleep(0.001 * 2 ** attempt)
+                        continue
+                    break
+                else:
+                    counts['errors'] += 1
+                times.append(time.time() - start)
+        finally:
+            # Every thread has its own connection
+            connection.close()
+            with lock:
+                outcomes.update(counts)
+                latencies.extend(times)
+
+    def verify(self, sections):
+        """
+        :return: Descriptions of every inconsistency between the enrollment counters, enrollments and waitlists
+        """
+        counts = dict(Enrollment.objects.filter(section__in=sections).values_list('section').annotate(Count('pk')))
+        problems = []
+        for pk, enrolled, capacity in Section.objects.filter(pk__in=sections).values_list('pk', 'enrolled', 'capacity'):
+            taken = max(enrolled, counts.get(pk, 0))
+            if taken > capacity:
+                problems.append('Section %d is overbooked: %d students in %d seats' % (pk, taken, capacity))
+            if enrolled != counts.get(pk, 0):
+                problems.append('Section %d counts %d enrolled but has %d enrollments' % (pk, enrolled, counts.get(pk, 0)))
+        problems += ['Section %d has open seats and a waitlist' % pk for pk in WaitlistEntry.objects.filter(
+            section__in=sections, section__enrolled__lt=F('section__capacity')).values_list('section', flat=True).distinct()]
+        both = set(Enrollment.objects.filter(section__in=sections).values_list('section', 'user')) & set(
+            WaitlistEntry.objects.filter(section__in=sections).values_list('section', 'user'))
+        problems += ['Student %d is both enrolled in and waitlisted for section %d' % (user, section)
+                     for section, user in sorted(both)]
+        return problems
+
+    def weighted_choice(self, rng, choices, weights):
+        point = rng.random() * sum(weights)
+        for choice, weight in zip(choices, weights):
+            point -= weight
+            if point < 0:
+                return choice
+        return choices[-1]
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        department, sections, users, profiles = self.create_data(options)
+        try:
+            # A few popular sections get most of the requests, so that they fill up and requests contend for seats
+            weights = [1.0 / (rank + 1) for rank in range(0, len(sections))]
+            requests = [(rng.choice(profiles), self.weighted_choice(rng, sections, weights),
+                         drop if rng.random() < options['drop_rate'] else enroll) for i in range(0, options['requests'])]
+            outcomes, latencies, lock = Counter(), [], threading.Lock()
+            threads = [threading.Thread(target=self.worker,
+                                        args=(requests[i::options['threads']], outcomes, latencies, lock))
+                       for i in range(0, options['threads'])]
+            start = time.time()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.time() - start
+
+            self.stdout.write('%d requests from %d threads in %.3fs: %.1f requests/s, latency p50 %.1fms, p99 %.1fms'
+                              % (len(requests), len(threads), elapsed, len(requests) / elapsed,
+                                 percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000))
+            for outcome, count in sorted(outcomes.items()):
+                self.stdout.write('  %-24s %6d' % (outcome, count))
+            seats = Section.objects.filter(pk__in=sections).values_list('enrolled', 'capacity')
+            self.stdout.write('%d of %d seats taken, %d students waitlisted'
+                              % (sum(e for e, c in seats), sum(c for e, c in seats),
+                                 WaitlistEntry.objects.filter(section__in=sections).count()))
+            problems = self.verify(sections)
+            if outcomes['errors']:
+                problems.append('%d requests failed' % outcomes['errors'])
+        finally:
+            if not options['keep']:
+                department.delete()
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+                invalidate_facets()
+        if problems:
+            raise CommandError('\n'.join(problems))
+        self.stdout.write('No section was overbooked')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from student_assistance_system.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the section search index from the course, department and section tables'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild()
+        self.stdout.write('Rebuilt the %s search index' % type(backend).__name__)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from student_assistance_system.models import Requirement
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the compiled requirement course memberships from the stored requirement queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requirement', type=int, action='append', dest='requirements',
+                            help='Only refresh the requirement with this id (may be repeated)')
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only re-evaluate memberships for the course with this id (may be repeated)')
+
+    def handle(self, *args, **options):
+        requirements = Requirement.objects.all()
+        if options['requirements']:
+            requirements = requirements.filter(pk__in=options['requirements'])
+        with transaction.atomic():
+            for requirement in requirements:
+                requirement.refresh_courses(options['courses'])
+                self.stdout.write('Refreshed %s: %d courses' % (requirement, requirement.courses.count()))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 13:56
+from __future__ import unicode_literals
+
+import pickle
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def compile_requirement_courses(apps, schema_editor):
+    Course = apps.get_model('student_assistance_system', 'Course')
+    Requirement = apps.get_model('student_assistance_system', 'Requirement')
+    RequirementCourse = apps.get_model('student_assistance_system', 'RequirementCourse')
+    for requirement in Requirement.objects.all():
+        course_set = Course.objects.all()
+        course_set.query = pickle.loads(requirement.query)
+        RequirementCourse.objects.bulk_create([RequirementCourse(requirement_id=requirement.pk, course_id=course_id)
+                                               for course_id in set(course_set.values_list('pk', flat=True))])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0010_auto_20161122_2038'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequirementCourse',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_assistance_system.Course')),
+                ('requirement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_assistance_system.Requirement')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='requirement',
+            name='courses',
+            field=models.ManyToManyField(through='student_assistance_system.RequirementCourse', to='student_assistance_system.Course'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='requirementcourse',
+            unique_together=set([('requirement', 'course')]),
+        ),
+        migrations.RunPython(compile_requirement_courses, migrations.RunPython.noop),
+    ]
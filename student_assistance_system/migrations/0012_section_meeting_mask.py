@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 13:57
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+def compute_meeting_masks(apps, schema_editor):
+    Section = apps.get_model('student_assistance_system', 'Section')
+    for section in Section.objects.prefetch_related('meeting_times'):
+        occupancy = 0
+        for meeting_time in section.meeting_times.all():
+            first = (meeting_time.start_time.hour * 60 + meeting_time.start_time.minute) // SLOT_MINUTES
+            last = (meeting_time.end_time.hour * 60 + meeting_time.end_time.minute) // SLOT_MINUTES
+            if last >= first:
+                occupancy |= ((1 << (last - first + 1)) - 1) << (meeting_time.day * SLOTS_PER_DAY + first)
+        Section.objects.filter(pk=section.pk).update(meeting_mask='%x' % occupancy)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0011_requirementcourse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='meeting_mask',
+            field=models.TextField(default='0', editable=False),
+        ),
+        migrations.RunPython(compute_meeting_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:06
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def normalize_course_numbers(apps, schema_editor):
+    Course = apps.get_model('student_assistance_system', 'Course')
+    for course in Course.objects.all():
+        number, suffix = course.course_number, ''
+        if number and not number[-1].isdigit():
+            number, suffix = number[:-1], number[-1].upper()
+        Course.objects.filter(pk=course.pk).update(number_int=int(number) if number.isdigit() else 999,
+                                                   number_suffix=suffix)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0012_section_meeting_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='number_int',
+            field=models.IntegerField(default=999, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='number_suffix',
+            field=models.CharField(blank=True, default='', editable=False, max_length=1),
+        ),
+        migrations.AlterIndexTogether(
+            name='course',
+            index_together=set([('number_int', 'number_suffix')]),
+        ),
+        migrations.RunPython(normalize_course_numbers, migrations.RunPython.noop),
+    ]
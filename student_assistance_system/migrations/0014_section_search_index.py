@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+INDEX_TABLE = 'student_assistance_system_sectionsearch'
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE {index} USING fts5(name, description, department, professor, tokenize='unicode61')",
+    "CREATE VIRTUAL TABLE {index}_vocab USING fts5vocab({index}, 'row')",
+    "INSERT INTO {index} (rowid, name, description, department, professor) "
+    "SELECT s.id, c.name, c.description, d.abbr_name, s.professor FROM student_assistance_system_section s "
+    "INNER JOIN student_assistance_system_course c ON s.course_id = c.id "
+    "INNER JOIN student_assistance_system_department d ON c.department_id = d.id",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE {index}_vocab",
+    "DROP TABLE {index}",
+]
+POSTGRES_FORWARD = [
+    "CREATE TABLE {index} (section_id integer PRIMARY KEY, document tsvector NOT NULL)",
+    "CREATE INDEX {index}_document ON {index} USING GIN (document)",
+    "INSERT INTO {index} (section_id, document) SELECT s.id, "
+    "setweight(to_tsvector('simple', c.name), 'A') || setweight(to_tsvector('simple', d.abbr_name), 'B') || "
+    "setweight(to_tsvector('simple', s.professor), 'C') || setweight(to_tsvector('simple', c.description), 'D') "
+    "FROM student_assistance_system_section s "
+    "INNER JOIN student_assistance_system_course c ON s.course_id = c.id "
+    "INNER JOIN student_assistance_system_department d ON c.department_id = d.id",
+]
+POSTGRES_BACKWARD = [
+    "DROP TABLE {index}",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement.format(index=INDEX_TABLE))
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0013_course_number_int'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_for_vendor(dict(sqlite=SQLITE_FORWARD, postgresql=POSTGRES_FORWARD)),
+                             run_for_vendor(dict(sqlite=SQLITE_BACKWARD, postgresql=POSTGRES_BACKWARD))),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:22
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def compute_canonical_courses(apps, schema_editor):
+    Course = apps.get_model('student_assistance_system', 'Course')
+    parents = dict()
+
+    def find(course_id):
+        while parents.setdefault(course_id, course_id) != course_id:
+            course_id = parents[course_id]
+        return course_id
+
+    for course_id, other_id in Course.also_offered_as.through.objects.values_list('from_course_id', 'to_course_id'):
+        root, other_root = find(course_id), find(other_id)
+        parents[max(root, other_root)] = min(root, other_root)
+    for course_id in list(parents):
+        Course.objects.filter(pk=course_id).update(canonical=find(course_id))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0014_section_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='canonical',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='student_assistance_system.Course'),
+        ),
+        migrations.RunPython(compute_canonical_courses, migrations.RunPython.noop),
+    ]
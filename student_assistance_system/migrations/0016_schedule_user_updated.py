@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:33
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0015_course_canonical'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='schedule',
+            index_together=set([('user', 'updated')]),
+        ),
+    ]
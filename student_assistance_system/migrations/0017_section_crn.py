@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:34
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0016_schedule_user_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='crn',
+            field=models.CharField(blank=True, max_length=10, null=True, unique=True),
+        ),
+    ]
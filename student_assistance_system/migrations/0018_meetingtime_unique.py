@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:38
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+CHUNK_SIZE = 500
+
+
+def merge_duplicate_meeting_times(apps, schema_editor):
+    MeetingTime = apps.get_model('student_assistance_system', 'MeetingTime')
+    Section = apps.get_model('student_assistance_system', 'Section')
+    Link = Section.meeting_times.through
+    kept, duplicates = dict(), dict()
+    for pk, day, start_time, end_time in MeetingTime.objects.order_by('pk').values_list('pk', 'day', 'start_time', 'end_time'):
+        key = (day, start_time, end_time)
+        if key in kept:
+            duplicates[pk] = kept[key]
+        else:
+            kept[key] = pk
+    duplicate_ids = list(duplicates)
+    if not duplicate_ids:
+        return
+
+    # Links are moved to the lowest id of each group, unless the section is already linked to it
+    linked = set(Link.objects.filter(meetingtime_id__in=set(duplicates.values())).values_list('section_id', 'meetingtime_id'))
+    moves, redundant = dict(), []
+    for start in range(0, len(duplicate_ids), CHUNK_SIZE):
+        links = Link.objects.filter(meetingtime_id__in=duplicate_ids[start:start + CHUNK_SIZE])
+        for pk, section_id, meeting_time_id in links.values_list('pk', 'section_id', 'meetingtime_id'):
+            target = (section_id, duplicates[meeting_time_id])
+            if target in linked:
+                redundant.append(pk)
+            else:
+                linked.add(target)
+                moves.setdefault(target[1], []).append(pk)
+    for meeting_time_id, link_ids in moves.items():
+        for start in range(0, len(link_ids), CHUNK_SIZE):
+            Link.objects.filter(pk__in=link_ids[start:start + CHUNK_SIZE]).update(meetingtime_id=meeting_time_id)
+    for start in range(0, len(redundant), CHUNK_SIZE):
+        Link.objects.filter(pk__in=redundant[start:start + CHUNK_SIZE]).delete()
+    for start in range(0, len(duplicate_ids), CHUNK_SIZE):
+        MeetingTime.objects.filter(pk__in=duplicate_ids[start:start + CHUNK_SIZE]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0017_section_crn'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_meeting_times, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='meetingtime',
+            unique_together=set([('day', 'start_time', 'end_time')]),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def summarize_meeting_times(apps, schema_editor):
+    Section = apps.get_model('student_assistance_system', 'Section')
+    for section in Section.objects.prefetch_related('meeting_times'):
+        meeting_times = list(section.meeting_times.all())
+        if meeting_times:
+            day_mask = 0
+            for meeting_time in meeting_times:
+                day_mask |= 1 << meeting_time.day
+            Section.objects.filter(pk=section.pk).update(
+                day_mask=day_mask, earliest_start=min(m.start_time for m in meeting_times),
+                latest_end=max(m.end_time for m in meeting_times))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0018_meetingtime_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='day_mask',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='earliest_start',
+            field=models.TimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='latest_end',
+            field=models.TimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(summarize_meeting_times, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='section',
+            index_together=set([('earliest_start', 'latest_end'), ('day_mask', 'earliest_start', 'latest_end')]),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.2 on 2026-10-18 14:57
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_assistance_system', '0019_section_meeting_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Enrollment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_assistance_system.Section')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_assistance_system.Profile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_assistance_system.Section')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='student_assistance_system.Profile')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='waitlistentry',
+            unique_together=set([('section', 'user')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='enrollment',
+            unique_together=set([('section', 'user')]),
+        ),
+    ]
@@ -4,11 +4,15 @@ import calendar
 from collections import defaultdict
 import pickle
 
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 
+# Meeting times are tracked as occupied slots of this many minutes in a weekly bitmap
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
 
 class Department(models.Model):
     full_name = models.CharField(max_length=50)
@@ -18,6 +22,18 @@ class Department(models.Model):
         return self.abbr_name
 
 
+def parse_course_number(course_number):
+    """
+    Splits a course number such as '121C' into its numeric part and letter suffix
+    :param course_number:
+    :return: A (number, suffix) pair; numbers that cannot be parsed sort as 999
+    """
+    suffix = ''
+    if course_number and not course_number[-1].isdigit():
+        course_number, suffix = course_number[:-1], course_number[-1].upper()
+    return int(course_number) if course_number.isdigit() else 999, suffix
+
+
 class Course(models.Model):
     name = models.CharField(max_length=50)
     description = models.CharField(max_length=5000)
@@ -26,6 +42,26 @@ class Course(models.Model):
     credit_hours = models.IntegerField()
     prereqs = models.ManyToManyField('self', symmetrical=False)
     also_offered_as = models.ManyToManyField('self')
+    # Normalized course_number used for range searches
+    number_int = models.IntegerField(default=999, editable=False)
+    number_suffix = models.CharField(max_length=1, default='', blank=True, editable=False)
+    # Lowest id among the courses this course is cross-listed with, or None if it is not cross-listed
+    canonical = models.ForeignKey('self', null=True, blank=True, editable=False, related_name='+',
+                                  on_delete=models.SET_NULL)
+
+    class Meta:
+        index_together = [('number_int', 'number_suffix')]
+
+    def save(self, *args, **kwargs):
+        self.number_int, self.number_suffix = parse_course_number(self.course_number)
+        super(Course, self).save(*args, **kwargs)
+
+    @property
+    def canonical_key(self):
+        """
+        The id shared by this course and every course it is cross-listed with
+        """
+        return self.canonical_id or self.pk
 
     def __unicode__(self):
         return self.name
@@ -36,12 +72,32 @@ class Requirement(models.Model):
     required_hours = models.IntegerField(default=None, blank=True, null=True)
     required_classes = models.IntegerField(default=None, blank=True, null=True)
     query = models.TextField()
+    courses = models.ManyToManyField(Course, through='RequirementCourse')
 
     def get_course_set(self):
         course_set = Course.objects.all()
         course_set.query = pickle.loads(self.query)
         return course_set
 
+    def refresh_courses(self, courses=None):
+        """
+        Rebuilds the compiled course memberships of this requirement from its stored query
+        :param courses: If given, only memberships for these courses are re-evaluated
+        """
+        course_set = self.get_course_set()
+        memberships = RequirementCourse.objects.filter(requirement=self)
+        if courses is not None:
+            course_set = course_set.filter(pk__in=courses)
+            memberships = memberships.filter(course__in=courses)
+        matching = set(course_set.values_list('pk', flat=True))
+        existing = set(memberships.values_list('course_id', flat=True))
+        memberships.filter(course_id__in=existing - matching).delete()
+        RequirementCourse.objects.bulk_create([RequirementCourse(requirement=self, course_id=course_id)
+                                               for course_id in matching - existing])
+        # bulk_create sends no signals, so cached audits are invalidated directly
+        from .audit import invalidate_all_audits
+        invalidate_all_audits()
+
     def get_course_statuses(self, user, schedule):
         """
         Gets the statuses for the set of courses that can fulfill this requirement.
@@ -50,12 +106,19 @@ class Requirement(models.Model):
         :param schedule:
         :return: A dict mapping courses to statuses
         """
-        course_set = self.get_course_set()
+        course_set = self.courses.all()
         course_statuses = dict.fromkeys(course_set, 'U')
-        for section in schedule.sections.filter(course__in=course_set):
-            course_statuses[section.course] = 'S'
-        for cc in user.profile.completedcourse_set.filter(course__in=course_set):
-            course_statuses[cc.course] = 'F'
+        # Cross-listed courses count as one another
+        by_key = defaultdict(list)
+        for course in course_statuses:
+            by_key[course.canonical_key].append(course)
+        matching = models.Q(course__in=by_key.keys()) | models.Q(course__canonical__in=by_key.keys())
+        for section in schedule.sections.filter(matching).select_related('course'):
+            for course in by_key[section.course.canonical_key]:
+                course_statuses[course] = 'S'
+        for cc in user.profile.completedcourse_set.filter(matching).select_related('course'):
+            for course in by_key[cc.course.canonical_key]:
+                course_statuses[course] = 'F'
         return course_statuses
 
     def fulfillment_status(self, course_statuses):
@@ -65,8 +128,11 @@ class Requirement(models.Model):
         :param course_statuses:
         :return: The overall status for the requirement
         """
-        completed = [course for course, status in course_statuses.items() if status == 'F']
-        scheduled = [course for course, status in course_statuses.items() if status == 'S']
+        # Cross-listed courses are only counted once
+        completed = dict((course.canonical_key, course) for course, status in course_statuses.items() if status == 'F')
+        scheduled = dict((course.canonical_key, course) for course, status in course_statuses.items()
+                         if status == 'S' and course.canonical_key not in completed)
+        completed, scheduled = list(completed.values()), list(scheduled.values())
         if self.required_hours is not None:
             hours = sum([course.credit_hours for course in completed], 0)
             if hours >= self.required_hours:
@@ -80,10 +146,18 @@ class Requirement(models.Model):
             count += len(scheduled)
             return 'S' if count >= self.required_classes else 'U'
 
-    def get_course_suggestions(self, course_statuses, schedule):
-        unfulfilled_sections = [s for c, st in course_statuses.items() if st == 'U' for s in c.section_set.all()]
-        valid_suggestions = [s for s in unfulfilled_sections if not any([s.conflicts_with(s2) for s2 in schedule.sections.all()])]
-        return valid_suggestions
+    def get_course_suggestions(self, course_statuses, schedule, limit=None, completed=None):
+        """
+        Gets sections of unfulfilled courses that fit into the schedule
+        :param course_statuses:
+        :param schedule:
+        :param limit: The maximum number of suggestions to return
+        :param completed: If given, the ids of the user's completed courses, used to leave out courses they are not eligible for
+        :return: A list of sections that do not conflict with the schedule
+        """
+        from .suggestions import get_suggestions
+        unfulfilled_courses = [c.pk for c, st in course_statuses.items() if st == 'U']
+        return get_suggestions(unfulfilled_courses, schedule, limit, completed)
 
     def __unicode__(self):
         return self.name
@@ -92,14 +166,24 @@ class Requirement(models.Model):
 def create_requirement(requirement_name, required_hours, required_classes, queryset):
     if (required_hours is None) ^ (required_classes is None):
         query = pickle.dumps(queryset.query)
-        return Requirement.objects.create(name=requirement_name,
-                                          required_hours=required_hours,
-                                          required_classes=required_classes,
-                                          query=query)
+        requirement = Requirement.objects.create(name=requirement_name,
+                                                 required_hours=required_hours,
+                                                 required_classes=required_classes,
+                                                 query=query)
+        requirement.refresh_courses()
+        return requirement
     else:
         raise ValueError('One of required_hours and required_classes must be None and the other must have a value')
 
 
+class RequirementCourse(models.Model):
+    requirement = models.ForeignKey(Requirement)
+    course = models.ForeignKey(Course)
+
+    class Meta:
+        unique_together = ('requirement', 'course')
+
+
 class RequirementSet(models.Model):
     name = models.CharField(max_length=50)
     department = models.ForeignKey(Department)
@@ -142,6 +226,33 @@ class MeetingTime(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
 
+    class Meta:
+        unique_together = [('day', 'start_time', 'end_time')]
+
+    @classmethod
+    def get_or_intern(cls, day, start_time, end_time):
+        """
+        Gets the meeting time with the given day and times, creating it if needed. Ids are remembered in this
+        process once the transaction that read or created them commits, so repeated lookups issue no queries.
+        :return: A MeetingTime
+        """
+        key = (day, start_time, end_time)
+        if key not in _interned_meeting_times:
+            meeting_time, created = cls.objects.get_or_create(day=day, start_time=start_time, end_time=end_time)
+            transaction.on_commit(lambda: _interned_meeting_times.setdefault(key, meeting_time.pk))
+            return meeting_time
+        return cls.from_db(cls.objects.db, ['id', 'day', 'start_time', 'end_time'],
+                           [_interned_meeting_times[key], day, start_time, end_time])
+
+    @classmethod
+    def intern_all(cls):
+        """
+        Loads every meeting time into this process's interning map with a single query
+        """
+        rows = list(cls.objects.values_list('pk', 'day', 'start_time', 'end_time'))
+        transaction.on_commit(lambda: _interned_meeting_times.update(
+            ((day, start_time, end_time), pk) for pk, day, start_time, end_time in rows))
+
     def day_abbr(self):
         return ['M', 'T', 'W', 'Th', 'F', 'Sa', 'Su'][self.day]
 
@@ -151,6 +262,19 @@ class MeetingTime(models.Model):
         else:
             return False
 
+    def occupancy(self):
+        """
+        Gets the slots of the week occupied by this meeting time. A slot is occupied if any minute of it,
+        including the end time itself, is spent meeting, so times that are not aligned to SLOT_MINUTES are
+        rounded outwards and may report conflicts that conflicts_with would not.
+        :return: A bitmap with one bit per slot, starting at midnight on Monday
+        """
+        first = (self.start_time.hour * 60 + self.start_time.minute) // SLOT_MINUTES
+        last = (self.end_time.hour * 60 + self.end_time.minute) // SLOT_MINUTES
+        if last < first:
+            return 0
+        return ((1 << (last - first + 1)) - 1) << (self.day * SLOTS_PER_DAY + first)
+
     def __unicode__(self):
         return ' '.join((calendar.day_name[self.day],
                          self.start_time.strftime('%H:%M'),
@@ -158,6 +282,65 @@ class MeetingTime(models.Model):
                          self.end_time.strftime('%H:%M')))
 
 
+# Ids of the meeting times seen by this process, by (day, start time, end time)
+_interned_meeting_times = dict()
+
+
+def summarize_meeting_times(meeting_times):
+    """
+    Computes the fields of a section that summarize its meeting times
+    :return: A dict of meeting_mask, day_mask, earliest_start and latest_end values
+    """
+    occupancy, day_mask = 0, 0
+    for meeting_time in meeting_times:
+        occupancy |= meeting_time.occupancy()
+        day_mask |= 1 << meeting_time.day
+    return dict(meeting_mask='%x' % occupancy, day_mask=day_mask,
+                earliest_start=min([m.start_time for m in meeting_times] or [None]),
+                latest_end=max([m.end_time for m in meeting_times] or [None]))
+
+
+def within_time_window(sections, days=None, start_time=None, end_time=None):
+    """
+    Filters sections down to those whose meetings all fall within a time window, using only indexed Section columns
+    :param days: The days meetings may be on, as numbers from 0 for Monday; sections without meetings never match
+    :param start_time: The earliest time meetings may start
+    :param end_time: The latest time meetings may end
+    """
+    if days:
+        allowed = 0
+        for day in days:
+            allowed |= 1 << day
+        # Every non-empty combination of the allowed days, so the day mask is matched by equality
+        sections = sections.filter(day_mask__in=[mask for mask in range(1, allowed + 1) if mask & ~allowed == 0])
+    if start_time:
+        sections = sections.filter(earliest_start__gte=start_time)
+    if end_time:
+        sections = sections.filter(latest_end__lte=end_time)
+    return sections
+
+
+def with_open_seats(sections):
+    """
+    Filters sections down to those with open seats, by comparing their seat columns in the database
+    """
+    return sections.filter(enrolled__lt=models.F('capacity'))
+
+
+def meeting_on(sections, days):
+    """
+    Filters sections down to those that meet on every one of the given days, and possibly on others
+    :param days: Day numbers, from 0 for Monday
+    """
+    required = 0
+    for day in days:
+        required |= 1 << day
+    if not required:
+        return sections
+    # As in within_time_window, the day masks are listed so that the indexed column is matched by equality
+    return sections.filter(day_mask__in=[mask for mask in range(1, 1 << 7) if mask & required == required])
+
+
 class Section(models.Model):
     course = models.ForeignKey(Course)
     capacity = models.IntegerField()
@@ -165,6 +348,15 @@ class Section(models.Model):
     meeting_times = models.ManyToManyField(MeetingTime)
     professor = models.CharField(max_length=30)
     location = models.CharField(max_length=30)
+    meeting_mask = models.TextField(default='0', editable=False)  # hex encoded occupancy of meeting_times
+    crn = models.CharField(max_length=10, unique=True, null=True, blank=True)  # registrar's course reference number
+    # Summary of meeting_times for time window searches: the days met on as a bitmask, and the overall time span
+    day_mask = models.IntegerField(default=0, editable=False)
+    earliest_start = models.TimeField(null=True, editable=False)
+    latest_end = models.TimeField(null=True, editable=False)
+
+    class Meta:
+        index_together = [('day_mask', 'earliest_start', 'latest_end'), ('earliest_start', 'latest_end')]
 
     def condensed_meeting_times(self):
         times = defaultdict(list)
@@ -172,7 +364,25 @@ class Section(models.Model):
             times[(time.start_time, time.end_time)].append(time.day_abbr())
         return [''.join(days) + ' ' + st.strftime('%-I:%M%p') + ' - ' + end.strftime('%-I:%M%p') for (st, end), days in times.iteritems()]
 
+    def occupancy(self):
+        return int(self.meeting_mask, 16)
+
+    def update_meeting_mask(self):
+        """
+        Brings meeting_mask and the other meeting time summary fields up to date with meeting_times
+        """
+        summary = summarize_meeting_times(list(self.meeting_times.all()))
+        for field, value in summary.items():
+            setattr(self, field, value)
+        Section.objects.filter(pk=self.pk).update(**summary)
+
     def conflicts_with(self, other_section):
+        return self.occupancy() & other_section.occupancy() != 0
+
+    def conflicts_with_pairwise(self, other_section):
+        """
+        Reference implementation of conflicts_with that compares every pair of meeting times
+        """
         for meeting_time in self.meeting_times.all():
             for other_meeting_time in other_section.meeting_times.all():
                 if meeting_time.conflicts_with(other_meeting_time):
@@ -180,12 +390,59 @@ class Section(models.Model):
         return False
 
 
+@receiver(m2m_changed, sender=Section.meeting_times.through)
+def update_meeting_masks(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.update_meeting_mask()
+    elif action == 'pre_clear':
+        instance._cleared_section_ids = list(instance.section_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        section_ids = instance.__dict__.pop('_cleared_section_ids', []) if action == 'post_clear' else pk_set
+        for section in Section.objects.filter(pk__in=section_ids):
+            section.update_meeting_mask()
+
+
+@receiver(post_save, sender=MeetingTime)
+def update_meeting_time_masks(sender, instance, created, **kwargs):
+    if not created:
+        _interned_meeting_times.clear()
+        for section in instance.section_set.all():
+            section.update_meeting_mask()
+
+
+@receiver(pre_delete, sender=MeetingTime)
+def collect_meeting_time_sections(sender, instance, **kwargs):
+    instance._deleted_section_ids = list(instance.section_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=MeetingTime)
+def update_deleted_meeting_time_masks(sender, instance, **kwargs):
+    _interned_meeting_times.clear()
+    for section in Section.objects.filter(pk__in=instance.__dict__.pop('_deleted_section_ids', [])):
+        section.update_meeting_mask()
+
+
+class ScheduleChangeError(ValueError):
+    def __init__(self, message, reason, section_ids):
+        """
+        :param reason: 'missing', 'conflict' or 'full'
+        :param section_ids: The ids of the sections at fault
+        """
+        super(ScheduleChangeError, self).__init__(message)
+        self.reason = reason
+        self.section_ids = sorted(section_ids)
+
+
 class Schedule(models.Model):
     name = models.CharField(max_length=50)
     sections = models.ManyToManyField(Section)
     user = models.ForeignKey(Profile)
     updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        index_together = [('user', 'updated')]
+
     def __unicode__(self):
         return self.name
 
@@ -201,12 +458,95 @@ class Schedule(models.Model):
         self.sections.add(section)
         self.save()
 
+    def change_sections(self, add=(), remove=()):
+        """
+        Adds and removes many sections in one transaction, saving the schedule once. The changes are checked
+        together before any is made: the added sections must exist, have seats left and not meet at the same
+        time as each other or the sections that stay in the schedule.
+        :param add: The sections, or their ids, to add
+        :param remove: The sections, or their ids, to remove
+        :raises ScheduleChangeError: If the changes cannot be made, in which case none are
+        """
+        add_ids = set(getattr(section, 'pk', section) for section in add)
+        remove_ids = set(getattr(section, 'pk', section) for section in remove) - add_ids
+        with transaction.atomic():
+            current = set(self.sections.values_list('pk', flat=True))
+            new_ids = add_ids - current
+            sections = dict((pk, (meeting_mask, enrolled, capacity)) for pk, meeting_mask, enrolled, capacity in
+                            Section.objects.filter(pk__in=(current - remove_ids) | add_ids).values_list(
+                                'pk', 'meeting_mask', 'enrolled', 'capacity'))
+            missing = add_ids - set(sections)
+            if missing:
+                raise ScheduleChangeError('No such sections', 'missing', missing)
+            full = [pk for pk in new_ids if sections[pk][1] >= sections[pk][2]]
+            if full:
+                raise ScheduleChangeError('Sections are full', 'full', full)
+            # Conflicts between sections that were already in the schedule are left alone
+            kept = [pk for pk in sections if pk not in new_ids]
+            occupancy = 0
+            for pk in kept:
+                occupancy |= int(sections[pk][0], 16)
+            conflicts = set()
+            for pk in sorted(new_ids):
+                mask = int(sections[pk][0], 16)
+                if mask & occupancy:
+                    conflicts.add(pk)
+                    conflicts.update(other for other in kept if int(sections[other][0], 16) & mask)
+                occupancy |= mask
+                kept.append(pk)
+            if conflicts:
+                raise ScheduleChangeError('Sections meet at the same time', 'conflict', conflicts)
+            if remove_ids & current:
+                self.sections.remove(*(remove_ids & current))
+            if new_ids:
+                self.sections.add(*new_ids)
+            if new_ids or remove_ids & current:
+                self.save()
+
+    def sections_prefetched(self):
+        return 'sections' in getattr(self, '_prefetched_objects_cache', {})
+
+    def occupancy(self):
+        occupancy = 0
+        if self.sections_prefetched():
+            meeting_masks = [section.meeting_mask for section in self.sections.all()]
+        else:
+            meeting_masks = self.sections.values_list('meeting_mask', flat=True)
+        for meeting_mask in meeting_masks:
+            occupancy |= int(meeting_mask, 16)
+        return occupancy
+
     def change_name(self, name):
         if name is None:
             raise ValueError('No Name Entered')
         self.name = name
         self.save()
 
+
+class Enrollment(models.Model):
+    """
+    A seat taken in a section. Section.enrolled counts these, and is kept in step by the enrollment module.
+    """
+    section = models.ForeignKey(Section)
+    user = models.ForeignKey(Profile)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('section', 'user')]
+
+
+class WaitlistEntry(models.Model):
+    """
+    A place in the queue for a full section. Entries are served in the order of their ids.
+    """
+    section = models.ForeignKey(Section)
+    user = models.ForeignKey(Profile)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('section', 'user')]
+
+
 class CompletedCourse(models.Model):
     user = models.ForeignKey(Profile)
     course = models.ForeignKey(Course)
@@ -0,0 +1,106 @@
+from __future__ import unicode_literals
+
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import attrgetter, or_
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPage(object):
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        """
+        :param next_cursor: The cursor of the following page, or None on the last page
+        :param previous_cursor: The cursor of the preceding page, or None on the first page
+        """
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator(object):
+    """
+    Pages through a queryset in a fixed order by filtering on the sort key of the row next to the page,
+    instead of skipping rows with OFFSET, so that every page costs the same as the first. Cursors are
+    opaque tokens holding that sort key and the direction of paging.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        """
+        :param ordering: Field lookups to sort by, all ascending; together they must be unique, e.g. by ending with pk
+        """
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.getters = [attrgetter(field.replace('__', '.')) for field in ordering]
+
+    def key(self, obj):
+        return [getter(obj) for getter in self.getters]
+
+    def encode(self, key, backwards):
+        return base64.urlsafe_b64encode(json.dumps([key, backwards]).encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode(self, cursor):
+        """
+        :return: The (sort key, backwards) of a cursor
+        """
+        try:
+            key, backwards = json.loads(base64.urlsafe_b64decode(str(cursor + '=' * (-len(cursor) % 4))).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise InvalidCursor('Invalid cursor %r' % cursor)
+        if not isinstance(key, list) or len(key) != len(self.ordering):
+            raise InvalidCursor('Invalid cursor %r' % cursor)
+        return key, bool(backwards)
+
+    def beyond(self, key, backwards):
+        """
+        :return: A filter for the rows after the sort key, or before it when paging backwards
+        """
+        lookup = '__lt' if backwards else '__gt'
+        alternatives, equal = [], Q()
+        for field, value in zip(self.ordering, key):
+            alternatives.append(equal & Q(**{field + lookup: value}))
+            equal &= Q(**{field: value})
+        return reduce(or_, alternatives)
+
+    def page(self, cursor=None):
+        """
+        :param cursor: A cursor from an earlier page, or None for the first page
+        :return: A CursorPage
+        """
+        key, backwards = self.decode(cursor) if cursor else (None, False)
+        rows = self.queryset.order_by(*[('-' if backwards else '') + field for field in self.ordering])
+        if key is not None:
+            rows = rows.filter(self.beyond(key, backwards))
+        # One extra row tells whether there is another page in the direction of paging
+        rows = list(rows[:self.per_page + 1])
+        more, rows = len(rows) > self.per_page, rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return CursorPage(rows, None, None)
+        # Paging backwards starts from a later page, and paging forwards from an earlier one unless on the first page
+        next_cursor = self.encode(self.key(rows[-1]), False) if backwards or more else None
+        previous_cursor = self.encode(self.key(rows[0]), True) if (more if backwards else key is not None) else None
+        return CursorPage(rows, next_cursor, previous_cursor)
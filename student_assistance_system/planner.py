@@ -0,0 +1,155 @@
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import prereqs
+from .audit import REQUIREMENTS_VERSION_KEY, RequirementAuditor, get_versions, profile_version_key
+from .models import Course
+
+DEFAULT_CREDIT_CAP = 18
+
+
+class PlannedTerm(object):
+    def __init__(self, number, courses):
+        self.number = number
+        self.courses = courses
+        self.credit_hours = sum(course.credit_hours for course in courses)
+
+
+class DegreePlan(object):
+    def __init__(self, terms, unmet, unplannable):
+        """
+        :param terms: A list of PlannedTerms
+        :param unmet: Requirements that cannot be fulfilled by any choice of their courses
+        :param unplannable: Courses that could not be placed because of prerequisite cycles
+        """
+        self.terms = terms
+        self.unmet = unmet
+        self.unplannable = unplannable
+        self.credit_hours = sum(term.credit_hours for term in terms)
+
+
+class DegreePlanner(object):
+    """
+    Plans the courses that remain for a student's unfulfilled requirements across terms. Courses are
+    chosen greedily for each requirement, preferring courses that count for several requirements and
+    then courses with the fewest missing prerequisites. The chosen courses and their missing
+    prerequisites are then placed by list scheduling: every term takes the available courses with the
+    longest chains of planned courses depending on them first, up to the credit-hour cap.
+    """
+
+    def __init__(self, audit, completed_ids, graph, credit_cap=DEFAULT_CREDIT_CAP):
+        """
+        :param audit: The result of RequirementAuditor.audit
+        :param completed_ids: The ids of the student's completed courses
+        :param graph: A PrerequisiteGraph
+        :param credit_cap: The maximum number of credit hours per term
+        """
+        self.audit = audit
+        self.completed_ids = set(completed_ids)
+        self.graph = graph
+        self.credit_cap = credit_cap
+        self.completed_mask = graph.mask(self.completed_ids)
+
+    def missing_prerequisites(self, course_id):
+        return self.graph.course_ids(self.graph.closure.get(course_id, 0) & ~self.completed_mask)
+
+    def choose_courses(self):
+        """
+        :return: A (set of chosen course ids, list of unmet requirements) pair
+        """
+        results = [result for req_set, results in self.audit for result in results if result.status != 'F']
+        candidates = dict()
+        for result in results:
+            for course, status in result.course_statuses.items():
+                if status == 'U':
+                    candidates[course.pk] = course
+        # How many remaining requirements each course could count towards
+        uses = dict.fromkeys(candidates, 0)
+        for result in results:
+            for course, status in result.course_statuses.items():
+                if status == 'U':
+                    uses[course.pk] += 1
+
+        chosen, unmet = set(), []
+        for result in results:
+            requirement = result.requirement
+            counted = set(course.canonical_key for course, status in result.course_statuses.items() if status == 'F')
+            have = [course for course, status in result.course_statuses.items() if status == 'F']
+            options = sorted((course for course, status in result.course_statuses.items() if status == 'U'),
+                             key=lambda c: (c.pk not in chosen, -uses[c.pk], len(self.missing_prerequisites(c.pk)),
+                                            c.number_int, c.pk))
+            for course in options:
+                if requirement.fulfillment_status(dict((c, 'F') for c in have)) == 'F':
+                    break
+                if course.canonical_key not in counted:
+                    counted.add(course.canonical_key)
+                    have.append(course)
+                    chosen.add(course.pk)
+            if requirement.fulfillment_status(dict((c, 'F') for c in have)) != 'F':
+                unmet.append(requirement)
+        return chosen, unmet
+
+    def plan(self):
+        """
+        :return: A DegreePlan
+        """
+        chosen, unmet = self.choose_courses()
+        planned = set(chosen)
+        for course_id in chosen:
+            planned.update(self.missing_prerequisites(course_id))
+        planned -= self.completed_ids
+        courses = Course.objects.select_related('department').in_bulk(planned)
+        planned = set(courses)
+
+        # Critical path: the longest chain of planned courses that depend on each course
+        needed_by = dict((course_id, []) for course_id in planned)
+        for course_id in planned:
+            for prereq_id in self.graph.course_ids(self.graph.direct.get(course_id, 0)):
+                if prereq_id in needed_by:
+                    needed_by[prereq_id].append(course_id)
+        heights = dict()
+
+        def height(course_id, visiting=()):
+            if course_id not in heights:
+                if course_id in visiting:
+                    return 0  # Prerequisite cycle
+                heights[course_id] = 1 + max([height(d, visiting + (course_id,)) for d in needed_by[course_id]] or [0])
+            return heights[course_id]
+
+        taken = self.completed_mask
+        remaining, terms = set(planned), []
+        while remaining:
+            available = [course_id for course_id in remaining if self.graph.is_eligible(course_id, taken)]
+            available.sort(key=lambda c: (-height(c), -len(needed_by[c]), courses[c].number_int, c))
+            term, hours = [], 0
+            for course_id in available:
+                credit_hours = courses[course_id].credit_hours
+                if hours + credit_hours <= self.credit_cap or not term:
+                    term.append(course_id)
+                    hours += credit_hours
+            if not term:
+                break
+            terms.append(PlannedTerm(len(terms) + 1, sorted((courses[c] for c in term),
+                                                            key=lambda c: (c.department_id, c.number_int, c.pk))))
+            taken |= self.graph.mask(term)
+            remaining.difference_update(term)
+        return DegreePlan(terms, unmet, sorted((courses[c] for c in remaining), key=lambda c: c.pk))
+
+
+def get_degree_plan(profile, req_sets, credit_cap=DEFAULT_CREDIT_CAP):
+    """
+    Gets the student's degree plan, from the cache unless their courses, requirements or prerequisites have changed
+    """
+    versions = get_versions([profile_version_key(profile.pk), REQUIREMENTS_VERSION_KEY, prereqs.VERSION_KEY])
+    key = 'plan:%d:%s:%d:%s' % (profile.pk, '.'.join(str(req_set.pk) for req_set in req_sets), credit_cap,
+                                ':'.join(str(version) for version in versions))
+    plan = cache.get(key)
+    if plan is None:
+        auditor = RequirementAuditor(profile, None)
+        completed = profile.completedcourse_set.values_list('course_id', flat=True)
+        plan = DegreePlanner(auditor.cached_audit(req_sets), completed, prereqs.get_prerequisite_graph(),
+                             credit_cap).plan()
+        cache.set(key, plan, getattr(settings, 'SAS_AUDIT_CACHE_TIMEOUT', 60 * 60))
+    return plan
@@ -0,0 +1,257 @@
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+
+from .audit import bump_version, get_versions
+from .models import Course
+
+VERSION_KEY = 'prereqs:version'
+
+
+class PrerequisiteGraph(object):
+    """
+    In-memory graph of Course.prereqs. Every course that has or is a prerequisite is given a bit, and
+    the transitive closure of each course's prerequisites is kept as a bitset, so eligibility checks
+    and closure lookups never touch the database.
+    """
+
+    def __init__(self, edges=()):
+        """
+        :param edges: (course id, prerequisite id) pairs
+        """
+        self.bits = dict()
+        self.ids = []
+        self.direct = dict()
+        self.closure = dict()
+        self.add_edges(edges)
+
+    @classmethod
+    def load(cls):
+        """
+        Builds the graph from the prerequisite table with a single query
+        """
+        return cls(Course.prereqs.through.objects.values_list('from_course_id', 'to_course_id'))
+
+    def bit(self, course_id):
+        if course_id not in self.bits:
+            self.bits[course_id] = 1 << len(self.ids)
+            self.ids.append(course_id)
+        return self.bits[course_id]
+
+    def mask(self, course_ids):
+        """
+        :return: The bitset of the given courses; courses outside the graph are ignored
+        """
+        mask = 0
+        for course_id in course_ids:
+            mask |= self.bits.get(course_id, 0)
+        return mask
+
+    def course_ids(self, mask):
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(self.ids[low.bit_length() - 1])
+            mask ^= low
+        return ids
+
+    def dependents(self, course_id):
+        """
+        :return: The ids of every course that needs the given course, directly or transitively
+        """
+        bit = self.bits.get(course_id, 0)
+        return [dependent for dependent, closure in self.closure.items() if closure & bit]
+
+    def prerequisites(self, course_id):
+        """
+        :return: The ids of every course needed before the given course, directly or transitively
+        """
+        return self.course_ids(self.closure.get(course_id, 0))
+
+    def add_edges(self, edges):
+        changed = set()
+        for course_id, prereq_id in edges:
+            self.bit(course_id)
+            self.direct[course_id] = self.direct.get(course_id, 0) | self.bit(prereq_id)
+            changed.add(course_id)
+        self.update_closures(changed)
+
+    def remove_edges(self, edges):
+        changed = set()
+        for course_id, prereq_id in edges:
+            if course_id in self.direct:
+                self.direct[course_id] &= ~self.bits.get(prereq_id, 0)
+                changed.add(course_id)
+        self.update_closures(changed)
+
+    def update_closures(self, changed):
+        """
+        Recomputes the closures of the changed courses and of every course that depends on them.
+        Affected courses are visited prerequisites first; courses on cycles are then iterated to a fixed point.
+        """
+        affected = set(changed)
+        if len(changed) < len(self.direct):
+            for course_id in changed:
+                affected.update(self.dependents(course_id))
+        else:
+            affected.update(self.direct)
+        waiting = dict((course_id, set(prereq_id for prereq_id in self.course_ids(self.direct.get(course_id, 0))
+                                       if prereq_id in affected)) for course_id in affected)
+        needed_by = dict()
+        for course_id, prereq_ids in waiting.items():
+            for prereq_id in prereq_ids:
+                needed_by.setdefault(prereq_id, []).append(course_id)
+        ready = [course_id for course_id, prereq_ids in waiting.items() if not prereq_ids]
+        while ready:
+            course_id = ready.pop()
+            self.closure[course_id] = self.direct_closure(course_id)
+            for dependent in needed_by.get(course_id, []):
+                waiting[dependent].discard(course_id)
+                if not waiting[dependent]:
+                    ready.append(dependent)
+        cyclic = [course_id for course_id, prereq_ids in waiting.items() if prereq_ids]
+        for course_id in cyclic:
+            self.closure[course_id] = 0
+        updated = True
+        while updated:
+            updated = False
+            for course_id in cyclic:
+                closure = self.direct_closure(course_id)
+                if closure != self.closure[course_id]:
+                    self.closure[course_id] = closure
+                    updated = True
+
+    def direct_closure(self, course_id):
+        """
+        :return: The closure of a course computed from the current closures of its direct prerequisites
+        """
+        closure = self.direct.get(course_id, 0)
+        for prereq_id in self.course_ids(closure):
+            closure |= self.closure.get(prereq_id, 0)
+        return closure
+
+    def is_eligible(self, course_id, completed_mask):
+        """
+        :param completed_mask: The bitset of the student's completed courses, from mask
+        :return: Whether every direct prerequisite of the course has been completed
+        """
+        direct = self.direct.get(course_id, 0)
+        return direct & completed_mask == direct
+
+    def ineligible(self, completed_ids):
+        """
+        :return: The set of ids of the courses whose prerequisites have not all been completed
+        """
+        completed_mask = self.mask(completed_ids)
+        return set(course_id for course_id in self.direct if not self.is_eligible(course_id, completed_mask))
+
+    def eligible(self, course_ids, completed_ids):
+        """
+        :return: The given course ids, without those whose prerequisites have not all been completed
+        """
+        completed_mask = self.mask(completed_ids)
+        return [course_id for course_id in course_ids if self.is_eligible(course_id, completed_mask)]
+
+    def find_cycles(self):
+        """
+        :return: A list of the prerequisite cycles, each as a sorted list of course ids
+        """
+        cycles, seen = [], 0
+        for course_id, closure in self.closure.items():
+            bit = self.bits[course_id]
+            if closure & bit and not seen & bit:
+                # A cycle's members are exactly the courses in its closure whose closures contain it
+                members = [member for member in self.course_ids(closure) if self.closure.get(member, 0) & bit]
+                seen |= self.mask(members)
+                cycles.append(sorted(members))
+        return cycles
+
+    def plan_terms(self, course_ids, completed_ids=(), per_term=None):
+        """
+        Orders courses into terms so that every course comes after all of its prerequisites. Missing
+        prerequisites of the requested courses are planned as well.
+        :param course_ids: The courses to take
+        :param completed_ids: The courses already taken
+        :param per_term: The maximum number of courses per term, or None for no limit
+        :return: A list of terms, each a sorted list of course ids
+        """
+        completed_mask = self.mask(completed_ids)
+        wanted = set(course_ids) - set(completed_ids)
+        for course_id in list(wanted):
+            wanted.update(self.course_ids(self.closure.get(course_id, 0) & ~completed_mask))
+        taken, terms = completed_mask, []
+        while wanted:
+            ready = sorted(course_id for course_id in wanted if self.is_eligible(course_id, taken))
+            if not ready:
+                raise ValueError('Prerequisite cycle among courses %s' % sorted(wanted))
+            # Courses that more of the remaining courses depend on are taken first
+            ready.sort(key=lambda c: -sum(1 for other in wanted if self.closure.get(other, 0) & self.bits.get(c, 0)))
+            term = sorted(ready[:per_term])
+            terms.append(term)
+            taken |= self.mask(term)
+            wanted.difference_update(term)
+        return terms
+
+
+_graph = None
+_graph_version = None
+
+
+def get_prerequisite_graph():
+    """
+    Gets this process's prerequisite graph, rebuilding it when another process has changed prerequisites
+    """
+    global _graph, _graph_version
+    version, = get_versions([VERSION_KEY])
+    if _graph is None or _graph_version != version:
+        _graph, _graph_version = PrerequisiteGraph.load(), version
+    return _graph
+
+
+def invalidate_prerequisite_graph():
+    """
+    Discards this process's graph and tells other processes to rebuild theirs, after prerequisite changes that
+    send no signals
+    """
+    global _graph
+    _graph = None
+    bump_version(VERSION_KEY)
+
+
+def prerequisites_changed(update):
+    """
+    Applies a change to this process's graph, if it is current, and tells other processes to rebuild theirs
+    """
+    global _graph_version
+    current = _graph is not None and _graph_version == cache.get(VERSION_KEY)
+    bump_version(VERSION_KEY)
+    if current:
+        update(_graph)
+        _graph_version = cache.get(VERSION_KEY)
+
+
+@receiver(m2m_changed, sender=Course.prereqs.through)
+def update_prerequisite_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # The cleared rows are gone by post_clear, so they are collected now
+        if reverse:
+            instance._cleared_prereqs = [(pk, instance.pk) for pk in instance.course_set.values_list('pk', flat=True)]
+        else:
+            instance._cleared_prereqs = [(instance.pk, pk) for pk in instance.prereqs.values_list('pk', flat=True)]
+    elif action == 'post_clear':
+        edges = getattr(instance, '_cleared_prereqs', [])
+        prerequisites_changed(lambda graph: graph.remove_edges(edges))
+    elif action in ('post_add', 'post_remove'):
+        edges = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+        if action == 'post_add':
+            prerequisites_changed(lambda graph: graph.add_edges(edges))
+        else:
+            prerequisites_changed(lambda graph: graph.remove_edges(edges))
+
+
+@receiver(post_delete, sender=Course)
+def remove_deleted_course(sender, instance, **kwargs):
+    # Deleting a course deletes its prerequisite rows without sending m2m_changed
+    invalidate_prerequisite_graph()
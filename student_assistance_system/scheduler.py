@@ -0,0 +1,194 @@
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import heapq
+import itertools
+import time
+
+from .models import SLOT_MINUTES, SLOTS_PER_DAY, Section, with_open_seats
+
+DEFAULT_TIME_BUDGET = 0.5  # seconds
+# Options kept for each requirement, whose unfulfilled courses can have hundreds of sections between them
+REQUIREMENT_OPTIONS = 40
+DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+DAY_COUNTS = [bin(days).count('1') for days in range(0, 1 << 7)]
+
+
+def meeting_days(occupancy):
+    """
+    :return: A bitmap with one bit for every day of the week the occupancy bitmap has classes on
+    """
+    return sum(1 << day for day in range(0, 7) if (occupancy >> (day * SLOTS_PER_DAY)) & DAY_MASK)
+
+
+def occupancy_score(occupancy):
+    """
+    Scores a weekly occupancy bitmap for ranking generated schedules; lower scores are better
+    :return: A (days on campus, minutes spent between classes) tuple
+    """
+    days, gaps = 0, 0
+    for day in range(0, 7):
+        bits = (occupancy >> (day * SLOTS_PER_DAY)) & DAY_MASK
+        if bits:
+            days += 1
+            first = (bits & -bits).bit_length() - 1
+            last = bits.bit_length() - 1
+            gaps += (last - first + 1) - bin(bits).count('1')
+    return days, gaps * SLOT_MINUTES
+
+
+class GeneratedSchedule(object):
+    def __init__(self, sections, occupancy):
+        self.sections = sections
+        self.days, self.gap_minutes = occupancy_score(occupancy)
+
+
+class ScheduleGenerator(object):
+    """
+    Enumerates conflict-free combinations of sections using backtracking with forward checking.
+    Exactly one section is chosen from every group of candidates and no course is chosen twice.
+    Sets of meeting days are searched smallest first and partial schedules that cannot beat the
+    schedules already found are pruned, so the best schedules are usually found well within the
+    time budget; if it runs out, the best schedules found so far are kept.
+    """
+
+    def __init__(self, groups, time_budget=DEFAULT_TIME_BUDGET, max_results=10, max_options=None):
+        """
+        :param groups: An ordered dict mapping labels to lists of candidate sections
+        :param time_budget: The number of seconds the search may run for
+        :param max_results: The number of schedules to keep
+        :param max_options: If given, only the first this many options of every group are searched
+        """
+        self.unavailable = [label for label, sections in groups.items() if not sections]
+        self.domains = [self.options(sections)[:max_options] for label, sections in groups.items() if sections]
+        self.time_budget = time_budget
+        self.max_results = max_results
+        self.timed_out = False
+
+    @classmethod
+    def for_courses(cls, courses, **kwargs):
+        # Full sections could not be saved to a schedule
+        sections = with_open_seats(Section.objects.filter(course__in=courses)).select_related('course__department')
+        sections = sections.order_by('pk')
+        groups = OrderedDict((course, []) for course in courses)
+        for section in sections:
+            groups[section.course].append(section)
+        return cls(groups, **kwargs)
+
+    @classmethod
+    def for_requirements(cls, audit, **kwargs):
+        """
+        Builds a generator that chooses one more course for every unfulfilled requirement
+        :param audit: The result of RequirementAuditor.audit
+        """
+        results = [result for req_set, results in audit for result in results if result.status == 'U']
+        candidates = dict((result.requirement, [c.pk for c, st in result.course_statuses.items() if st == 'U'])
+                          for result in results)
+        course_ids = set(pk for pks in candidates.values() for pk in pks)
+        sections_by_course = dict()
+        sections = with_open_seats(Section.objects.filter(course__in=course_ids)).select_related('course__department')
+        for section in sections.order_by('pk'):
+            sections_by_course.setdefault(section.course_id, []).append(section)
+        groups = OrderedDict((result.requirement, [section for pk in sorted(candidates[result.requirement])
+                                                   for section in sections_by_course.get(pk, [])])
+                             for result in results)
+        kwargs.setdefault('max_options', REQUIREMENT_OPTIONS)
+        return cls(groups, **kwargs)
+
+    def options(self, sections):
+        """
+        Collapses sections of the same course that meet at the same times into a single option
+        :return: A list of (occupancy, course id, sections, days met) tuples
+        """
+        options = OrderedDict()
+        for section in sections:
+            options.setdefault((section.occupancy(), section.course_id), []).append(section)
+        return [(occupancy, course_id, sections, meeting_days(occupancy))
+                for (occupancy, course_id), sections in options.items()]
+
+    def generate(self):
+        """
+        Gets the best conflict-free schedules, ranked by days on campus and then by time between classes
+        :return: A list of GeneratedSchedules
+        """
+        self.timed_out = False
+        self.deadline = time.time() + self.time_budget
+        self.best = []
+        self.counter = itertools.count()
+        all_days = 0
+        for domain in self.domains:
+            for option in domain:
+                all_days |= option[3]
+        day_sets = [day_set for day_set in range(0, all_days + 1) if not day_set & ~all_days]
+        # Search for schedules meeting on exactly each set of days in turn, fewest days first
+        for day_set in sorted(day_sets, key=DAY_COUNTS.__getitem__):
+            if self.timed_out or len(self.best) == self.max_results and DAY_COUNTS[day_set] > -self.best[0][0][0]:
+                break
+            domains = [[option for option in domain if not option[3] & ~day_set] for domain in self.domains]
+            if all(domains):
+                self.day_set = day_set
+                self.search(domains, 0, 0, [])
+        ranked = [(options, occupancy) for score, count, options, occupancy in sorted(self.best, reverse=True)]
+        return [GeneratedSchedule([option[2][0] for option in options], occupancy) for options, occupancy in ranked]
+
+    def record(self, chosen, occupancy):
+        days, gaps = occupancy_score(occupancy)
+        entry = ((-days, -gaps), next(self.counter), list(chosen), occupancy)
+        if len(self.best) < self.max_results:
+            heapq.heappush(self.best, entry)
+        elif entry[0] > self.best[0][0]:
+            heapq.heapreplace(self.best, entry)
+
+    def score_bound(self, domains, occupancy, days):
+        """
+        Gets a lower bound on the score of any schedule that completes a partial one. Every remaining
+        group adds at least its cheapest option's days, and free time between classes that no
+        remaining option could fill stays free.
+        """
+        days_bound = DAY_COUNTS[days]
+        reachable = 0
+        for domain in domains:
+            patterns = set()
+            for option in domain:
+                reachable |= option[0]
+                patterns.add(option[3])
+            days_bound = max(days_bound, min(DAY_COUNTS[days | pattern] for pattern in patterns))
+        gaps_bound = 0
+        for day in range(0, 7):
+            bits = (occupancy >> (day * SLOTS_PER_DAY)) & DAY_MASK
+            if bits:
+                first = (bits & -bits).bit_length() - 1
+                span = ((1 << bits.bit_length()) - 1) >> first << first
+                gaps_bound += bin(span & ~bits & ~(reachable >> (day * SLOTS_PER_DAY))).count('1')
+        return days_bound, gaps_bound * SLOT_MINUTES
+
+    def search(self, domains, occupancy, days, chosen):
+        if time.time() > self.deadline:
+            self.timed_out = True
+            return
+        if not domains:
+            if days == self.day_set:
+                self.record(chosen, occupancy)
+            return
+        if len(self.best) == self.max_results:
+            worst_days, worst_gaps = self.best[0][0]
+            if self.score_bound(domains, occupancy, days) >= (-worst_days, -worst_gaps):
+                return
+        # Branch on the most constrained group first, trying the options that score best first
+        index = min(range(0, len(domains)), key=lambda i: len(domains[i]))
+        rest = domains[:index] + domains[index + 1:]
+        for option in sorted(domains[index], key=lambda o: occupancy_score(occupancy | o[0])):
+            option_occupancy, course_id = option[0], option[1]
+            combined = occupancy | option_occupancy
+            pruned = []
+            for domain in rest:
+                remaining = [o for o in domain if not o[0] & combined and o[1] != course_id]
+                if not remaining:
+                    break
+                pruned.append(remaining)
+            else:
+                chosen.append(option)
+                self.search(pruned, combined, days | option[3], chosen)
+                chosen.pop()
+            if self.timed_out:
+                return
@@ -0,0 +1,277 @@
+from __future__ import unicode_literals
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.six import unichr
+
+from .models import Course, Department, Section
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+INDEX_TABLE = 'student_assistance_system_sectionsearch'
+BATCH_SIZE = 500
+
+
+def edit_distance(a, b, limit):
+    """
+    Gets the Levenshtein distance between two strings, giving up once it exceeds limit
+    :return: The distance, or limit + 1 if it is greater than limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(0, len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+class SearchBackend(object):
+    """
+    Interface for section search indexes. Sections are indexed by their course's name, description
+    and department abbreviation, and by their professor.
+    """
+    fields = ('name', 'description', 'department', 'professor')
+
+    def filter(self, sections, text, fields=None):
+        """
+        Restricts a queryset of sections to those matching the search text
+        :param sections:
+        :param text:
+        :param fields: The indexed fields to search, or None to search all of them
+        :return: The filtered queryset
+        """
+        raise NotImplementedError
+
+    def search(self, text, fields=None, limit=None):
+        """
+        :return: A list of the ids of sections matching the search text, best matches first
+        """
+        raise NotImplementedError
+
+    def ranked(self, sections, text, fields=None, limit=200):
+        """
+        Restricts a queryset of sections to those matching the search text. The best limit matches come first,
+        in rank order, and the rest follow them by id, so counts and pages cover every match.
+        """
+        section_ids = self.search(text, fields, limit)
+        ranks = [When(pk=section_id, then=Value(rank)) for rank, section_id in enumerate(section_ids)]
+        if not ranks:
+            return sections.none()
+        rank = Case(*ranks, default=Value(len(ranks)), output_field=IntegerField())
+        return self.filter(sections, text, fields).order_by(rank, 'pk')
+
+    def index_sections(self, section_ids):
+        pass
+
+    def remove_sections(self, section_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Fallback backend that scans the tables with case-insensitive substring matches
+    """
+    lookups = {
+        'name': 'course__name',
+        'description': 'course__description',
+        'department': 'course__department__abbr_name',
+        'professor': 'professor',
+    }
+
+    def filter(self, sections, text, fields=None):
+        query = Q(pk__in=[])
+        for field in fields or self.fields:
+            query |= Q(**{self.lookups[field] + '__icontains': text})
+        return sections.filter(query)
+
+    def search(self, text, fields=None, limit=None):
+        return list(self.filter(Section.objects.order_by('pk'), text, fields).values_list('pk', flat=True)[:limit])
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    Backend using an SQLite FTS5 table whose rowids are section ids. Every search term matches as a prefix,
+    and terms that match nothing in the index are replaced by indexed terms within a small edit distance.
+    """
+    vocab_table = INDEX_TABLE + '_vocab'
+    weights = (10.0, 1.0, 5.0, 5.0)  # bm25 weights of name, description, department and professor
+
+    def corrections(self, cursor, token):
+        if len(token) < 4:
+            return []
+        cursor.execute('SELECT 1 FROM %s WHERE term >= %%s AND term < %%s LIMIT 1' % self.vocab_table,
+                       [token, token[:-1] + unichr(ord(token[-1]) + 1)])
+        if cursor.fetchone():
+            return []
+        limit = 1 if len(token) < 8 else 2
+        cursor.execute('SELECT term FROM %s WHERE term >= %%s AND term < %%s' % self.vocab_table,
+                       [token[0], unichr(ord(token[0]) + 1)])
+        return [term for term, in cursor.fetchall() if edit_distance(token, term, limit) <= limit]
+
+    def match_expression(self, text, fields=None):
+        tokens = TOKEN_RE.findall(text.lower())
+        if not tokens:
+            return None
+        terms = []
+        with connection.cursor() as cursor:
+            for token in tokens:
+                alternatives = ['"%s"*' % token] + ['"%s"' % term for term in self.corrections(cursor, token)]
+                terms.append('(%s)' % ' OR '.join(alternatives))
+        expression = ' AND '.join(terms)
+        if fields:
+            expression = '{%s} : (%s)' % (' '.join(fields), expression)
+        return expression
+
+    def filter(self, sections, text, fields=None):
+        expression = self.match_expression(text, fields)
+        if expression is None:
+            return sections
+        return sections.extra(where=['%s.id IN (SELECT rowid FROM %s WHERE %s MATCH %%s)'
+                                     % (Section._meta.db_table, INDEX_TABLE, INDEX_TABLE)],
+                              params=[expression])
+
+    def search(self, text, fields=None, limit=None):
+        expression = self.match_expression(text, fields)
+        if expression is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT rowid FROM %s WHERE %s MATCH %%s ORDER BY bm25(%s, %s) LIMIT %%s'
+                           % (INDEX_TABLE, INDEX_TABLE, INDEX_TABLE, ', '.join(str(w) for w in self.weights)),
+                           [expression, -1 if limit is None else limit])
+            return [section_id for section_id, in cursor.fetchall()]
+
+    def index_sections(self, section_ids):
+        section_ids = list(section_ids)
+        for start in range(0, len(section_ids), BATCH_SIZE):
+            batch = section_ids[start:start + BATCH_SIZE]
+            rows = Section.objects.filter(pk__in=batch).values_list('pk', 'course__name', 'course__description',
+                                                                    'course__department__abbr_name', 'professor')
+            with connection.cursor() as cursor:
+                self.delete(cursor, batch)
+                cursor.executemany('INSERT INTO %s (rowid, name, description, department, professor) '
+                                   'VALUES (%%s, %%s, %%s, %%s, %%s)' % INDEX_TABLE, list(rows))
+
+    def delete(self, cursor, section_ids):
+        if not section_ids:
+            return
+        cursor.execute('DELETE FROM %s WHERE rowid IN (%s)' % (INDEX_TABLE, ', '.join(['%s'] * len(section_ids))),
+                       section_ids)
+
+    def remove_sections(self, section_ids):
+        with connection.cursor() as cursor:
+            self.delete(cursor, list(section_ids))
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % INDEX_TABLE)
+            cursor.execute('INSERT INTO {index} (rowid, name, description, department, professor) '
+                           'SELECT s.id, c.name, c.description, d.abbr_name, s.professor FROM {section} s '
+                           'INNER JOIN {course} c ON s.course_id = c.id '
+                           'INNER JOIN {department} d ON c.department_id = d.id'
+                           .format(index=INDEX_TABLE, section=Section._meta.db_table,
+                                   course=Course._meta.db_table, department=Department._meta.db_table))
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Backend using a table of tsvector documents keyed by section id. Each field is stored with its own
+    weight so searches can be restricted to fields. Terms match as prefixes; typo tolerance is not supported.
+    """
+    field_weights = {'name': 'A', 'department': 'B', 'professor': 'C', 'description': 'D'}
+    document = ("setweight(to_tsvector('simple', c.name), 'A') || setweight(to_tsvector('simple', d.abbr_name), 'B') || "
+                "setweight(to_tsvector('simple', s.professor), 'C') || setweight(to_tsvector('simple', c.description), 'D')")
+
+    def tsquery(self, text, fields=None):
+        weights = ''.join(sorted(self.field_weights[field] for field in fields)) if fields else ''
+        return ' & '.join('%s:*%s' % (token, weights) for token in TOKEN_RE.findall(text.lower())) or None
+
+    def filter(self, sections, text, fields=None):
+        query = self.tsquery(text, fields)
+        if query is None:
+            return sections
+        return sections.extra(where=["%s.id IN (SELECT section_id FROM %s WHERE document @@ to_tsquery('simple', %%s))"
+                                     % (Section._meta.db_table, INDEX_TABLE)],
+                              params=[query])
+
+    def search(self, text, fields=None, limit=None):
+        query = self.tsquery(text, fields)
+        if query is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT section_id FROM %s, to_tsquery('simple', %%s) query WHERE document @@ query "
+                           "ORDER BY ts_rank(document, query) DESC LIMIT %%s" % INDEX_TABLE, [query, limit])
+            return [section_id for section_id, in cursor.fetchall()]
+
+    def insert(self, cursor, where='', params=()):
+        cursor.execute('INSERT INTO {index} (section_id, document) SELECT s.id, {document} FROM {section} s '
+                       'INNER JOIN {course} c ON s.course_id = c.id '
+                       'INNER JOIN {department} d ON c.department_id = d.id {where}'
+                       .format(index=INDEX_TABLE, document=self.document, section=Section._meta.db_table,
+                               course=Course._meta.db_table, department=Department._meta.db_table, where=where),
+                       params)
+
+    def index_sections(self, section_ids):
+        section_ids = list(section_ids)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE section_id = ANY(%%s)' % INDEX_TABLE, [section_ids])
+            self.insert(cursor, 'WHERE s.id = ANY(%s)', [section_ids])
+
+    def remove_sections(self, section_ids):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE section_id = ANY(%%s)' % INDEX_TABLE, [list(section_ids)])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % INDEX_TABLE)
+            self.insert(cursor)
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    """
+    Gets the backend named by the SAS_SEARCH_BACKEND setting, or the default backend for the database in use
+    """
+    path = getattr(settings, 'SAS_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    return BACKENDS.get(connection.vendor, DatabaseSearchBackend)()
+
+
+@receiver(post_save, sender=Section)
+def index_section(sender, instance, **kwargs):
+    get_search_backend().index_sections([instance.pk])
+
+
+@receiver(post_delete, sender=Section)
+def remove_section(sender, instance, **kwargs):
+    get_search_backend().remove_sections([instance.pk])
+
+
+@receiver(post_save, sender=Course)
+def index_course_sections(sender, instance, created, **kwargs):
+    if not created:
+        get_search_backend().index_sections(instance.section_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Department)
+def index_department_sections(sender, instance, created, **kwargs):
+    if not created:
+        get_search_backend().index_sections(Section.objects.filter(course__department=instance).values_list('pk', flat=True))
@@ -3,4 +3,156 @@ function showHideDiv(elemId) {
     div.style.display = div.style.display == "block" ? "none" : "block";
 }
 
+var STATUS_CLASSES = {U: "unfulfilled", S: "schedule_fulfills", F: "fulfilled"};
+var STATUS_NAMES = {U: "Unfulfilled", S: "Fulfilled by schedule", F: "Fulfilled"};
 
+// Sends a request to the JSON API, falling back to submitting the form normally if it fails
+function apiRequest(method, url, form, onSuccess) {
+    var request = new XMLHttpRequest();
+    request.open(method, url);
+    request.setRequestHeader("X-CSRFToken", form.elements["csrfmiddlewaretoken"].value);
+    request.onload = function () {
+        if (request.status == 200) {
+            onSuccess(JSON.parse(request.responseText));
+        } else {
+            form.submit();
+        }
+    };
+    request.onerror = function () { form.submit(); };
+    request.send(method == "POST" ? new FormData(form) : null);
+}
+
+function createElement(tag, attributes, children) {
+    var element = document.createElement(tag);
+    for (var name in attributes) {
+        element.setAttribute(name, attributes[name]);
+    }
+    (children || []).forEach(function (child) {
+        element.appendChild(typeof child == "string" ? document.createTextNode(child) : child);
+    });
+    return element;
+}
+
+function sectionForm(className, action, api, sectionId, scheduleId, token, button) {
+    return createElement("form", {method: "post", action: action, "class": className, "data-api": api}, [
+        createElement("input", {type: "hidden", name: "csrfmiddlewaretoken", value: token}),
+        createElement("input", {type: "hidden", value: sectionId, name: "section"}),
+        createElement("input", {type: "hidden", value: scheduleId, name: "schedule"}),
+        button
+    ]);
+}
+
+function meetingTimes(section) {
+    var cell = createElement("td", {valign: "top"});
+    section.times.forEach(function (time) {
+        cell.appendChild(document.createTextNode(time));
+        cell.appendChild(document.createElement("br"));
+    });
+    return cell;
+}
+
+function removeChildRows(table) {
+    var rows = table.querySelectorAll("tr");
+    for (var i = 1; i < rows.length; i++) {
+        rows[i].parentNode.removeChild(rows[i]);
+    }
+}
+
+// Redraws the schedule table from the schedule returned by the API
+function showSchedule(schedule, token) {
+    var table = document.getElementById("schedule");
+    if (!table || table.getAttribute("data-schedule") != schedule.id) {
+        return;
+    }
+    var editing = table.getAttribute("data-editing") == "true";
+    var api = table.getAttribute("data-sections-api");
+    removeChildRows(table);
+    schedule.sections.forEach(function (section) {
+        var row = createElement("tr", {}, [
+            createElement("td", {valign: "top"}, [section.name]), meetingTimes(section),
+            createElement("td", {valign: "top"}, [section.professor]),
+            createElement("td", {valign: "top"}, [section.location]),
+            createElement("td", {valign: "top"}, [String(section.enrolled)]),
+            createElement("td", {valign: "top"}, [String(section.capacity)])]);
+        if (editing) {
+            row.appendChild(createElement("td", {valign: "top"}, [sectionForm(
+                "remove-section", table.getAttribute("data-remove-action"), api + section.id + "/", section.id,
+                schedule.id, token, createElement("input", {type: "submit", value: "X"}))]));
+        }
+        table.tBodies[0].appendChild(row);
+    });
+}
+
+// Updates requirement statuses and suggestions from an audit returned by the API. The page is reloaded if
+// a requirement gains or loses its suggestions, since they are only laid out for unfulfilled requirements.
+function showAudit(audit, template, token) {
+    var reload = false;
+    audit.requirement_sets.forEach(function (requirementSet) {
+        requirementSet.requirements.forEach(function (requirement) {
+            var divs = document.querySelectorAll('[data-requirement="' + requirement.id + '"]');
+            Array.prototype.forEach.call(divs, function (div) {
+                div.querySelector(".requirement_status").textContent = STATUS_NAMES[requirement.status];
+                requirement.courses.forEach(function (course) {
+                    var cell = div.querySelector('[data-course="' + course.id + '"]');
+                    if (cell) {
+                        cell.className = STATUS_CLASSES[course.status];
+                        cell.title = STATUS_NAMES[course.status];
+                    }
+                });
+                var table = div.querySelector("table.suggestions");
+                if (!table != !requirement.suggestions) {
+                    reload = true;
+                } else if (table) {
+                    removeChildRows(table);
+                    requirement.suggestions.forEach(function (section) {
+                        var button = createElement("button", {type: "submit",
+                            style: "background-color: #FFEBCD; border: 1px solid;"}, ["Add"]);
+                        table.tBodies[0].appendChild(createElement("tr", {}, [
+                            createElement("td", {}, [section.name]), meetingTimes(section),
+                            createElement("td", {style: "width: 1%; white-space: nowrap;"}, [sectionForm(
+                                "add-section", template.action, template.getAttribute("data-api"), section.id,
+                                audit.schedule, token, button)])]));
+                    });
+                }
+            });
+        });
+    });
+    if (reload) {
+        window.location.reload();
+    }
+}
+
+// Adds and removes sections through the JSON API and updates the page in place, instead of reloading it
+function changeSchedule(event) {
+    var form = event.target;
+    var add = form.classList.contains("add-section");
+    if (!add && !form.classList.contains("remove-section")) {
+        return;
+    }
+    event.preventDefault();
+    var token = form.elements["csrfmiddlewaretoken"].value;
+    var template = add ? form : document.querySelector("form.add-section");
+    apiRequest(add ? "POST" : "DELETE", form.getAttribute("data-api"), form, function (schedule) {
+        showSchedule(schedule, token);
+        var requirementSets = document.querySelector(".requirement_sets[data-audit]");
+        if (!requirementSets) {
+            return;
+        }
+        var request = new XMLHttpRequest();
+        request.open("GET", requirementSets.getAttribute("data-audit"));
+        request.onload = function () {
+            if (request.status == 200 && template) {
+                showAudit(JSON.parse(request.responseText), template, token);
+            } else {
+                window.location.reload();
+            }
+        };
+        request.send();
+    });
+}
+
+// This script is included by several fragments of the same page
+if (!window.scheduleChangesHandled) {
+    window.scheduleChangesHandled = true;
+    document.addEventListener("submit", changeSchedule);
+}
@@ -0,0 +1,52 @@
+from __future__ import unicode_literals
+
+from itertools import islice
+
+from django.db.models import prefetch_related_objects
+
+from .availability import get_availability
+from .models import Section
+from .prereqs import get_prerequisite_graph
+
+
+def iter_suggestions(courses, schedule, chunk_size=50):
+    """
+    Lazily yields the sections of the given courses that have open seats and do not conflict with the schedule.
+    Candidates are loaded in chunks ordered by id, so consumers that stop early only pay for
+    the chunks they actually read. Sections of cross-listed courses that meet together are yielded once.
+    :param courses: Courses or course ids to draw sections from
+    :param schedule: The schedule suggestions must fit into, or None
+    :param chunk_size: The number of candidate sections loaded per query
+    """
+    schedule_occupancy = schedule.occupancy() if schedule is not None else 0
+    # Full sections cannot be added to schedules; seats are read from the snapshot instead of every candidate row
+    availability = get_availability()
+    candidates = Section.objects.filter(course__in=courses).select_related('course').order_by('pk')
+    # A cross-listed class is offered once under each of its courses, but should only be suggested once
+    seen = set()
+    last_pk = 0
+    while True:
+        chunk = list(candidates.filter(pk__gt=last_pk)[:chunk_size])
+        for section in chunk:
+            if not section.occupancy() & schedule_occupancy and availability.has_open_seats(section.pk):
+                key = (section.course.canonical_key, section.meeting_mask, section.professor)
+                if section.course.canonical_id is None or key not in seen:
+                    seen.add(key)
+                    yield section
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1].pk
+
+
+def get_suggestions(courses, schedule, limit=None, completed=None):
+    """
+    Gets up to limit conflict-free sections of the given courses, ready for display
+    :param completed: If given, the ids of the student's completed courses; courses whose
+    prerequisites have not all been completed are then left out
+    :return: A list of sections with their meeting times prefetched
+    """
+    if completed is not None:
+        courses = get_prerequisite_graph().eligible([getattr(course, 'pk', course) for course in courses], completed)
+    suggestions = list(islice(iter_suggestions(courses, schedule), limit))
+    prefetch_related_objects(suggestions, 'meeting_times')
+    return suggestions
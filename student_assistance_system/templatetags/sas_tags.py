@@ -1,36 +1,110 @@
 from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .. import prereqs
+from ..audit import REQUIREMENTS_VERSION_KEY, RequirementAuditor, get_versions, profile_version_key
+from ..availability import get_availability
+from ..facets import VERSION_KEY as CATALOG_VERSION_KEY
 
 register = template.Library()
 
+# Stands in for the CSRF token in cached fragments, and is replaced with the token of each request they are shown to
+CSRF_PLACEHOLDER = 'csrf-token-placeholder'
+# Everything the schedule fragment displays, loaded with a fixed number of queries however many sections there are
+SCHEDULE_PREFETCH = ('sections__meeting_times', 'sections__course__department')
 
-@register.inclusion_tag('student_assistance_system/fragments/schedule_view.html')
-def schedule_view(schedule):
-    return dict(schedule=schedule, editing=False)
 
+def fragment_key(name, profile_id, parts, version_keys=()):
+    """
+    Builds the cache key of a fragment from the values that identify it and the versions of everything it shows:
+    the student's courses and schedules, the requirements and the catalog
+    """
+    versions = get_versions([profile_version_key(profile_id), REQUIREMENTS_VERSION_KEY, CATALOG_VERSION_KEY]
+                            + list(version_keys))
+    return 'fragment:%s:%d:%s:%s' % (name, profile_id, ':'.join('%s' % part for part in parts),
+                                     ':'.join(str(version) for version in versions))
 
-@register.inclusion_tag('student_assistance_system/fragments/schedule_view.html')
-def schedule_edit(schedule):
-    return dict(schedule=schedule, editing=True)
 
+def render_cached(context, template_name, key, fragment_context):
+    """
+    Renders a fragment template, or serves its HTML from the cache. Fragments are rendered with a placeholder
+    for the CSRF token, which is replaced with the current request's token whenever they are served.
+    Fragments that depend on seats record the open seats of their sections in the section_seats dict of their
+    context, and are rendered again once the availability snapshot shows different ones for any of those
+    sections. Enrollments in other sections leave them cached.
+    :param fragment_context: A function returning the template's context, only called when the fragment is rendered
+    """
+    entry = cache.get(key)
+    if entry is not None and entry[1]:
+        availability = get_availability()
+        if any(availability.open_seats(section_id) != seats for section_id, seats in entry[1].items()):
+            entry = None
+    if entry is None:
+        fragment = dict(fragment_context(), csrf_token=CSRF_PLACEHOLDER)
+        section_seats = fragment.setdefault('section_seats', {})
+        html = render_to_string(template_name, fragment)
+        entry = (html, section_seats)
+        cache.set(key, entry, getattr(settings, 'SAS_FRAGMENT_CACHE_TIMEOUT', 60 * 60))
+    return mark_safe(entry[0].replace(CSRF_PLACEHOLDER, '%s' % context.get('csrf_token', '')))
 
-@register.inclusion_tag('student_assistance_system/fragments/requirements_view.html', takes_context=True)
-def requirements_view(context, req_sets):
-    return dict(user=context['user'], req_sets=req_sets, schedule=context['schedule'])
+
+def record_seats(section_seats, sections):
+    """
+    Adds the open seats of sections shown by a fragment to its section_seats, as the snapshot has them
+    """
+    if section_seats is not None:
+        availability = get_availability()
+        section_seats.update((section.pk, availability.open_seats(section.pk)) for section in sections)
+
+
+def render_schedule(context, schedule, editing):
+    def fragment_context():
+        prefetch_related_objects([schedule], *SCHEDULE_PREFETCH)
+        section_seats = dict()
+        record_seats(section_seats, schedule.sections.all())
+        return dict(schedule=schedule, editing=editing, section_seats=section_seats)
+
+    key = fragment_key('schedule', schedule.user_id, [schedule.pk, int(editing), schedule.updated.isoformat()])
+    return render_cached(context, 'student_assistance_system/fragments/schedule_view.html', key, fragment_context)
 
 
-@register.assignment_tag
-def get_course_statuses(requirement, user, schedule):
-    return requirement.get_course_statuses(user, schedule)
+@register.simple_tag(takes_context=True)
+def schedule_view(context, schedule):
+    return render_schedule(context, schedule, False)
+
+
+@register.simple_tag(takes_context=True)
+def schedule_edit(context, schedule):
+    return render_schedule(context, schedule, True)
+
+
+@register.simple_tag(takes_context=True)
+def requirements_view(context, req_sets):
+    profile, schedule = context['user'].profile, context['schedule']
 
+    def fragment_context():
+        audit = RequirementAuditor(profile, schedule).cached_audit(req_sets)
+        # Suggestions are only offered for courses the user has the prerequisites for
+        completed = set(profile.completedcourse_set.values_list('course_id', flat=True)) if schedule else None
+        return dict(user=context['user'], audit=audit, schedule=schedule, completed=completed)
 
-@register.assignment_tag
-def get_course_suggestions(requirement, course_statuses, schedule):
-    return requirement.get_course_suggestions(course_statuses, schedule)
+    key = fragment_key('requirements', profile.pk, [schedule.pk if schedule else 'none',
+                                                    schedule.updated.isoformat() if schedule else 'none',
+                                                    '.'.join(str(req_set.pk) for req_set in req_sets)],
+                       [prereqs.VERSION_KEY])
+    return render_cached(context, 'student_assistance_system/fragments/requirements_view.html', key, fragment_context)
 
 
-@register.assignment_tag
-def fulfillment_status(requirement, course_statuses):
-    return requirement.fulfillment_status(course_statuses)
+@register.assignment_tag(takes_context=True)
+def get_course_suggestions(context, requirement, course_statuses, schedule, limit=None, completed=None):
+    suggestions = requirement.get_course_suggestions(course_statuses, schedule, limit, completed)
+    # Suggestions leave out full sections, so the cached fragment is rendered again once their seats change
+    record_seats(context.get('section_seats'), suggestions)
+    return suggestions
 
 
 @register.simple_tag
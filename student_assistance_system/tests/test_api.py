@@ -0,0 +1,141 @@
+import datetime
+import json
+import time
+
+from autofixture import AutoFixture
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import Client, TestCase
+from django.utils.http import http_date
+from student_assistance_system.enrollment import enroll
+from student_assistance_system.models import *
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        profile = User.objects.create_user('test', password='test').profile
+        # Creation of the Schedule *must* precede Section creation due to AutoFixture bug
+        self.schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=profile)).create_one()
+        other = User.objects.create_user('other', password='other').profile
+        self.other_schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=other)).create_one()
+        department = AutoFixture(Department, field_values=dict(abbr_name='EECS')).create_one()
+        courses = AutoFixture(Course, follow_m2m=(0, 0), field_values=dict(department=department, course_number='101', canonical=None, credit_hours=3)).create(3)
+        self.sections = [AutoFixture(Section, generate_m2m=False, field_values=dict(course=course, professor='Professor %d' % i, capacity=30, enrolled=0)).create_one()
+                         for i, course in enumerate(courses)]
+        for i, section in enumerate(self.sections):
+            section.meeting_times.add(MeetingTime.objects.create(day=i, start_time=datetime.time(9, 0), end_time=datetime.time(9, 50)))
+        self.schedule.sections.add(self.sections[0])
+        major = AutoFixture(RequirementSet, field_values=dict(department=department, type=0)).create_one()
+        self.requirement = create_requirement('Two courses', None, 2, Course.objects.filter(pk__in=[c.pk for c in courses]))
+        major.requirements.add(self.requirement)
+        UserMajor.objects.create(name=profile, major=major)
+        self.assertTrue(self.client.login(username='test', password='test'))
+        self.schedule_url = reverse('student_assistance_system:api_schedule', kwargs={'schedule_id': self.schedule.id})
+
+    def get_json(self, url, data=None, status_code=200, **headers):
+        response = self.client.get(url, data, **headers)
+        self.assertEqual(response.status_code, status_code)
+        return json.loads(response.content.decode('utf-8'))
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.schedule_url).status_code, 401)
+
+    def test_sections(self):
+        url = reverse('student_assistance_system:api_sections')
+        data = self.get_json(url, {'dep': 'eecs', 'limit': 2})
+        self.assertEqual([section['professor'] for section in data['sections']], ['Professor 0', 'Professor 1'])
+        self.assertIsNone(data['previous'])
+        data = self.get_json(url, {'dep': 'eecs', 'limit': 2, 'cursor': data['next']})
+        self.assertEqual([section['id'] for section in data['sections']], [self.sections[2].id])
+        self.assertIsNone(data['next'])
+        self.get_json(url, {'cursor': 'garbage'}, status_code=400)
+
+    def test_schedule_conditional_get(self):
+        response = self.client.get(self.schedule_url)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([section['id'] for section in data['sections']], [self.sections[0].id])
+        self.assertEqual(data['sections'][0]['times'], [self.sections[0].condensed_meeting_times()[0]])
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.schedule_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotIn('Last-Modified', response)
+        # Enrollments after the schedule was last saved are not hidden from clients that send If-Modified-Since
+        enroll(User.objects.create_user('student').profile, self.sections[0])
+        data = self.get_json(self.schedule_url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(data['sections'][0]['enrolled'], 1)
+        etag = self.client.get(self.schedule_url)['ETag']
+
+        url = reverse('student_assistance_system:api_schedule_sections', kwargs={'schedule_id': self.schedule.id})
+        response = self.client.post(url, {'section': self.sections[1].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        data = self.get_json(self.schedule_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(set(section['id'] for section in data['sections']), set([self.sections[0].id, self.sections[1].id]))
+        self.assertEqual(self.client.get(self.schedule_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # Changes to the sections themselves also change the ETag
+        etag = response['ETag']
+        self.sections[0].enrolled += 1
+        self.sections[0].save()
+        self.get_json(self.schedule_url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_add_and_remove(self):
+        client = Client(enforce_csrf_checks=True)
+        self.assertTrue(client.login(username='test', password='test'))
+        client.get(reverse('student_assistance_system:index'))
+        token = client.cookies['csrftoken'].value
+        url = reverse('student_assistance_system:api_schedule_sections', kwargs={'schedule_id': self.schedule.id})
+        self.assertEqual(client.post(url, {'section': self.sections[1].id}).status_code, 403)
+        response = client.post(url, {'section': self.sections[1].id}, HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.schedule.sections.all()), 2)
+        url = reverse('student_assistance_system:api_schedule_section', kwargs={'schedule_id': self.schedule.id,
+                                                                                'section_id': self.sections[0].id})
+        response = client.delete(url, HTTP_X_CSRFTOKEN=token)
+        self.assertEqual([section['id'] for section in json.loads(response.content.decode('utf-8'))['sections']],
+                         [self.sections[1].id])
+        self.assertEqual(list(self.schedule.sections.all()), [self.sections[1]])
+
+    def test_batch(self):
+        url = reverse('student_assistance_system:api_schedule_batch', kwargs={'schedule_id': self.schedule.id})
+        response = self.client.post(url, json.dumps({'add': [self.sections[1].id, self.sections[2].id], 'remove': [self.sections[0].id]}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(section['id'] for section in json.loads(response.content.decode('utf-8'))['sections']),
+                         set([self.sections[1].id, self.sections[2].id]))
+        conflicting = AutoFixture(Section, follow_m2m=(0, 0), field_values=dict(course=self.sections[0].course, capacity=30, enrolled=0)).create_one()
+        conflicting.meeting_times.add(*self.sections[1].meeting_times.all())
+        response = self.client.post(url, {'add': [self.sections[0].id, conflicting.id]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['sections'], sorted([self.sections[1].id, conflicting.id]))
+        self.assertEqual(set(self.schedule.sections.all()), set(self.sections[1:]))
+        self.assertEqual(self.client.post(url, {'add': 'x'}).status_code, 400)
+        for changes in ({'add': '%d' % self.sections[0].id}, {'remove': [True]}, {'add': [1.5]}, {'add': None}, [1]):
+            response = self.client.post(url, json.dumps(changes), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(self.schedule.sections.all()), set(self.sections[1:]))
+
+    def test_other_users_schedules(self):
+        url = reverse('student_assistance_system:api_schedule', kwargs={'schedule_id': self.other_schedule.id})
+        self.get_json(url, status_code=404)
+        url = reverse('student_assistance_system:api_schedule_sections', kwargs={'schedule_id': self.other_schedule.id})
+        self.assertEqual(self.client.post(url, {'section': self.sections[1].id}).status_code, 404)
+        self.assertEqual(list(self.other_schedule.sections.all()), [])
+
+    def test_audit(self):
+        url = reverse('student_assistance_system:api_audit', kwargs={'schedule_id': self.schedule.id})
+        response = self.client.get(url, {'suggestions': 5})
+        requirement = json.loads(response.content.decode('utf-8'))['requirement_sets'][0]['requirements'][0]
+        self.assertEqual(requirement['status'], 'U')
+        self.assertEqual(dict((course['id'], course['status']) for course in requirement['courses']),
+                         {self.sections[0].course_id: 'S', self.sections[1].course_id: 'U', self.sections[2].course_id: 'U'})
+        self.assertEqual(set(section['id'] for section in requirement['suggestions']), set([self.sections[1].id, self.sections[2].id]))
+        self.assertEqual(self.client.get(url, {'suggestions': 5}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.schedule.add_section(self.sections[1])
+        data = self.get_json(url, {'suggestions': 5}, HTTP_IF_NONE_MATCH=response['ETag'])
+        requirement = data['requirement_sets'][0]['requirements'][0]
+        self.assertEqual(requirement['status'], 'S')
+        self.assertNotIn('suggestions', requirement)
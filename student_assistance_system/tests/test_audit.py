@@ -0,0 +1,113 @@
+from autofixture import AutoFixture
+from django.core.cache import cache
+from django.test import TestCase
+from student_assistance_system.audit import RequirementAuditor
+from student_assistance_system.models import *
+from django.contrib.auth.models import User
+
+
+class RequirementAuditorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(course_number='101', canonical=None, credit_hours=4)).create(6)
+        cls.other_courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(course_number='102', canonical=None, credit_hours=3)).create(4)
+        cls.user = AutoFixture(User, generate_fk=True).create_one()
+        cls.schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=cls.user.profile)).create_one()
+        cls.req_set = AutoFixture(RequirementSet, generate_fk=True, field_values=dict(type=0)).create_one()
+
+        for course in cls.courses[:3]:
+            CompletedCourse.objects.create(user=cls.user.profile, course=course, grade='A')
+        for course in (cls.courses[3], cls.other_courses[0]):
+            cls.schedule.sections.add(AutoFixture(Section, generate_m2m=False, field_values=dict(course=course)).create_one())
+
+    def add_requirements(self, count):
+        for i in range(0, count):
+            req = create_requirement('req %d' % i, None, 4, Course.objects.filter(course_number__in=['101', '102'][:i % 2 + 1]))
+            self.req_set.requirements.add(req)
+
+    def audit(self):
+        req_sets = list(RequirementSet.objects.filter(pk=self.req_set.pk))
+        return RequirementAuditor(self.user.profile, self.schedule).audit(req_sets)
+
+    def test_matches_requirement_methods(self):
+        self.add_requirements(4)
+        for req_set, results in self.audit():
+            self.assertEqual(req_set, self.req_set)
+            self.assertEqual(len(results), 4)
+            for result in results:
+                expected = result.requirement.get_course_statuses(self.user, self.schedule)
+                self.assertDictEqual(result.course_statuses, expected)
+                self.assertEqual(result.status, result.requirement.fulfillment_status(expected))
+
+    def test_statuses(self):
+        self.add_requirements(1)
+        result = self.audit()[0][1][0]
+        self.assertEqual([result.course_statuses[c] for c in self.courses], ['F', 'F', 'F', 'S', 'U', 'U'])
+        self.assertEqual(result.status, 'S')
+
+    def test_query_count_constant(self):
+        self.add_requirements(2)
+        with self.assertNumQueries(5):
+            self.audit()
+        self.add_requirements(20)
+        with self.assertNumQueries(5):
+            self.assertEqual(len(self.audit()[0][1]), 22)
+
+    def test_no_schedule(self):
+        self.add_requirements(1)
+        req_sets = list(RequirementSet.objects.filter(pk=self.req_set.pk))
+        result = RequirementAuditor(self.user.profile, None).audit(req_sets)[0][1][0]
+        self.assertEqual(result.course_statuses[self.courses[3]], 'U')
+        self.assertEqual(result.status, 'U')
+
+
+class CachedAuditTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(course_number='101', canonical=None, credit_hours=3)).create(4)
+        self.user = AutoFixture(User, generate_fk=True).create_one()
+        self.profile = self.user.profile
+        self.schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=self.profile)).create_one()
+        self.section = AutoFixture(Section, generate_m2m=False, field_values=dict(course=self.courses[0])).create_one()
+        self.req_set = AutoFixture(RequirementSet, generate_fk=True, field_values=dict(type=0)).create_one()
+        self.req_set.requirements.add(create_requirement('req', None, 1, Course.objects.filter(course_number='101')))
+
+    def status(self):
+        req_sets = list(RequirementSet.objects.filter(pk=self.req_set.pk))
+        return RequirementAuditor(self.profile, self.schedule).cached_audit(req_sets)[0][1][0].status
+
+    def test_repeat_audit_is_free(self):
+        self.assertEqual(self.status(), 'U')
+        req_sets = list(RequirementSet.objects.filter(pk=self.req_set.pk))
+        with self.assertNumQueries(0):
+            RequirementAuditor(self.profile, self.schedule).cached_audit(req_sets)
+
+    def test_schedule_invalidates(self):
+        self.assertEqual(self.status(), 'U')
+        self.schedule.sections.add(self.section)
+        self.assertEqual(self.status(), 'S')
+        self.section.schedule_set.clear()
+        self.assertEqual(self.status(), 'U')
+
+    def test_completed_course_invalidates(self):
+        self.assertEqual(self.status(), 'U')
+        completed = CompletedCourse.objects.create(user=self.profile, course=self.courses[1], grade='A')
+        self.assertEqual(self.status(), 'F')
+        completed.delete()
+        self.assertEqual(self.status(), 'U')
+
+    def test_requirements_invalidate(self):
+        CompletedCourse.objects.create(user=self.profile, course=self.courses[1], grade='A')
+        self.assertEqual(self.status(), 'F')
+        Requirement.objects.update(required_classes=2)
+        self.assertEqual(self.status(), 'F')  # Queryset updates send no signals
+        self.req_set.requirements.all()[0].save()
+        self.assertEqual(self.status(), 'U')
+
+    def test_profiles_are_separate(self):
+        other = AutoFixture(User, generate_fk=True).create_one().profile
+        self.assertEqual(self.status(), 'U')
+        CompletedCourse.objects.create(user=other, course=self.courses[1], grade='A')
+        req_sets = list(RequirementSet.objects.filter(pk=self.req_set.pk))
+        with self.assertNumQueries(0):
+            self.assertEqual(RequirementAuditor(self.profile, self.schedule).cached_audit(req_sets)[0][1][0].status, 'U')
@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from student_assistance_system import availability
+from student_assistance_system.availability import availability_metrics, get_availability, invalidate_availability
+from student_assistance_system.enrollment import drop, enroll
+from student_assistance_system.models import *
+
+
+class AvailabilityTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_availability()
+        department = Department.objects.create(full_name='EECS', abbr_name='EECS')
+        course = Course.objects.create(name='Course', description='', course_number='132', department=department,
+                                       credit_hours=3)
+        self.sections = [Section.objects.create(course=course, capacity=capacity, enrolled=enrolled, professor='Staff',
+                                                location='') for capacity, enrolled in ((2, 1), (2, 2), (3, 0))]
+        self.students = [User.objects.create_user('student%d' % i).profile for i in range(0, 2)]
+
+    def open_seats(self):
+        snapshot = get_availability()
+        return [snapshot.open_seats(section.pk) for section in self.sections]
+
+    def test_load(self):
+        refreshes = availability_metrics()['refreshes']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.open_seats(), [1, 0, 3])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.open_seats(), [1, 0, 3])
+            self.assertEqual(get_availability().open_seats(self.sections[-1].pk + 1), 0)
+        self.assertEqual(availability_metrics()['refreshes'], refreshes + 1)
+
+    def test_enrollment_events(self):
+        self.open_seats()
+        enroll(self.students[0], self.sections[0])
+        enroll(self.students[1], self.sections[2])
+        self.assertEqual(self.open_seats(), [0, 0, 2])
+        drop(self.students[0], self.sections[0])
+        self.assertEqual(self.open_seats(), [1, 0, 2])
+        self.sections[1].capacity = 4
+        self.sections[1].save()
+        self.assertEqual(self.open_seats(), [1, 2, 2])
+        section_id = self.sections.pop().pk
+        Section.objects.get(pk=section_id).delete()
+        self.assertEqual(self.open_seats(), [1, 2])
+        self.assertFalse(get_availability().has_open_seats(section_id))
+
+    def test_staleness_bound(self):
+        self.open_seats()
+        # Another process taking the last seat goes unseen until the snapshot is reloaded
+        Section.objects.filter(pk=self.sections[0].pk).update(enrolled=2)
+        self.assertEqual(self.open_seats(), [1, 0, 3])
+        with self.settings(SAS_AVAILABILITY_MAX_AGE=0):
+            availability._snapshot.loaded_at -= 1
+            self.assertEqual(self.open_seats(), [0, 0, 3])
+
+    def test_with_open_seats(self):
+        sections = Section.objects.order_by('pk')
+        self.assertEqual(list(with_open_seats(sections)), [self.sections[0], self.sections[2]])
+        Section.objects.filter(pk=self.sections[2].pk).update(enrolled=3)
+        self.assertEqual(list(with_open_seats(sections)), [self.sections[0]])
+
+    def test_search_results(self):
+        User.objects.create_user('test', password='test')
+        self.assertTrue(self.client.login(username='test', password='test'))
+        self.open_seats()
+        refreshes = availability_metrics()['refreshes']
+        # Seats taken by another process, which this process's snapshot has not seen yet
+        Section.objects.filter(pk=self.sections[2].pk).update(enrolled=1)
+        response = self.client.get(reverse('student_assistance_system:courses'), {'dep': 'eecs', 'open': 'on'})
+        self.assertEqual(list(response.context['sections']), [self.sections[0], self.sections[2]])
+        self.assertEqual([section.open_seats for section in response.context['sections']], [1, 2])
+        self.assertEqual(availability_metrics()['refreshes'], refreshes)
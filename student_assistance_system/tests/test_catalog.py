@@ -0,0 +1,171 @@
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils.six import StringIO
+from student_assistance_system.models import *
+from student_assistance_system.prereqs import get_prerequisite_graph
+from student_assistance_system.search import get_search_backend
+
+
+class GenerateCatalogTest(TestCase):
+    def generate(self, **options):
+        call_command('generate_catalog', departments=3, courses=30, sections=60, students=4, stdout=StringIO(), **options)
+
+    def test_counts(self):
+        self.generate()
+        self.assertEqual(Department.objects.count(), 3)
+        self.assertEqual(Course.objects.count(), 30)
+        self.assertEqual(Section.objects.count(), 60)
+        self.assertEqual(RequirementSet.objects.count(), 6)
+        self.assertEqual(Profile.objects.filter(user__username__startswith='student').count(), 4)
+        self.assertEqual(UserMajor.objects.count(), 4)
+        self.assertTrue(Schedule.objects.filter(sections__isnull=False).exists())
+
+    def test_reproducible(self):
+        self.generate(seed=3)
+        first = list(Course.objects.order_by('pk').values_list('name', 'course_number'))
+        Course.objects.all().delete()
+        self.generate(seed=3, prefix='other')
+        self.assertListEqual(list(Course.objects.order_by('pk').values_list('name', 'course_number')), first)
+
+    def test_prerequisite_graph(self):
+        cache.clear()
+        self.assertEqual(get_prerequisite_graph().ineligible([]), set())
+        self.generate()
+        # The prerequisites are bulk inserted, which the graph of the running process has to be told about
+        self.assertEqual(get_prerequisite_graph().ineligible([]),
+                         set(Course.objects.filter(prereqs__isnull=False).values_list('pk', flat=True)))
+
+    def test_derived_fields(self):
+        self.generate()
+        for course in Course.objects.all():
+            self.assertEqual((course.number_int, course.number_suffix), parse_course_number(course.course_number))
+            self.assertFalse(course.prereqs.filter(number_int__gte=course.number_int // 100 * 100).exists())
+        for section in Section.objects.prefetch_related('meeting_times'):
+            masks = section.meeting_mask
+            section.update_meeting_mask()
+            self.assertEqual(section.meeting_mask, masks)
+        for schedule in Schedule.objects.prefetch_related('sections'):
+            sections = list(schedule.sections.all())
+            self.assertFalse(any(a.conflicts_with(b) for a in sections for b in sections if a != b))
+        for requirement in Requirement.objects.all():
+            self.assertSetEqual(set(requirement.courses.all()), set(requirement.get_course_set()))
+        section = Section.objects.select_related('course').first()
+        self.assertIn(section.pk, get_search_backend().search(section.course.name))
+
+    def test_existing_students(self):
+        self.generate()
+        self.assertRaises(CommandError, self.generate)
+
+
+class BenchmarkTest(TestCase):
+    def test_output_and_compare(self):
+        call_command('generate_catalog', departments=2, courses=20, sections=40, students=2, stdout=StringIO())
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            call_command('benchmark', repeat=1, output=path, stdout=StringIO())
+            with open(path) as f:
+                results = json.load(f)['results']
+            self.assertGreater(results['view:index']['queries'], 0)
+            # Cold runs recompute what warm runs read from the cache
+            self.assertGreater(results['view:index:cold']['queries'], results['view:index']['queries'])
+            self.assertIn('model:RequirementAuditor.audit', results)
+
+            for result in results.values():
+                result['queries'] = 0
+            with open(path, 'w') as f:
+                json.dump(dict(results=results), f)
+            self.assertRaises(CommandError, call_command, 'benchmark', repeat=1, compare=path, stdout=StringIO())
+        finally:
+            os.remove(path)
+
+
+class ImportCatalogTest(TestCase):
+    CSV = ('department,department_name,course_number,name,description,credit_hours,crn,professor,location,capacity,enrolled,meetings\n'
+           'EECS,Electrical Engineering and Computer Science,393,Software Engineering,Process,3,1001,Liberatore,Olin 314,40,12,MWF 9:00-9:50\n'
+           'EECS,,393,Software Engineering,Process,3,1002,Staff,Olin 313,40,0,MWF 9:00-9:50; Th 18:00-20:50\n'
+           'MATH,Mathematics,121c,Calculus I,Limits,4,2001,Staff,Sears 200,120,80,TTh 10:00-11:15\n'
+           'MATH,Mathematics,122,Calculus II,,four,2002,Staff,Sears 200,120,80,TTh 10:00-11:15\n')
+
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.paths.append(path)
+        return path
+
+    def run_import(self, path, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_catalog', path, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_csv(self):
+        stdout, stderr = self.run_import(self.write('.csv', self.CSV), batch_size=2)
+        self.assertIn('3 sections created', stdout)
+        self.assertIn('Line 5: credit_hours is not a number', stderr)
+        self.assertEqual(Department.objects.get(abbr_name='EECS').full_name, 'Electrical Engineering and Computer Science')
+        calculus = Course.objects.get(department__abbr_name='MATH', course_number='121C')
+        self.assertEqual((calculus.number_int, calculus.number_suffix), (121, 'C'))
+        self.assertEqual(Course.objects.count(), 2)
+        # MWF 9:00 is shared by two sections, and the Tuesday and Thursday 10:00 meetings are separate rows
+        self.assertEqual(MeetingTime.objects.count(), 6)
+        section = Section.objects.get(crn='1002')
+        self.assertEqual(sorted(section.condensed_meeting_times()), ['MWF 9:00AM - 9:50AM', 'Th 6:00PM - 8:50PM'])
+        for section in Section.objects.all():
+            mask = section.meeting_mask
+            section.update_meeting_mask()
+            self.assertEqual(section.meeting_mask, mask)
+        self.assertIn(Section.objects.get(crn='2001').pk, get_search_backend().search('calculus'))
+
+    def test_upsert(self):
+        self.run_import(self.write('.csv', self.CSV))
+        meeting_times = MeetingTime.objects.count()
+        stdout, stderr = self.run_import(self.write('.csv', self.CSV))
+        self.assertIn('0 courses updated', stdout)
+        self.assertIn('0 sections updated', stdout)
+        self.assertIn('0 meeting times created', stdout)
+
+        rows = [dict(department='eecs', course_number='393', name='Software Engineering II', description='Process',
+                     credit_hours=3, crn='1001', professor='Connamacher', location='Olin 314', capacity=40,
+                     enrolled=12, meetings=['TTh 10:00-11:15']),
+                dict(department='EECS', course_number='393', name='Software Engineering II', description='Process',
+                     credit_hours=3, crn='1003', professor='Staff', location='Olin 314', capacity=40, enrolled=0,
+                     meetings='')]
+        stdout, stderr = self.run_import(self.write('.jsonl', '\n'.join(json.dumps(row) for row in rows)))
+        self.assertIn('1 courses updated', stdout)
+        self.assertIn('1 sections updated', stdout)
+        self.assertIn('1 sections created', stdout)
+        self.assertEqual(MeetingTime.objects.count(), meeting_times)
+        self.assertEqual(Course.objects.count(), 2)
+        section = Section.objects.get(crn='1001')
+        self.assertEqual(section.professor, 'Connamacher')
+        self.assertEqual(section.course.name, 'Software Engineering II')
+        self.assertSetEqual(set(section.meeting_times.values_list('day', flat=True)), {1, 3})
+        self.assertEqual(section.meeting_mask, '%x' % sum(m.occupancy() for m in section.meeting_times.all()))
+        self.assertIn(Section.objects.get(crn='1002').pk, get_search_backend().search('Software Engineering II'))
+
+    def test_requirement_memberships(self):
+        requirement = create_requirement('Software', None, 1, Course.objects.filter(name__startswith='Software'))
+        self.run_import(self.write('.csv', self.CSV))
+        self.assertEqual([c.course_number for c in requirement.courses.all()], ['393'])
+        renamed = dict(department='EECS', course_number='393', name='Process', description='Process', credit_hours=3,
+                       crn='1001', professor='Staff', location='Olin 314', capacity=40, enrolled=12, meetings='')
+        self.run_import(self.write('.jsonl', json.dumps(renamed)))
+        self.assertFalse(requirement.courses.exists())
+
+    def test_invalid_file(self):
+        self.assertRaises(CommandError, self.run_import, '/nonexistent/catalog.csv')
+        self.assertRaises(CommandError, self.run_import, self.write('.csv', self.CSV), batch_size=0)
@@ -0,0 +1,65 @@
+from autofixture import AutoFixture
+from django.core.cache import cache
+from django.test import TestCase
+from student_assistance_system.audit import RequirementAuditor
+from student_assistance_system.crosslistings import UnionFind, update_canonical_courses
+from student_assistance_system.models import *
+from student_assistance_system.suggestions import get_suggestions
+from student_assistance_system.views import SearchResultsView
+from django.contrib.auth.models import User
+
+
+class UnionFindTest(TestCase):
+    def test_classes(self):
+        classes = UnionFind()
+        classes.union(5, 3)
+        classes.union(7, 9)
+        classes.union(9, 5)
+        self.assertEqual([classes.find(x) for x in (3, 5, 7, 9, 11)], [3, 3, 3, 3, 11])
+
+
+class CrossListingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = AutoFixture(User, generate_fk=True).create_one()
+        self.schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=self.user.profile)).create_one()
+        self.courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(credit_hours=3)).create(4)
+        self.math, self.eecs, self.stat, self.other = self.courses
+        self.math.also_offered_as.add(self.eecs)
+        self.stat.also_offered_as.add(self.eecs)
+
+    def canonical_ids(self):
+        return list(Course.objects.filter(pk__in=[c.pk for c in self.courses]).order_by('pk').values_list('canonical_id', flat=True))
+
+    def test_canonical(self):
+        self.assertEqual(self.canonical_ids(), [self.math.pk] * 3 + [None])
+        self.eecs.also_offered_as.remove(self.math)
+        self.assertEqual(self.canonical_ids(), [None, self.eecs.pk, self.eecs.pk, None])
+        self.math.delete()
+        self.assertEqual(update_canonical_courses(), 0)
+
+    def test_requirement_counts_cross_listing(self):
+        requirement = create_requirement('req', None, 2, Course.objects.filter(pk__in=[self.eecs.pk, self.other.pk]))
+        CompletedCourse.objects.create(user=self.user.profile, course=self.math, grade='A')
+        statuses = requirement.get_course_statuses(self.user, self.schedule)
+        self.assertEqual(statuses[Course.objects.get(pk=self.eecs.pk)], 'F')
+        self.assertEqual(requirement.fulfillment_status(statuses), 'U')
+
+        req_set = AutoFixture(RequirementSet, generate_fk=True, field_values=dict(type=0)).create_one()
+        req_set.requirements.add(requirement)
+        result = RequirementAuditor(self.user.profile, self.schedule).audit([RequirementSet.objects.get(pk=req_set.pk)])[0][1][0]
+        self.assertDictEqual(result.course_statuses, statuses)
+
+    def test_counted_once(self):
+        requirement = create_requirement('req', None, 2, Course.objects.filter(pk__in=[self.math.pk, self.eecs.pk]))
+        CompletedCourse.objects.create(user=self.user.profile, course=self.math, grade='A')
+        statuses = requirement.get_course_statuses(self.user, self.schedule)
+        self.assertEqual(set(statuses.values()), set(['F']))
+        self.assertEqual(requirement.fulfillment_status(statuses), 'U')
+
+    def test_duplicate_sections(self):
+        sections = [AutoFixture(Section, generate_m2m=False, field_values=dict(course=course, professor='Staff', capacity=30, enrolled=0)).create_one()
+                    for course in (self.math, self.eecs, self.other)]
+        self.assertListEqual(get_suggestions([self.math.pk, self.eecs.pk, self.other.pk], None), [sections[0], sections[2]])
+        unique = SearchResultsView().remove_cross_listed_duplicates(Section.objects.order_by('pk'))
+        self.assertListEqual(list(unique), [sections[0], sections[2]])
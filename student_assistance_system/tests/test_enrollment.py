@@ -0,0 +1,127 @@
+import json
+from StringIO import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from student_assistance_system.audit import get_versions
+from student_assistance_system.enrollment import ENROLLED, WAITLISTED, EnrollmentError, drop, enroll, enrollment_status
+from student_assistance_system.facets import VERSION_KEY as CATALOG_VERSION_KEY, get_facets
+from student_assistance_system.management.commands.load_test_enrollment import Command as LoadTestCommand
+from student_assistance_system.models import *
+
+
+class EnrollmentTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        department = Department.objects.create(full_name='EECS', abbr_name='EECS')
+        course = Course.objects.create(name='Course', description='', course_number='132', department=department,
+                                       credit_hours=3)
+        self.section = Section.objects.create(course=course, capacity=2, enrolled=0, professor='Staff', location='')
+        self.students = [User.objects.create_user('student%d' % i).profile for i in range(0, 4)]
+
+    def assertEnrolled(self, students):
+        self.section.refresh_from_db()
+        self.assertEqual(self.section.enrolled, len(students))
+        self.assertEqual(set(Enrollment.objects.filter(section=self.section).values_list('user', flat=True)),
+                         set(student.pk for student in students))
+
+    def test_enroll_and_waitlist(self):
+        self.assertEqual([enroll(student, self.section) for student in self.students],
+                         [ENROLLED, ENROLLED, WAITLISTED, WAITLISTED])
+        self.assertEnrolled(self.students[:2])
+        self.assertEqual(enrollment_status(self.students[0], self.section), (ENROLLED, None))
+        self.assertEqual(enrollment_status(self.students[3], self.section), (WAITLISTED, 2))
+        for student, reason in ((self.students[0], ENROLLED), (self.students[2], WAITLISTED)):
+            with self.assertRaises(EnrollmentError) as context:
+                enroll(student, self.section)
+            self.assertEqual(context.exception.reason, reason)
+        self.assertEnrolled(self.students[:2])
+        with self.assertRaises(EnrollmentError) as context:
+            enroll(self.students[0], 0)
+        self.assertEqual(context.exception.reason, 'missing')
+
+    def test_drop(self):
+        for student in self.students:
+            enroll(student, self.section)
+        # The first student on the waitlist takes the seat
+        self.assertEqual(drop(self.students[0], self.section), self.students[2].pk)
+        self.assertEnrolled(self.students[1:3])
+        self.assertEqual(enrollment_status(self.students[3], self.section), (WAITLISTED, 1))
+        self.assertIsNone(drop(self.students[3], self.section))
+        self.assertEqual(enrollment_status(self.students[3], self.section), (None, None))
+        self.assertIsNone(drop(self.students[1], self.section))
+        self.assertEnrolled(self.students[2:3])
+        self.assertRaises(EnrollmentError, drop, self.students[1], self.section)
+
+    def test_raised_capacity(self):
+        for student in self.students[:3]:
+            enroll(student, self.section)
+        Section.objects.filter(pk=self.section.pk).update(capacity=3)
+        self.assertEqual(enroll(self.students[2], self.section), ENROLLED)
+        self.assertEnrolled(self.students[:3])
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_api(self):
+        user = User.objects.create_user('test', password='test')
+        self.assertTrue(self.client.login(username='test', password='test'))
+        for student in self.students[:2]:
+            enroll(student, self.section)
+        url = reverse('student_assistance_system:api_section_enrollment', kwargs={'section_id': self.section.pk})
+        response = self.client.post(url)
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         dict(section=self.section.pk, status=WAITLISTED, waitlist_position=1, enrolled=2, capacity=2))
+        self.assertEqual(self.client.post(url).status_code, 409)
+        drop(self.students[0], self.section)
+        self.assertEqual(json.loads(self.client.get(url).content.decode('utf-8'))['status'], ENROLLED)
+        self.assertEqual(json.loads(self.client.delete(url).content.decode('utf-8'))['enrolled'], 1)
+        self.assertEqual(enrollment_status(user.profile, self.section), (None, None))
+        url = reverse('student_assistance_system:api_section_enrollment', kwargs={'section_id': 0})
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+    def test_cache_versions(self):
+        user = User.objects.create_user('test', password='test')
+        self.assertTrue(self.client.login(username='test', password='test'))
+        schedule = Schedule.objects.create(name='Schedule', user=user.profile)
+        schedule.add_section(self.section)
+        url = reverse('student_assistance_system:api_schedule', kwargs={'schedule_id': schedule.pk})
+        etag = self.client.get(url)['ETag']
+        catalog_version, = get_versions([CATALOG_VERSION_KEY])
+        # Enrollments only invalidate what shows seats, not everything that depends on the catalog
+        enroll(self.students[0], self.section)
+        self.assertEqual(get_versions([CATALOG_VERSION_KEY]), [catalog_version])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_open_section_facets(self):
+        def facets():
+            return get_facets(with_open_seats(Section.objects.all()), dict(open='on'))['department']
+
+        self.assertEqual(facets(), [('EECS', 1)])
+        for student in self.students[:2]:
+            enroll(student, self.section)
+        self.assertEqual(facets(), [])
+
+    def test_load_test_verification(self):
+        for student in self.students:
+            enroll(student, self.section)
+        self.assertEqual(LoadTestCommand().verify([self.section.pk]), [])
+        Enrollment.objects.create(section=self.section, user=self.students[3])
+        self.assertEqual(len(LoadTestCommand().verify([self.section.pk])), 3)
+
+
+class LoadTestCommandTest(TransactionTestCase):
+    def setUp(self):
+        # Threads only see the tables of an in-memory test database where SQLite can share it between connections
+        if (connection.vendor == 'sqlite' and connection.is_in_memory_db(connection.settings_dict['NAME']) and
+                not connection.features.can_share_in_memory_db):
+            self.skipTest('The test database cannot be shared between threads')
+
+    def test_load_test(self):
+        stdout = StringIO()
+        call_command('load_test_enrollment', sections=2, capacity=3, students=20, requests=200, threads=4, stdout=stdout)
+        self.assertIn('No section was overbooked', stdout.getvalue())
+        self.assertFalse(Section.objects.exists())
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,79 @@
+import calendar
+from datetime import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.http import QueryDict
+from django.test import TestCase
+from student_assistance_system.facets import count_facets, get_facets, normalize_query
+from student_assistance_system.models import *
+
+
+class FacetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        eecs = Department.objects.create(full_name='Electrical Engineering and Computer Science', abbr_name='EECS')
+        math = Department.objects.create(full_name='Mathematics', abbr_name='MATH')
+        self.courses = [Course.objects.create(name=name, description='', course_number=number, department=department,
+                                              credit_hours=credit_hours)
+                        for name, number, department, credit_hours in [('Software Engineering', '393', eecs, 3),
+                                                                       ('Algorithms', '340', eecs, 4),
+                                                                       ('Calculus', '121', math, 4)]]
+        mwf = [MeetingTime.get_or_intern(day, time(9, 0), time(9, 50)) for day in (0, 2, 4)]
+        tth = [MeetingTime.get_or_intern(day, time(10, 0), time(11, 15)) for day in (1, 3)]
+        self.sections = []
+        for course, professor, meeting_times in [(self.courses[0], 'Andy Podgurski', mwf),
+                                                 (self.courses[0], 'Andy Podgurski', tth),
+                                                 (self.courses[1], 'Harold Connamacher', tth),
+                                                 (self.courses[2], 'James Howard', mwf)]:
+            section = Section.objects.create(course=course, capacity=30, enrolled=0, professor=professor, location='')
+            section.meeting_times.add(*meeting_times)
+            self.sections.append(section)
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query(QueryDict('page=2&prof=%20Howard&dep=math&mon=')),
+                         normalize_query(QueryDict('dep=MATH&prof=howard')))
+        self.assertNotEqual(normalize_query(QueryDict('dep=MATH')), normalize_query(QueryDict('dep=EECS')))
+
+    def test_count_facets(self):
+        with self.assertNumQueries(4):
+            facets = count_facets(Section.objects.all())
+        self.assertEqual(facets['department'], [('EECS', 3), ('MATH', 1)])
+        self.assertEqual(facets['credits'], [(3, 2), (4, 2)])
+        self.assertEqual(facets['day'], [(0, 2), (1, 2), (2, 2), (3, 2), (4, 2)])
+        self.assertEqual(facets['professor'], [('Andy Podgurski', 2), ('Harold Connamacher', 1), ('James Howard', 1)])
+        facets = count_facets(Section.objects.filter(course__department__abbr_name='EECS'))
+        self.assertEqual(facets['day'], [(0, 1), (1, 2), (2, 1), (3, 2), (4, 1)])
+
+    def test_cached_per_query(self):
+        sections = Section.objects.filter(course__department__abbr_name='EECS')
+        facets = get_facets(sections, QueryDict('dep=EECS'))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_facets(sections, QueryDict('dep=eecs&page=2')), facets)
+        self.sections[1].delete()
+        self.assertEqual(get_facets(sections, QueryDict('dep=EECS'))['department'], [('EECS', 2)])
+
+    def test_results_page(self):
+        User.objects.create_user('test', password='test')
+        self.assertTrue(self.client.login(username='test', password='test'))
+        response = self.client.get(reverse('student_assistance_system:courses'), {'dep': 'EECS', 'page': 1})
+        facets = dict(response.context['facets'])
+        self.assertEqual(facets['Department'], [('EECS', 3, '?dep=EECS')])
+        self.assertEqual([(label, count) for label, count, url in facets['Days']],
+                         [('Mon', 1), ('Tue', 2), ('Wed', 1), ('Thu', 2), ('Fri', 1)])
+        credits, count, url = facets['Credit hours'][0]
+        self.assertEqual((credits, count), (3, 2))
+        self.assertEqual(QueryDict(url[1:]), QueryDict('dep=EECS&credits=3'))
+
+    def test_day_facet_links(self):
+        User.objects.create_user('test', password='test')
+        self.assertTrue(self.client.login(username='test', password='test'))
+        url = reverse('student_assistance_system:courses')
+        response = self.client.get(url, {'dep': 'EECS', 'mon': 'on', 'tue': 'on', 'wed': 'on', 'thu': 'on', 'fri': 'on'})
+        for label, count, link in dict(response.context['facets'])['Days']:
+            # Following a day's link narrows the results down to the number shown next to it
+            results = self.client.get(url + link)
+            self.assertEqual(results.context['paginator'].count, count, label)
+            self.assertTrue(all(section.day_mask & 1 << list(calendar.day_abbr).index(label)
+                                for section in results.context['sections']))
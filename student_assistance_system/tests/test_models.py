@@ -1,7 +1,12 @@
 from autofixture import AutoFixture
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils.six import StringIO
 from datetime import *
+import random
 from student_assistance_system.models import *
+from student_assistance_system import models
 from django.contrib.auth.models import User
 
 
@@ -21,11 +26,27 @@ class RequirementSetTest(TestCase):
             self.assertEqual(self.test_reqs.type_name(), values[reqs_type])
 
 
+class CourseTest(TestCase):
+    def test_parse_course_number(self):
+        self.assertEqual(parse_course_number('121'), (121, ''))
+        self.assertEqual(parse_course_number('121c'), (121, 'C'))
+        self.assertEqual(parse_course_number('ABC'), (999, 'C'))
+        self.assertEqual(parse_course_number(''), (999, ''))
+
+    def test_number_fields_kept_in_sync(self):
+        course = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(course_number='393b')).create_one()
+        self.assertEqual((course.number_int, course.number_suffix), (393, 'B'))
+        course.course_number = '400'
+        course.save()
+        course = Course.objects.get(pk=course.pk)
+        self.assertEqual((course.number_int, course.number_suffix), (400, ''))
+
+
 class RequirementTest(TestCase):
     @classmethod
     def setUpTestData(cls):
-        cls.req_courses = AutoFixture(Course, generate_fk=True, field_values=dict(course_number='101', credit_hours=4)).create(10)
-        cls.other_courses = AutoFixture(Course, generate_fk=True, field_values=dict(course_number='102')).create(5)
+        cls.req_courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(course_number='101', canonical=None, credit_hours=4)).create(10)
+        cls.other_courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(course_number='102', canonical=None)).create(5)
 
         req_queryset = Course.objects.filter(course_number__exact='101')
         cls.req = create_requirement('test', None, 10, req_queryset)
@@ -56,6 +77,26 @@ class RequirementTest(TestCase):
     def test_get_course_set(self):
         self.assertListEqual(list(self.req.get_course_set()), self.req_courses)
 
+    def test_compiled_courses(self):
+        self.assertListEqual(list(self.req.courses.order_by('pk')), self.req_courses)
+
+    def test_refresh_courses(self):
+        new_course = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(course_number='101', canonical=None)).create_one()
+        self.assertNotIn(new_course, self.req.courses.all())
+        self.req.refresh_courses([new_course.pk])
+        self.assertIn(new_course, self.req.courses.all())
+
+        new_course.course_number = '102'
+        new_course.save()
+        self.req.refresh_courses([new_course.pk, self.req_courses[0].pk])
+        self.assertNotIn(new_course, self.req.courses.all())
+        self.assertListEqual(list(self.req.courses.order_by('pk')), self.req_courses)
+
+    def test_refresh_requirements_command(self):
+        RequirementCourse.objects.filter(requirement=self.req).delete()
+        call_command('refresh_requirements', stdout=StringIO())
+        self.assertListEqual(list(self.req.courses.order_by('pk')), self.req_courses)
+
     def test_get_course_statuses_empty_schedule(self):
         statuses = self.req.get_course_statuses(self.user, self.schedule)
         for i in range(0, 9):
@@ -107,7 +148,7 @@ class ScheduleTest(TestCase):
     def setUpTestData(cls):
         cls.user = AutoFixture(User, generate_fk=True).create_one()
         cls.schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=cls.user.profile)).create_one()
-        cls.req_courses = AutoFixture(Course, generate_fk=True, field_values=dict(course_number='101', credit_hours=4)).create(10)
+        cls.req_courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(course_number='101', canonical=None, credit_hours=4)).create(10)
 
     def test_delete_section(self):
         section = AutoFixture(Section, generate_m2m=False, field_values=dict(course=self.req_courses[9])).create_one()
@@ -126,6 +167,42 @@ class ScheduleTest(TestCase):
         self.schedule.change_name('newScheduleName')
         self.assertEqual(self.schedule.name,'newScheduleName')
 
+    def create_sections(self, days):
+        sections = []
+        for i, day in enumerate(days):
+            section = Section.objects.create(course=self.req_courses[i], capacity=30, enrolled=0, professor='Staff', location='')
+            section.meeting_times.add(MeetingTime.get_or_intern(day, time(9, 0), time(9, 50)))
+            sections.append(section)
+        return sections
+
+    def test_change_sections(self):
+        monday, tuesday, wednesday, other_monday = self.create_sections([0, 1, 2, 0])
+        self.schedule.change_sections(add=[monday, tuesday.pk])
+        updated = Schedule.objects.get(pk=self.schedule.pk).updated
+        # Swapping sections that meet at the same time works when both changes are made together
+        with self.assertNumQueries(9):
+            self.schedule.change_sections(add=[other_monday, wednesday], remove=[monday.pk, tuesday])
+        self.assertEqual(set(self.schedule.sections.all()), set([other_monday, wednesday]))
+        self.assertGreater(Schedule.objects.get(pk=self.schedule.pk).updated, updated)
+
+    def test_change_sections_rejected(self):
+        monday, tuesday, wednesday, other_monday = self.create_sections([0, 1, 2, 0])
+        self.schedule.change_sections(add=[monday])
+        updated = Schedule.objects.get(pk=self.schedule.pk).updated
+        with self.assertRaises(ScheduleChangeError) as cm:
+            self.schedule.change_sections(add=[tuesday, other_monday], remove=[wednesday])
+        self.assertEqual((cm.exception.reason, cm.exception.section_ids), ('conflict', sorted([monday.pk, other_monday.pk])))
+        Section.objects.filter(pk=wednesday.pk).update(enrolled=30)
+        with self.assertRaises(ScheduleChangeError) as cm:
+            self.schedule.change_sections(add=[tuesday, wednesday], remove=[monday])
+        self.assertEqual((cm.exception.reason, cm.exception.section_ids), ('full', [wednesday.pk]))
+        with self.assertRaises(ScheduleChangeError) as cm:
+            self.schedule.change_sections(add=[tuesday, 0])
+        self.assertEqual((cm.exception.reason, cm.exception.section_ids), ('missing', [0]))
+        # Nothing was changed
+        self.assertEqual(list(self.schedule.sections.all()), [monday])
+        self.assertEqual(Schedule.objects.get(pk=self.schedule.pk).updated, updated)
+
 
 
 
@@ -155,11 +232,61 @@ class MeetingTimeTest(TestCase):
         m2 = MeetingTime.objects.create(day=1, start_time=time(7, 30), end_time=time(8, 30))
         self.check_conflicts(m1, m2, True)
 
+    def test_occupancy(self):
+        m = MeetingTime(day=1, start_time=time(0, 10), end_time=time(0, 20))
+        self.assertEqual(m.occupancy(), 0b111 << (SLOTS_PER_DAY + 2))
+        m = MeetingTime(day=0, start_time=time(0, 12), end_time=time(0, 14))
+        self.assertEqual(m.occupancy(), 0b1 << 2)
+
+
+    def test_unique(self):
+        MeetingTime.objects.create(day=1, start_time=time(6, 30), end_time=time(7, 30))
+        with transaction.atomic():
+            self.assertRaises(IntegrityError, MeetingTime.objects.create, day=1, start_time=time(6, 30), end_time=time(7, 30))
+        m = MeetingTime.get_or_intern(1, time(6, 30), time(7, 30))
+        self.assertEqual(MeetingTime.get_or_intern(1, time(6, 30), time(7, 30)).pk, m.pk)
+        self.assertEqual(MeetingTime.objects.count(), 1)
+
+
+class MeetingTimeInterningTest(TransactionTestCase):
+    def tearDown(self):
+        # Rows are flushed after every test, so their ids must not outlive it
+        models._interned_meeting_times.clear()
+
+    def test_cached_after_commit(self):
+        m = MeetingTime.get_or_intern(2, time(9, 0), time(9, 50))
+        with self.assertNumQueries(0):
+            cached = MeetingTime.get_or_intern(2, time(9, 0), time(9, 50))
+        self.assertEqual((cached.pk, cached.occupancy()), (m.pk, m.occupancy()))
+        section = AutoFixture(Section, generate_fk=True, generate_m2m=False).create_one()
+        section.meeting_times.add(cached)
+        self.assertEqual(Section.objects.get(pk=section.pk).occupancy(), m.occupancy())
+
+    def test_not_cached_after_rollback(self):
+        with transaction.atomic():
+            MeetingTime.get_or_intern(2, time(9, 0), time(9, 50))
+            transaction.set_rollback(True)
+        m = MeetingTime.get_or_intern(2, time(9, 0), time(9, 50))
+        self.assertTrue(MeetingTime.objects.filter(pk=m.pk).exists())
+
+    def test_intern_all(self):
+        MeetingTime.objects.create(day=0, start_time=time(8, 0), end_time=time(8, 50))
+        MeetingTime.intern_all()
+        with self.assertNumQueries(0):
+            MeetingTime.get_or_intern(0, time(8, 0), time(8, 50))
+
+    def test_forgotten_after_delete(self):
+        MeetingTime.get_or_intern(2, time(9, 0), time(9, 50)).delete()
+        m = MeetingTime.get_or_intern(2, time(9, 0), time(9, 50))
+        self.assertTrue(MeetingTime.objects.filter(pk=m.pk).exists())
+
 
 class SectionTest(TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.sections = AutoFixture(Section, generate_fk=True, generate_m2m=False).create(2)
+        for section in cls.sections:
+            section.update_meeting_mask()  # AutoFixture fills in random summary fields
         # Creation of MeetingTime objects *must* follow Section creation due to AutoFixture bug
         cls.m1 = MeetingTime.objects.create(day=1, start_time=time(6, 30), end_time=time(7, 30))
         cls.m2 = MeetingTime.objects.create(day=1, start_time=time(8, 30), end_time=time(10, 30))
@@ -193,3 +320,42 @@ class SectionTest(TestCase):
         s2.meeting_times.add(self.m1)
         s2.meeting_times.add(self.m2)
         self.check_conflicts(s1, s2, True)
+
+    def test_meeting_mask_maintained(self):
+        s1 = self.sections[0]
+        s1.meeting_times.add(self.m1, self.m2)
+        self.assertEqual(Section.objects.get(pk=s1.pk).occupancy(), self.m1.occupancy() | self.m2.occupancy())
+        self.m2.section_set.remove(s1)
+        self.assertEqual(Section.objects.get(pk=s1.pk).occupancy(), self.m1.occupancy())
+        self.m1.end_time = time(8, 0)
+        self.m1.save()
+        self.assertEqual(Section.objects.get(pk=s1.pk).occupancy(), self.m1.occupancy())
+        self.m1.section_set.clear()
+        self.assertEqual(Section.objects.get(pk=s1.pk).occupancy(), 0)
+
+    def test_meeting_summary_maintained(self):
+        s1 = self.sections[0]
+        m3 = MeetingTime.objects.create(day=3, start_time=time(9, 0), end_time=time(9, 50))
+        s1.meeting_times.add(self.m1, m3)
+        s1 = Section.objects.get(pk=s1.pk)
+        self.assertEqual((s1.day_mask, s1.earliest_start, s1.latest_end), (0b1010, time(6, 30), time(9, 50)))
+        self.assertEqual(list(within_time_window(Section.objects.all(), [1, 3], time(6, 30), time(9, 50))), [s1])
+        self.assertEqual(list(within_time_window(Section.objects.all(), [1, 2, 3, 4])), [s1])
+        self.assertEqual(list(within_time_window(Section.objects.all(), [1])), [])
+        self.assertEqual(list(within_time_window(Section.objects.all(), None, time(7, 0))), [])
+        self.assertEqual(list(within_time_window(Section.objects.all(), None, None, time(9, 45))), [])
+        s1.meeting_times.clear()
+        s1 = Section.objects.get(pk=s1.pk)
+        self.assertEqual((s1.day_mask, s1.earliest_start, s1.latest_end), (0, None, None))
+
+    def test_conflicts_matches_pairwise(self):
+        rng = random.Random(0)
+        times = [MeetingTime.get_or_intern(rng.randint(0, 4), time(start // 60, start % 60),
+                                           time((start + length) // 60, (start + length) % 60))
+                 for start, length in [(rng.randrange(8 * 60, 18 * 60, 5), rng.choice([50, 75, 110])) for i in range(0, 30)]]
+        sections = AutoFixture(Section, generate_fk=True, generate_m2m=False).create(15)
+        for section in sections:
+            section.meeting_times.add(*rng.sample(times, rng.randint(1, 3)))
+        for s1 in sections:
+            for s2 in sections:
+                self.assertEqual(s1.conflicts_with(s2), s1.conflicts_with_pairwise(s2))
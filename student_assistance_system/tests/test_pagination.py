@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from student_assistance_system.models import *
+from student_assistance_system.pagination import CursorPaginator, InvalidCursor
+from student_assistance_system.views import CURSOR_ORDERING
+
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        departments = [Department.objects.create(full_name=abbr, abbr_name=abbr) for abbr in ('MATH', 'EECS')]
+        for department in departments:
+            for number in ('393', '132', '132'):
+                course = Course.objects.create(name='Course', description='', course_number=number,
+                                               department=department, credit_hours=3)
+                for i in range(0, 2):
+                    Section.objects.create(course=course, capacity=30, enrolled=0, professor='Staff', location='')
+        self.sections = Section.objects.select_related('course__department')
+        self.expected = list(self.sections.order_by(*CURSOR_ORDERING))
+
+    def test_ordering(self):
+        self.assertEqual([(s.course.department.abbr_name, s.course.course_number) for s in self.expected[::4]],
+                         [('EECS', '132'), ('EECS', '393'), ('MATH', '132')])
+
+    def test_forwards_and_backwards(self):
+        paginator = CursorPaginator(self.sections, CURSOR_ORDERING, 5)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([list(page) for page in pages], [self.expected[0:5], self.expected[5:10], self.expected[10:]])
+        self.assertEqual([page.has_previous() for page in pages], [False, True, True])
+        self.assertEqual(list(paginator.page(pages[2].previous_cursor)), self.expected[5:10])
+        first = paginator.page(pages[1].previous_cursor)
+        self.assertEqual(list(first), self.expected[0:5])
+        self.assertFalse(first.has_previous())
+        self.assertEqual(list(paginator.page(first.next_cursor)), self.expected[5:10])
+
+    def test_fixed_query_count(self):
+        paginator = CursorPaginator(self.sections, CURSOR_ORDERING, 2)
+        with self.assertNumQueries(1):
+            page = paginator.page()
+        while page.has_next():
+            with self.assertNumQueries(1):
+                page = paginator.page(page.next_cursor)
+
+    def test_invalid_cursor(self):
+        paginator = CursorPaginator(self.sections, CURSOR_ORDERING, 5)
+        for cursor in ('garbage', paginator.encode([1], False)):
+            self.assertRaises(InvalidCursor, paginator.page, cursor)
+
+    def test_search_results(self):
+        User.objects.create_user('test', password='test')
+        self.assertTrue(self.client.login(username='test', password='test'))
+        url = reverse('student_assistance_system:courses')
+        response = self.client.get(url, {'dep': 'EECS', 'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['paginator'])
+        self.assertEqual(list(response.context['sections']), [s for s in self.expected if s.course.department.abbr_name == 'EECS'])
+        self.assertEqual(response.context['result_count'], 6)
+        self.assertFalse(response.context['next_url'])
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 404)
+        response = self.client.get(url, {'dep': 'EECS'})
+        self.assertEqual(response.context['paginator'].count, 6)
@@ -0,0 +1,117 @@
+import time as timer
+
+from autofixture import AutoFixture
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+from student_assistance_system.audit import RequirementAuditor
+from student_assistance_system.models import *
+from student_assistance_system.planner import DegreePlanner, get_degree_plan
+from student_assistance_system.prereqs import PrerequisiteGraph
+from student_assistance_system.tests.utils import QueryBudgetMixin
+from django.contrib.auth.models import User
+
+
+class DegreePlannerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = AutoFixture(User, generate_fk=True).create_one()
+        self.profile = self.user.profile
+        self.req_set = AutoFixture(RequirementSet, generate_fk=True, field_values=dict(type=0)).create_one()
+        self.courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True,
+                                   field_values=dict(course_number='101', credit_hours=3)).create(8)
+
+    def require(self, name, courses, required_classes):
+        requirement = create_requirement(name, None, required_classes, Course.objects.filter(pk__in=[c.pk for c in courses]))
+        self.req_set.requirements.add(requirement)
+        return requirement
+
+    def plan(self, edges=(), credit_cap=18):
+        req_sets = list(RequirementSet.objects.filter(pk=self.req_set.pk))
+        audit = RequirementAuditor(self.profile, None).audit(req_sets)
+        completed = self.profile.completedcourse_set.values_list('course_id', flat=True)
+        graph = PrerequisiteGraph((a.pk, b.pk) for a, b in edges)
+        return DegreePlanner(audit, completed, graph, credit_cap).plan()
+
+    def term_ids(self, plan):
+        return [[course.pk for course in term.courses] for term in plan.terms]
+
+    def test_prerequisites_first(self):
+        c = self.courses
+        self.require('core', c[2:4], 2)
+        plan = self.plan([(c[2], c[1]), (c[1], c[0]), (c[3], c[0])])
+        self.assertEqual(self.term_ids(plan), [[c[0].pk], [c[1].pk, c[3].pk], [c[2].pk]])
+        CompletedCourse.objects.create(user=self.profile, course=c[0], grade='A')
+        self.assertEqual(self.term_ids(self.plan([(c[2], c[1]), (c[1], c[0]), (c[3], c[0])])), [[c[1].pk, c[3].pk], [c[2].pk]])
+
+    def test_credit_cap_prefers_critical_path(self):
+        c = self.courses
+        self.require('core', c[:4], 4)
+        plan = self.plan([(c[1], c[3])], credit_cap=6)
+        self.assertEqual([len(term.courses) for term in plan.terms], [2, 2])
+        self.assertIn(c[3], plan.terms[0].courses)
+        self.assertTrue(all(term.credit_hours <= 6 for term in plan.terms))
+
+    def test_shared_courses(self):
+        c = self.courses
+        self.require('first', [c[0], c[1]], 1)
+        self.require('second', [c[1], c[2]], 1)
+        self.assertEqual(self.term_ids(self.plan()), [[c[1].pk]])
+
+    def test_fewest_missing_prerequisites(self):
+        c = self.courses
+        self.require('elective', [c[0], c[1]], 1)
+        self.assertEqual(self.term_ids(self.plan([(c[0], c[5]), (c[5], c[6])])), [[c[1].pk]])
+
+    def test_unmet_and_cycles(self):
+        c = self.courses
+        unmet = self.require('too many', c[:2], 3)
+        self.require('cyclic', [c[4]], 1)
+        plan = self.plan([(c[4], c[5]), (c[5], c[4])])
+        self.assertEqual(plan.unmet, [unmet])
+        self.assertEqual(set(plan.unplannable), set([c[4], c[5]]))
+
+    def test_four_year_major(self):
+        courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(credit_hours=3)).create(120)
+        edges = [(courses[i], courses[i - 1 - i % 7]) for i in range(10, 120, 2)]
+        for i in range(0, 8):
+            self.require('req %d' % i, courses[i * 15:(i + 1) * 15], 5)
+        start = timer.time()
+        plan = self.plan(edges)
+        self.assertLess(timer.time() - start, 1)
+        self.assertEqual(plan.unmet, [])
+        taken = set()
+        for term in plan.terms:
+            self.assertLessEqual(term.credit_hours, 18)
+            for course in term.courses:
+                for a, b in edges:
+                    if a == course:
+                        self.assertIn(b.pk, taken)
+            taken.update(course.pk for course in term.courses)
+
+    def test_cached(self):
+        self.require('core', self.courses[:2], 1)
+        req_sets = list(RequirementSet.objects.filter(pk=self.req_set.pk))
+        plan = get_degree_plan(self.profile, req_sets)
+        self.assertEqual(len(plan.terms), 1)
+        with self.assertNumQueries(0):
+            get_degree_plan(self.profile, req_sets)
+        CompletedCourse.objects.create(user=self.profile, course=self.courses[0], grade='A')
+        self.assertEqual(get_degree_plan(self.profile, req_sets).terms, [])
+
+
+@override_settings(SAS_QUERY_SAMPLE_RATE=1.0)
+class DegreePlanViewTest(QueryBudgetMixin, TestCase):
+    def test_view(self):
+        cache.clear()
+        user = User.objects.create_user('planner', password='test')
+        req_set = AutoFixture(RequirementSet, generate_fk=True, field_values=dict(type=0)).create_one()
+        courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(credit_hours=3)).create(10)
+        req_set.requirements.add(create_requirement('core', None, 8, Course.objects.filter(pk__in=[c.pk for c in courses])))
+        UserMajor.objects.create(name=user.profile, major=req_set)
+        self.assertTrue(self.client.login(username='planner', password='test'))
+        response = self.client.get(reverse('student_assistance_system:degree_plan'), {'hours': '12'})
+        self.assertEqual([term.credit_hours for term in response.context['plan'].terms], [12, 12])
+        cached = self.assertWithinQueryBudget(reverse('student_assistance_system:degree_plan'), {'hours': '12'})
+        self.assertLess(cached.query_stats.query_count, response.query_stats.query_count)
+        self.assertEqual(self.client.get(reverse('student_assistance_system:degree_plan'), {'hours': 'x'}).context['hours'], 18)
@@ -0,0 +1,107 @@
+from autofixture import AutoFixture
+from django.core.cache import cache
+from django.test import TestCase
+from datetime import time
+from student_assistance_system.models import *
+from student_assistance_system.prereqs import PrerequisiteGraph, get_prerequisite_graph
+from student_assistance_system.suggestions import get_suggestions
+from django.contrib.auth.models import User
+
+
+class PrerequisiteGraphTest(TestCase):
+    def setUp(self):
+        # 4 needs 2 and 3, which both need 1; 6 and 7 need each other
+        self.graph = PrerequisiteGraph([(2, 1), (3, 1), (4, 2), (4, 3), (5, 4), (6, 7), (7, 6)])
+
+    def test_closure(self):
+        self.assertItemsEqual(self.graph.prerequisites(5), [1, 2, 3, 4])
+        self.assertItemsEqual(self.graph.prerequisites(2), [1])
+        self.assertItemsEqual(self.graph.prerequisites(1), [])
+        self.assertItemsEqual(self.graph.prerequisites(100), [])
+        self.assertItemsEqual(self.graph.dependents(2), [4, 5])
+
+    def test_eligibility(self):
+        self.assertEqual(self.graph.eligible([1, 2, 4, 100], []), [1, 100])
+        self.assertEqual(self.graph.eligible([1, 2, 4, 100], [1, 2]), [1, 2, 100])
+        self.assertEqual(self.graph.eligible([1, 2, 4, 100], [1, 2, 3]), [1, 2, 4, 100])
+        self.assertSetEqual(self.graph.ineligible([1, 2, 3]), set([5, 6, 7]))
+
+    def test_cycles(self):
+        self.assertEqual(self.graph.find_cycles(), [[6, 7]])
+        self.graph.remove_edges([(7, 6)])
+        self.assertEqual(self.graph.find_cycles(), [])
+
+    def test_incremental(self):
+        self.graph.add_edges([(1, 8)])
+        self.assertItemsEqual(self.graph.prerequisites(5), [1, 2, 3, 4, 8])
+        self.graph.remove_edges([(4, 2), (4, 3)])
+        self.assertItemsEqual(self.graph.prerequisites(5), [4])
+        self.assertItemsEqual(self.graph.prerequisites(2), [1, 8])
+        rebuilt = PrerequisiteGraph([(2, 1), (3, 1), (5, 4), (6, 7), (7, 6), (1, 8)])
+        for course_id in range(1, 9):
+            self.assertItemsEqual(self.graph.prerequisites(course_id), rebuilt.prerequisites(course_id))
+
+    def test_plan_terms(self):
+        self.assertEqual(self.graph.plan_terms([5]), [[1], [2, 3], [4], [5]])
+        self.assertEqual(self.graph.plan_terms([5], [1, 2]), [[3], [4], [5]])
+        self.assertEqual(self.graph.plan_terms([4, 9], per_term=1), [[1], [2], [3], [4], [9]])
+        self.assertRaises(ValueError, self.graph.plan_terms, [6])
+
+
+class PrerequisiteSignalTest(TestCase):
+    def setUp(self):
+        self.courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True).create(4)
+        # Rolled back test data leaves the process's graph stale
+        cache.clear()
+        self.graph = get_prerequisite_graph()
+
+    def prerequisites(self, course):
+        return set(get_prerequisite_graph().prerequisites(course.pk))
+
+    def test_loads_once(self):
+        get_prerequisite_graph()
+        with self.assertNumQueries(0):
+            self.assertIs(get_prerequisite_graph(), self.graph)
+
+    def test_updates(self):
+        a, b, c, d = self.courses
+        c.prereqs.add(b)
+        b.prereqs.add(a)
+        self.assertSetEqual(self.prerequisites(c), set([a.pk, b.pk]))
+        a.course_set.add(d)
+        self.assertSetEqual(self.prerequisites(d), set([a.pk]))
+        b.prereqs.remove(a)
+        self.assertSetEqual(self.prerequisites(c), set([b.pk]))
+        b.course_set.clear()
+        self.assertSetEqual(self.prerequisites(c), set())
+        d.prereqs.clear()
+        self.assertSetEqual(self.prerequisites(d), set())
+        self.assertIs(get_prerequisite_graph(), self.graph)
+
+    def test_matches_database(self):
+        a, b, c, d = self.courses
+        c.prereqs.add(a, b)
+        d.prereqs.add(c)
+        a.delete()
+        self.assertSetEqual(self.prerequisites(d), set([b.pk, c.pk]))
+
+
+class EligibleSuggestionTest(TestCase):
+    def setUp(self):
+        user = AutoFixture(User, generate_fk=True).create_one()
+        self.schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=user.profile)).create_one()
+        self.intro, self.advanced = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True).create(2)
+        cache.clear()
+        self.advanced.prereqs.add(self.intro)
+        self.sections = [AutoFixture(Section, generate_m2m=False, field_values=dict(course=course, capacity=30, enrolled=0)).create_one()
+                         for course in (self.intro, self.advanced)]
+        # Creation of MeetingTime objects *must* follow Section creation due to AutoFixture bug
+        meeting_time = MeetingTime.objects.create(day=1, start_time=time(9, 0), end_time=time(9, 50))
+        for section in self.sections:
+            section.meeting_times.add(meeting_time)
+
+    def test_suggestions(self):
+        courses = [self.intro.pk, self.advanced.pk]
+        self.assertListEqual(get_suggestions(courses, self.schedule), self.sections)
+        self.assertListEqual(get_suggestions(courses, self.schedule, completed=[]), self.sections[:1])
+        self.assertListEqual(get_suggestions(courses, self.schedule, completed=[self.intro.pk]), self.sections)
@@ -0,0 +1,141 @@
+from autofixture import AutoFixture
+from collections import OrderedDict
+from django.test import TestCase
+from datetime import *
+import itertools
+import random
+import time as timer
+from student_assistance_system.audit import RequirementAuditor
+from student_assistance_system.models import *
+from student_assistance_system.scheduler import ScheduleGenerator, occupancy_score
+from django.contrib.auth.models import User
+
+
+def synthetic_section(course_id, day_pattern, start, length):
+    occupancy = 0
+    for day in day_pattern:
+        occupancy |= MeetingTime(day=day, start_time=time(start // 60, start % 60),
+                                 end_time=time((start + length) // 60, (start + length) % 60)).occupancy()
+    return Section(course_id=course_id, meeting_mask='%x' % occupancy)
+
+
+class OccupancyScoreTest(TestCase):
+    def test_score(self):
+        m1 = MeetingTime(day=0, start_time=time(8, 0), end_time=time(8, 55))
+        m2 = MeetingTime(day=0, start_time=time(10, 0), end_time=time(10, 55))
+        m3 = MeetingTime(day=2, start_time=time(8, 0), end_time=time(8, 55))
+        self.assertEqual(occupancy_score(0), (0, 0))
+        self.assertEqual(occupancy_score(m1.occupancy() | m3.occupancy()), (2, 0))
+        self.assertEqual(occupancy_score(m1.occupancy() | m2.occupancy()), (1, 60))
+
+
+class ScheduleGeneratorTest(TestCase):
+    def groups(self, courses, sections_per_course, seed=0):
+        rng = random.Random(seed)
+        return OrderedDict((course_id, [synthetic_section(course_id, rng.choice([(0, 2, 4), (1, 3)]),
+                                                          rng.randrange(8 * 60, 18 * 60, 5), rng.choice([50, 75]))
+                                        for i in range(0, sections_per_course)])
+                           for course_id in range(1, courses + 1))
+
+    def check_schedule(self, result, courses):
+        self.assertEqual(sorted(s.course_id for s in result.sections), list(range(1, courses + 1)))
+        for s1 in result.sections:
+            for s2 in result.sections:
+                if s1 is not s2:
+                    self.assertFalse(s1.conflicts_with(s2))
+
+    def test_conflict_free(self):
+        generator = ScheduleGenerator(self.groups(5, 10))
+        results = generator.generate()
+        self.assertEqual(len(results), 10)
+        for result in results:
+            self.check_schedule(result, 5)
+
+    def test_ranked(self):
+        results = ScheduleGenerator(self.groups(4, 10), max_results=50).generate()
+        scores = [(r.days, r.gap_minutes) for r in results]
+        self.assertListEqual(scores, sorted(scores))
+
+    def test_infeasible(self):
+        groups = OrderedDict((course_id, [synthetic_section(course_id, (0,), 8 * 60, 50)]) for course_id in (1, 2))
+        self.assertListEqual(ScheduleGenerator(groups).generate(), [])
+
+    def test_distinct_courses(self):
+        groups = OrderedDict([('a', [synthetic_section(1, (0,), 8 * 60, 50)]),
+                              ('b', [synthetic_section(1, (1,), 8 * 60, 50), synthetic_section(2, (2,), 8 * 60, 50)])])
+        results = ScheduleGenerator(groups).generate()
+        self.assertEqual(len(results), 1)
+        self.assertEqual([s.course_id for s in results[0].sections], [1, 2])
+
+    def test_max_options(self):
+        generator = ScheduleGenerator(self.groups(3, 30), max_options=5)
+        self.assertEqual([len(domain) for domain in generator.domains], [5, 5, 5])
+        self.assertEqual(len(generator.generate()), 10)
+
+    def test_unavailable(self):
+        generator = ScheduleGenerator(OrderedDict([('a', [synthetic_section(1, (0,), 8 * 60, 50)]), ('b', [])]))
+        self.assertEqual(generator.unavailable, ['b'])
+        self.assertEqual(len(generator.generate()), 1)
+
+    def test_time_budget(self):
+        generator = ScheduleGenerator(self.groups(8, 40), time_budget=0)
+        generator.generate()
+        self.assertTrue(generator.timed_out)
+
+    def test_matches_exhaustive_search(self):
+        groups = self.groups(4, 6, seed=1)
+        scores = []
+        for sections in itertools.product(*groups.values()):
+            if not any(s1.conflicts_with(s2) for s1, s2 in itertools.combinations(sections, 2)):
+                occupancy = 0
+                for section in sections:
+                    occupancy |= section.occupancy()
+                scores.append(occupancy_score(occupancy))
+        results = ScheduleGenerator(groups, max_results=5).generate()
+        self.assertListEqual([(r.days, r.gap_minutes) for r in results], sorted(scores)[:5])
+
+    def test_performance(self):
+        generator = ScheduleGenerator(self.groups(8, 30))
+        start = timer.time()
+        results = generator.generate()
+        self.assertLess(timer.time() - start, 1)
+        self.assertEqual(len(results), 10)
+        for result in results:
+            self.check_schedule(result, 8)
+
+
+class ScheduleGeneratorModelTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = AutoFixture(User, generate_fk=True).create_one()
+        cls.courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True, field_values=dict(course_number='101')).create(3)
+        cls.sections = [AutoFixture(Section, generate_m2m=False, field_values=dict(course=course, capacity=30, enrolled=0)).create_one()
+                        for course in cls.courses]
+        # Creation of MeetingTime objects *must* follow Section creation due to AutoFixture bug
+        cls.sections[0].meeting_times.add(MeetingTime.objects.create(day=0, start_time=time(8, 0), end_time=time(8, 50)))
+        cls.sections[1].meeting_times.add(MeetingTime.objects.create(day=0, start_time=time(8, 30), end_time=time(9, 20)))
+        cls.sections[2].meeting_times.add(MeetingTime.objects.create(day=1, start_time=time(8, 0), end_time=time(8, 50)))
+
+    def test_for_courses(self):
+        results = ScheduleGenerator.for_courses([self.courses[0], self.courses[2]]).generate()
+        self.assertEqual(len(results), 1)
+        self.assertListEqual(results[0].sections, [self.sections[0], self.sections[2]])
+        self.assertListEqual(ScheduleGenerator.for_courses(self.courses[:2]).generate(), [])
+
+    def test_full_sections(self):
+        # Another section at the same time, which is chosen once the first one fills up
+        section = Section.objects.create(course=self.courses[0], capacity=30, enrolled=0, professor='Staff', location='')
+        section.meeting_times.add(*self.sections[0].meeting_times.all())
+        Section.objects.filter(pk=self.sections[0].pk).update(enrolled=30)
+        results = ScheduleGenerator.for_courses([self.courses[0]]).generate()
+        self.assertListEqual([r.sections for r in results], [[section]])
+        Section.objects.filter(pk=section.pk).update(enrolled=30)
+        self.assertEqual(ScheduleGenerator.for_courses([self.courses[0]]).unavailable, [self.courses[0]])
+
+    def test_for_requirements(self):
+        req_set = AutoFixture(RequirementSet, generate_fk=True).create_one()
+        req_set.requirements.add(create_requirement('first', None, 1, Course.objects.filter(pk=self.courses[0].pk)))
+        req_set.requirements.add(create_requirement('rest', None, 1, Course.objects.filter(pk__in=[c.pk for c in self.courses[1:]])))
+        audit = RequirementAuditor(self.user.profile, None).audit([req_set])
+        results = ScheduleGenerator.for_requirements(audit).generate()
+        self.assertListEqual([r.sections for r in results], [[self.sections[0], self.sections[2]]])
@@ -0,0 +1,84 @@
+from autofixture import AutoFixture
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils.six import StringIO
+from student_assistance_system.models import *
+from student_assistance_system.search import *
+
+
+class EditDistanceTest(TestCase):
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('calculus', 'calculus', 2), 0)
+        self.assertEqual(edit_distance('calculus', 'calculis', 2), 1)
+        self.assertEqual(edit_distance('calculus', 'calcul', 2), 2)
+        self.assertEqual(edit_distance('calculus', 'spanish', 2), 3)
+
+
+class SearchBackendTest(TestCase):
+    def setUp(self):
+        self.math = AutoFixture(Department, field_values=dict(abbr_name='MATH')).create_one()
+        self.eecs = AutoFixture(Department, field_values=dict(abbr_name='EECS')).create_one()
+        self.calculus = AutoFixture(Course, follow_m2m=(0, 0), field_values=dict(name='Calculus I', description='Limits and derivatives',
+                                                              department=self.math)).create_one()
+        self.software = AutoFixture(Course, follow_m2m=(0, 0), field_values=dict(name='Software Engineering', description='Uses calculus rarely',
+                                                              department=self.eecs)).create_one()
+        self.calculus_section = AutoFixture(Section, generate_m2m=False,
+                                            field_values=dict(course=self.calculus, professor='James Howard')).create_one()
+        self.software_section = AutoFixture(Section, generate_m2m=False,
+                                            field_values=dict(course=self.software, professor='Andy Podgurski')).create_one()
+        self.backend = get_search_backend()
+
+    def search(self, text, fields=None):
+        return list(self.backend.filter(Section.objects.order_by('pk'), text, fields))
+
+    def test_default_backend(self):
+        self.assertIsInstance(self.backend, SQLiteSearchBackend if connection.vendor == 'sqlite' else SearchBackend)
+
+    def test_prefix(self):
+        self.assertEqual(self.search('calc', ['name']), [self.calculus_section])
+        self.assertEqual(self.search('soft eng'), [self.software_section])
+
+    def test_fields(self):
+        self.assertEqual(self.search('calculus'), [self.calculus_section, self.software_section])
+        self.assertEqual(self.search('calculus', ['name']), [self.calculus_section])
+        self.assertEqual(self.search('eecs', ['department']), [self.software_section])
+        self.assertEqual(self.search('howard', ['professor']), [self.calculus_section])
+
+    def test_typo(self):
+        self.assertEqual(self.search('calculis', ['name']), [self.calculus_section])
+        self.assertEqual(self.search('podgurksi', ['professor']), [self.software_section])
+        self.assertEqual(self.search('xylophone'), [])
+
+    def test_ranked(self):
+        self.assertEqual(self.backend.search('calculus'), [self.calculus_section.pk, self.software_section.pk])
+        self.assertEqual(list(self.backend.ranked(Section.objects.all(), 'calculus', limit=1)),
+                         [self.calculus_section, self.software_section])
+
+    def test_ranked_beyond_limit(self):
+        sections = [AutoFixture(Section, generate_m2m=False,
+                                field_values=dict(course=self.software, professor='Staff')).create_one() for i in range(3)]
+        ranked = self.backend.ranked(Section.objects.all(), 'calculus', limit=1)
+        self.assertEqual(ranked.count(), 5)
+        self.assertEqual(list(ranked), [self.calculus_section, self.software_section] + sections)
+
+    def test_incremental(self):
+        self.calculus.name = 'Linear Algebra'
+        self.calculus.save()
+        self.assertEqual(self.search('algebra'), [self.calculus_section])
+        self.eecs.abbr_name = 'CSDS'
+        self.eecs.save()
+        self.assertEqual(self.search('csds'), [self.software_section])
+        self.software_section.delete()
+        self.assertEqual(self.search('podgurski'), [])
+
+    def test_rebuild(self):
+        self.backend.remove_sections([self.calculus_section.pk, self.software_section.pk])
+        self.assertEqual(self.search('calculus'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('calculus'), [self.calculus_section, self.software_section])
+
+    def test_database_backend(self):
+        self.backend = DatabaseSearchBackend()
+        self.assertEqual(self.search('calc', ['name']), [self.calculus_section])
+        self.assertEqual(self.search('calculus'), [self.calculus_section, self.software_section])
@@ -0,0 +1,49 @@
+from autofixture import AutoFixture
+from django.test import TestCase
+from datetime import *
+from student_assistance_system.availability import get_availability
+from student_assistance_system.models import *
+from student_assistance_system.suggestions import get_suggestions, iter_suggestions
+from django.contrib.auth.models import User
+
+
+class SuggestionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = AutoFixture(User, generate_fk=True).create_one()
+        cls.schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=cls.user.profile)).create_one()
+        cls.courses = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True).create(4)
+        cls.sections = AutoFixture(Section, generate_m2m=False, field_values=dict(course=cls.courses[0], capacity=30, enrolled=0)).create(60)
+        scheduled = AutoFixture(Section, generate_m2m=False, field_values=dict(course=cls.courses[1])).create_one()
+        # Creation of MeetingTime objects *must* follow Section creation due to AutoFixture bug
+        cls.early = MeetingTime.objects.create(day=0, start_time=time(8, 0), end_time=time(8, 50))
+        cls.late = MeetingTime.objects.create(day=0, start_time=time(10, 0), end_time=time(10, 50))
+        for i, section in enumerate(cls.sections):
+            section.meeting_times.add(cls.early if i % 2 else cls.late)
+        scheduled.meeting_times.add(cls.early)
+        cls.schedule.sections.add(scheduled)
+
+    def test_excludes_conflicts(self):
+        suggestions = get_suggestions([self.courses[0]], self.schedule)
+        self.assertListEqual(suggestions, self.sections[0::2])
+
+    def test_no_schedule(self):
+        self.assertListEqual(get_suggestions([self.courses[0]], None), self.sections)
+
+    def test_stops_early(self):
+        # Seats are read from the process's availability snapshot, which is only loaded once
+        get_availability()
+        with self.assertNumQueries(3):
+            suggestions = get_suggestions([self.courses[0]], self.schedule, 5)
+        self.assertListEqual(suggestions, self.sections[0:10:2])
+        with self.assertNumQueries(0):
+            [s.condensed_meeting_times() for s in suggestions]
+
+    def test_chunks(self):
+        suggestions = list(iter_suggestions([self.courses[0].pk], self.schedule, chunk_size=7))
+        self.assertListEqual(suggestions, self.sections[0::2])
+
+    def test_requirement_suggestions(self):
+        statuses = {self.courses[0]: 'U', self.courses[1]: 'S', self.courses[2]: 'F'}
+        req = create_requirement('test', None, 1, Course.objects.all())
+        self.assertListEqual(req.get_course_suggestions(statuses, self.schedule, 3), self.sections[0:6:2])
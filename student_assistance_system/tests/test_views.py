@@ -1,15 +1,22 @@
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
-from django.test import TestCase
+from django.test import Client, TestCase, override_settings
 from django.test import RequestFactory
 from autofixture import AutoFixture
 from student_assistance_system.models import *
 from student_assistance_system import views
+from student_assistance_system.enrollment import enroll
+from student_assistance_system.prereqs import get_prerequisite_graph
+from student_assistance_system.templatetags.sas_tags import CSRF_PLACEHOLDER
+from student_assistance_system.tests.utils import QueryBudgetMixin
 import datetime
+import re
 
 
 class LoginTestCase(TestCase):
     def setUp(self):
+        cache.clear()
         User.objects.create_user('test', password='test')
 
     def validate_login(self):
@@ -112,15 +119,15 @@ class CourseSearchHelpersTestCase(TestCase):
 class SearchingTestCase(TestCase):
     def setUp(self):
         self.view = views.SearchResultsView(template_name='student_assistance_system/search_results.html')
-        math_course = AutoFixture(Course, generate_fk=True,
+        math_course = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True,
                                   field_values=dict(name='Calculus I', course_number='121c', credit_hours=4,
                                                     department=AutoFixture(Department, generate_fk=True, field_values=dict(abbr_name='MATH')).create_one()
                                                     )).create_one()
-        spanish_course = AutoFixture(Course, generate_fk=True,
+        spanish_course = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True,
                                     field_values=dict(name='Intro to Spanish', course_number='101', credit_hours=4,
                                                       department=AutoFixture(Department, generate_fk=True, field_values=dict(abbr_name='SPAN')).create_one()
                                                      )).create_one()
-        eecs_cource = AutoFixture(Course, generate_fk=True,
+        eecs_cource = AutoFixture(Course, follow_m2m=(0, 0), generate_fk=True,
                                   field_values=dict(name='Software Engineering', course_nuber='393', credit_hours=3,
                                                     department=AutoFixture(Department, generate_fk=True, field_values=dict(abbr_name='EECS')).create_one()
                                                     )).create_one()
@@ -133,7 +140,7 @@ class SearchingTestCase(TestCase):
                                   ])).create_one()
         self.spanish_section =AutoFixture(Section, generate_fk=True,
                                   field_values=dict(course=spanish_course, professor="James Howard", meeting_times=[
-                                    AutoFixture(MeetingTime, generate_fk=True, field_values=dict(day=1, start_time=datetime.time(9, 0), end_time=datetime.time(10, 15))).create_one(),
+                                    MeetingTime.get_or_intern(1, datetime.time(9, 0), datetime.time(10, 15)),
                                     AutoFixture(MeetingTime, generate_fk=True, field_values=dict(day=3, start_time=datetime.time(9, 0), end_time=datetime.time(10, 15))).create_one(),
                                   ])).create_one()
         self.eecs_section =AutoFixture(Section, generate_fk=True,
@@ -153,23 +160,43 @@ class SearchingTestCase(TestCase):
     def test_search_department(self):
         self.assertEqual(list(self.view.filter_by_department({"dep": "EECS"}, self.sections)), [self.eecs_section])
 
+    def test_search_eligible(self):
+        cache.clear()
+        self.eecs_section.course.prereqs.add(self.math_section.course)
+        self.view.request = RequestFactory().get('/')
+        self.view.request.user = User.objects.create_user('eligible')
+        self.assertEqual(list(self.view.filter_by_eligibility({"eligible": "on"}, self.sections.order_by('pk'))),
+                         [self.math_section, self.spanish_section])
+        # Courses that the other filters left out are not checked
+        spanish = self.sections.filter(pk=self.spanish_section.pk)
+        self.assertIs(self.view.filter_by_eligibility({"eligible": "on"}, spanish), spanish)
+        CompletedCourse.objects.create(user=self.view.request.user.profile, course=self.math_section.course, grade='A')
+        self.assertEqual(list(self.view.filter_by_eligibility({"eligible": "on"}, self.sections.order_by('pk'))),
+                         [self.math_section, self.spanish_section, self.eecs_section])
+
     def test_search_professor(self):
         self.assertEqual(list(self.view.filter_by_professor({"prof": "James Howard"}, self.sections)), [self.math_section, self.spanish_section])
 
     def test_search_starting_time(self):
-        self.assertEqual(list(self.view.filter_by_meeting_times({"stime": "8:30"}, self.sections)), [self.math_section])
+        self.assertEqual(set(self.view.filter_by_meeting_times({"stime": "8:30"}, self.sections)), set([self.math_section, self.spanish_section, self.eecs_section]))
+        self.assertEqual(set(self.view.filter_by_meeting_times({"stime": "9:00"}, self.sections)), set([self.spanish_section, self.eecs_section]))
 
     def test_search_end_time(self):
-        self.assertEqual(list(self.view.filter_by_meeting_times({"etime": "10:15"}, self.sections)), [self.math_section, self.spanish_section])
+        self.assertEqual(set(self.view.filter_by_meeting_times({"etime": "10:15"}, self.sections)), set([self.math_section, self.spanish_section]))
 
     def test_time_range_search(self):
-        self.assertEqual(list(self.view.filter_by_meeting_times({"stime": "8:30", "etime": "10:10"}, self.sections)), [self.math_section])
+        # Every meeting of a section has to fall within the range
+        self.assertEqual(list(self.view.filter_by_meeting_times({"stime": "8:30", "etime": "10:10"}, self.sections)), [])
+        self.assertEqual(set(self.view.filter_by_meeting_times({"stime": "8:30", "etime": "10:15"}, self.sections)), set([self.math_section, self.spanish_section]))
 
     def test_time_and_day(self):
-        self.assertEqual(list(self.view.filter_by_meeting_times({"thu": "on", "etime": "10:15"}, self.sections)), [self.spanish_section])
+        self.assertEqual(list(self.view.filter_by_meeting_times({"tue": "on", "thu": "on", "etime": "10:15"}, self.sections)), [self.spanish_section])
+        self.assertEqual(list(self.view.filter_by_meeting_times({"thu": "on", "etime": "10:15"}, self.sections)), [])
 
     def test_day_only(self):
-        self.assertEqual(list(self.view.filter_by_meeting_times({"fri": "on"}, self.sections)), [self.math_section, self.eecs_section])
+        # Sections meeting on any other day are left out
+        self.assertEqual(list(self.view.filter_by_meeting_times({"mon": "on", "wed": "on", "fri": "on"}, self.sections)), [self.eecs_section])
+        self.assertEqual(set(self.view.filter_by_meeting_times({"mon": "on", "tue": "on", "wed": "on", "fri": "on"}, self.sections)), set([self.math_section, self.eecs_section]))
 
     def test_credit_hours(self):
         self.assertEqual(list(self.view.filter_by_credits({"credits": 3}, self.sections)), [self.eecs_section])
@@ -189,6 +216,51 @@ class SearchingTestCase(TestCase):
         self.assertEqual(list(self.view.filter_by_course_number({"num1": "101", "num2": "121c"}, self.sections)), [self.math_section, self.spanish_section])
         self.assertEqual(list(self.view.filter_by_course_number({"num1": "101", "num2": "121d"}, self.sections)), [self.math_section, self.spanish_section])
 
+    def test_search_course_range_in_sql(self):
+        sections = self.view.filter_by_course_number({"num1": "100", "num2": "299B"}, self.sections)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(sections[0:1]), [self.math_section])
+
+
+
+class GenerateScheduleViewTestCase(LoginTestCase):
+    def setUp(self):
+        super(GenerateScheduleViewTestCase, self).setUp()
+        department = AutoFixture(Department, field_values=dict(abbr_name='EECS')).create_one()
+        self.course = AutoFixture(Course, follow_m2m=(0, 0), field_values=dict(department=department, course_number='393')).create_one()
+        self.section = AutoFixture(Section, generate_m2m=False, field_values=dict(course=self.course, capacity=30, enrolled=0)).create_one()
+
+    def test_generate_unauthorized(self):
+        url = reverse("student_assistance_system:generate_schedule")
+        self.validate_response(self.client.get(url), expected_status_code=302)
+
+    def test_generate(self):
+        self.validate_login()
+        url = reverse("student_assistance_system:generate_schedule")
+        response = self.client.get(url, {'courses': 'eecs 393, MATH 999'})
+        self.validate_response(response, expected_template_name='student_assistance_system/generate_schedule.html')
+        self.assertEqual(response.context['missing'], ['MATH 999'])
+        self.assertEqual([r.sections for r in response.context['results']], [[self.section]])
+        self.client.logout()
+
+    def test_save_generated(self):
+        self.validate_login()
+        url = reverse("student_assistance_system:generate_schedule")
+        response = self.client.post(url, {'section': [self.section.id], 'name': 'Spring'})
+        schedule = Schedule.objects.get(name='Spring')
+        self.assertRedirects(response, reverse("student_assistance_system:edit_schedule", kwargs={'schedule_id': schedule.id}))
+        self.assertEqual(list(schedule.sections.all()), [self.section])
+        self.client.logout()
+
+    def test_save_full_section(self):
+        self.validate_login()
+        Section.objects.filter(pk=self.section.pk).update(enrolled=30)
+        url = reverse("student_assistance_system:generate_schedule")
+        response = self.client.post(url, {'section': [self.section.id], 'name': 'Spring'})
+        self.assertContains(response, 'The schedule could not be saved', status_code=409)
+        self.assertFalse(Schedule.objects.filter(name='Spring').exists())
+        self.assertEqual(self.client.post(url, {'section': ['x']}).status_code, 400)
+        self.client.logout()
 
 
 class AddSectionScheduleViewTestCase(LoginTestCase):
@@ -202,3 +274,187 @@ class AddSectionScheduleViewTestCase(LoginTestCase):
         url = reverse("student_assistance_system:add_section")
         self.validate_response(self.client.get(url), expected_status_code=302)
         self.validate_response(self.client.get(url, follow=True), expected_template_name='registration/login.html')
+
+
+class SchedulesContextProcessorTestCase(LoginTestCase):
+    def setUp(self):
+        super(SchedulesContextProcessorTestCase, self).setUp()
+        self.profile = User.objects.get(username='test').profile
+        self.first, self.second, self.third = [Schedule.objects.create(name='Schedule %d' % i, user=self.profile)
+                                               for i in range(3)]
+        self.first.change_name('Renamed')
+
+    def test_lazy(self):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(username='test')
+        with self.assertNumQueries(0):
+            context = views.schedules_context_processor(request)
+        with self.assertNumQueries(2):
+            self.assertEqual([s.pk for s in context['schedules']], [self.first.pk, self.third.pk, self.second.pk])
+
+    def test_index_shows_latest_schedule(self):
+        self.validate_login()
+        response = self.client.get(reverse("student_assistance_system:index"))
+        self.assertEqual(response.context['schedule'], self.first)
+        self.assertContains(response, 'Renamed')
+
+
+@override_settings(SAS_QUERY_SAMPLE_RATE=1.0)
+class QueryBudgetTestCase(QueryBudgetMixin, LoginTestCase):
+    def setUp(self):
+        super(QueryBudgetTestCase, self).setUp()
+        profile = User.objects.get(username='test').profile
+        # Creation of the Schedule *must* precede Section creation due to AutoFixture bug
+        self.schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=profile)).create_one()
+        department = AutoFixture(Department, field_values=dict(abbr_name='EECS')).create_one()
+        courses = AutoFixture(Course, follow_m2m=(0, 0), field_values=dict(department=department, course_number='101', canonical=None, credit_hours=3)).create(12)
+        self.sections = [AutoFixture(Section, generate_m2m=False, field_values=dict(course=course, professor='Staff')).create_one()
+                         for course in courses]
+        # Creation of MeetingTime objects *must* follow Section creation due to AutoFixture bug
+        for i, section in enumerate(self.sections):
+            for day in (0, 2, 4) if i % 2 else (1, 3):
+                section.meeting_times.add(MeetingTime.objects.create(day=day, start_time=datetime.time(8 + i, 0),
+                                                                     end_time=datetime.time(8 + i, 50)))
+        self.schedule.sections.add(*self.sections[:4])
+        for course in courses[4:6]:
+            CompletedCourse.objects.create(user=profile, course=course, grade='A')
+
+        major, minor = AutoFixture(RequirementSet, field_values=dict(department=department, type=0)).create(2)
+        for i in range(0, 4):
+            major.requirements.add(create_requirement('major %d' % i, None, 2, Course.objects.filter(pk__in=[c.pk for c in courses[i::3]])))
+            minor.requirements.add(create_requirement('minor %d' % i, 6, None, Course.objects.filter(pk__in=[c.pk for c in courses[i::2]])))
+        UserMajor.objects.create(name=profile, major=major)
+        profile.minors.add(minor)
+        # Budgets are for the steady state, once the process has loaded its prerequisite graph
+        get_prerequisite_graph()
+
+    def test_query_budgets(self):
+        self.validate_login()
+        self.assertWithinQueryBudget(reverse("student_assistance_system:index"))
+        self.assertWithinQueryBudget(reverse("student_assistance_system:view_schedule", kwargs={'schedule_id': self.schedule.id}))
+        self.assertWithinQueryBudget(reverse("student_assistance_system:edit_schedule", kwargs={'schedule_id': self.schedule.id}))
+        self.assertWithinQueryBudget(reverse("student_assistance_system:view_section", kwargs={'section_id': self.sections[0].id}))
+        self.assertWithinQueryBudget(reverse("student_assistance_system:profile"))
+        self.assertWithinQueryBudget(reverse("student_assistance_system:search"))
+        self.assertWithinQueryBudget(reverse("student_assistance_system:courses"), {'dep': 'EECS'})
+        self.assertWithinQueryBudget(reverse("student_assistance_system:courses"), {'q': 'staff'})
+        self.assertWithinQueryBudget(reverse("student_assistance_system:courses"), {'dep': 'EECS', 'cursor': ''})
+        self.assertWithinQueryBudget(reverse("student_assistance_system:generate_schedule"), {'requirements': 'on'})
+        self.assertWithinQueryBudget(reverse("student_assistance_system:api_sections"), {'dep': 'EECS'})
+        self.assertWithinQueryBudget(reverse("student_assistance_system:api_schedule", kwargs={'schedule_id': self.schedule.id}))
+        self.assertWithinQueryBudget(reverse("student_assistance_system:api_audit", kwargs={'schedule_id': self.schedule.id}), {'suggestions': 5})
+        self.client.logout()
+
+    def test_schedule_query_count_is_fixed(self):
+        # Saturday sections of a course outside every requirement leave the audit and suggestions unchanged
+        course = AutoFixture(Course, follow_m2m=(0, 0), field_values=dict(canonical=None, credit_hours=3)).create_one()
+        extra_sections = AutoFixture(Section, follow_m2m=(0, 0), field_values=dict(course=course)).create(8)
+        for i, section in enumerate(extra_sections):
+            section.meeting_times.add(MeetingTime.objects.create(day=5, start_time=datetime.time(8 + i, 0),
+                                                                 end_time=datetime.time(8 + i, 50)))
+        self.validate_login()
+        for url_name in ('index', 'view_schedule', 'edit_schedule'):
+            kwargs = dict() if url_name == 'index' else {'schedule_id': self.schedule.id}
+            counts = []
+            for n in (0, 2, 8):
+                self.schedule.sections.set(self.sections[:4] + extra_sections[:n])
+                response = self.client.get(reverse("student_assistance_system:" + url_name, kwargs=kwargs))
+                self.assertContains(response, '<td valign="top">Staff</td>', count=4)
+                counts.append(response.query_stats.query_count)
+            self.assertEqual(len(set(counts)), 1, '%s issued %s queries for 4, 6 and 12 sections' % (url_name, counts))
+        self.client.logout()
+
+    @override_settings(DEBUG=True)
+    def test_query_headers(self):
+        self.validate_login()
+        response = self.client.get(reverse("student_assistance_system:view_section", kwargs={'section_id': self.sections[0].id}))
+        stats = response.query_stats
+        self.assertEqual(stats.url_name, 'view_section')
+        self.assertEqual(response['X-Query-Count'], str(stats.query_count))
+        self.assertGreater(stats.query_count, 0)
+        self.assertGreater(stats.template_time, 0)
+        self.assertIn('X-Template-Time', response)
+        self.assertEqual(len(stats.as_dict()['slowest_queries']), min(stats.query_count, 5))
+        self.client.logout()
+
+    def test_unsampled_requests(self):
+        self.validate_login()
+        with self.settings(SAS_QUERY_SAMPLE_RATE=0.0):
+            response = self.client.get(reverse("student_assistance_system:index"))
+        self.assertFalse(hasattr(response, 'query_stats'))
+        self.assertNotIn('X-Query-Count', response)
+        self.client.logout()
+
+
+@override_settings(SAS_QUERY_SAMPLE_RATE=1.0)
+class FragmentCacheTestCase(LoginTestCase):
+    def setUp(self):
+        super(FragmentCacheTestCase, self).setUp()
+        profile = User.objects.get(username='test').profile
+        # Creation of the Schedule *must* precede Section creation due to AutoFixture bug
+        self.schedule = AutoFixture(Schedule, generate_m2m=False, field_values=dict(user=profile)).create_one()
+        department = AutoFixture(Department, field_values=dict(abbr_name='EECS')).create_one()
+        courses = AutoFixture(Course, follow_m2m=(0, 0), field_values=dict(department=department, course_number='101', canonical=None, credit_hours=3)).create(2)
+        self.sections = [AutoFixture(Section, generate_m2m=False, field_values=dict(course=course, professor='Professor %d' % i, capacity=30, enrolled=0)).create_one()
+                         for i, course in enumerate(courses)]
+        for i, section in enumerate(self.sections):
+            section.meeting_times.add(MeetingTime.objects.create(day=i, start_time=datetime.time(9, 0), end_time=datetime.time(9, 50)))
+        self.schedule.sections.add(self.sections[0])
+        major = AutoFixture(RequirementSet, field_values=dict(department=department, type=0)).create_one()
+        major.requirements.add(create_requirement('Both courses', None, 2, Course.objects.filter(pk__in=[c.pk for c in courses])))
+        UserMajor.objects.create(name=profile, major=major)
+        self.client = Client(enforce_csrf_checks=True)
+        self.validate_login()
+        self.url = reverse("student_assistance_system:edit_schedule", kwargs={'schedule_id': self.schedule.id})
+
+    def post(self, url_name, section, response):
+        # The token is taken from the last form on the page, which is inside the fragments
+        token = re.findall(r"name='csrfmiddlewaretoken' value='([^']+)'", response.content.decode('utf-8'))[-1]
+        response = self.client.post(reverse("student_assistance_system:" + url_name),
+                                    dict(section=section.id, schedule=self.schedule.id, csrfmiddlewaretoken=token))
+        self.assertEqual(response.status_code, 302)
+
+    def assertShows(self, response, scheduled, suggested):
+        for section in self.sections:
+            self.assertContains(response, '<td valign="top">%s</td>' % section.professor, count=int(section in scheduled))
+            self.assertContains(response, 'value="%d" name="section" />' % section.id, count=int(section in suggested))
+
+    def test_cached_fragments(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        self.assertLess(second.query_stats.query_count, first.query_stats.query_count)
+        self.assertNotContains(second, CSRF_PLACEHOLDER)
+        self.assertShows(second, [self.sections[0]], [self.sections[1]])
+
+    def test_no_stale_fragments(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.post('add_section', self.sections[1], response)
+        response = self.client.get(self.url)
+        self.assertShows(response, self.sections, [])
+        self.assertContains(response, 'Fulfilled by schedule')
+        self.post('remove_section', self.sections[0], response)
+        response = self.client.get(self.url)
+        self.assertShows(response, [self.sections[1]], [self.sections[0]])
+        response = self.client.get(reverse("student_assistance_system:index"))
+        self.assertShows(response, [self.sections[1]], [self.sections[0]])
+
+    def test_enrollments_elsewhere(self):
+        other = Section.objects.create(course=self.sections[0].course, capacity=1, enrolled=0, professor='Staff', location='')
+        student = User.objects.create_user('student').profile
+        self.client.get(self.url)
+        cached = self.client.get(self.url).query_stats.query_count
+        # A section that is not suggested fills up, which leaves the cached suggestions as they were
+        enroll(student, other)
+        response = self.client.get(self.url)
+        self.assertEqual(response.query_stats.query_count, cached)
+        self.assertShows(response, [self.sections[0]], [self.sections[1]])
+        # A seat taken in a scheduled section renders the schedule again
+        enroll(student, self.sections[0])
+        self.assertGreater(self.client.get(self.url).query_stats.query_count, cached)
+
+    def test_no_stale_suggestions(self):
+        self.assertShows(self.client.get(self.url), [self.sections[0]], [self.sections[1]])
+        Section.objects.filter(pk=self.sections[1].pk).update(capacity=1)
+        enroll(User.objects.create_user('student').profile, self.sections[1])
+        self.assertShows(self.client.get(self.url), [self.sections[0]], [])
@@ -0,0 +1,22 @@
+from django.conf import settings
+
+
+class QueryBudgetMixin(object):
+    """
+    Checks responses against the per-URL-name query budgets in settings.SAS_QUERY_BUDGETS
+    """
+
+    def assertWithinQueryBudget(self, url, data=None):
+        """
+        Budgets are for the steady state, so the page is requested once to fill its caches before it is checked
+        """
+        self.client.get(url, data)
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        stats = response.query_stats
+        self.assertIn(stats.url_name, settings.SAS_QUERY_BUDGETS, 'No query budget for %s' % stats.url_name)
+        self.assertLessEqual(stats.query_count, stats.budget,
+                             '%s issued %d queries, over its budget of %d:\n%s' % (
+                                 stats.url_name, stats.query_count, stats.budget,
+                                 '\n'.join(query['sql'] for query in stats.queries)))
+        return response
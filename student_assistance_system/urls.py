@@ -2,6 +2,8 @@ from django.conf.urls import url
 import django.contrib.auth.views as auth_views
 
 from views import *
+from api import (AuditApiView, ScheduleApiView, ScheduleBatchApiView, ScheduleSectionApiView, SectionEnrollmentApiView,
+                 SectionSearchApiView)
 
 app_name = 'student_assistance_system'
 urlpatterns = [
@@ -9,13 +11,26 @@ urlpatterns = [
     url(r'^schedules/(?P<schedule_id>[0-9]+)/$', ViewScheduleView.as_view(), {'editing': False}, name='view_schedule'),
     url(r'^schedules/(?P<schedule_id>[0-9]+)/edit/$', ViewScheduleView.as_view(), {'editing': True}, name='edit_schedule'),
     url(r'^schedules/create/$', CreateScheduleView.as_view(), name='create_schedule'),
+    url(r'^schedules/generate/$', GenerateScheduleView.as_view(), name='generate_schedule'),
     url(r'^schedules/edit/remove/$', RemoveSectionScheduleView.as_view(), name='remove_section'),
     url(r'^schedules/section/add$', AddSectionScheduleView.as_view(), name='add_section'),
     url(r'^schedules/edit/changename/$', ChangeNameScheduleView.as_view(), name='change_name'),
+    url(r'^plan/$', DegreePlanView.as_view(), name='degree_plan'),
     url(r'^sections/(?P<section_id>[0-9]+)/$', ViewSectionView.as_view(), name='view_section'),
     url(r'^accounts/profile/$', ProfileView.as_view(), name='profile'),
     url(r'^search/', SearchView.as_view(), name='search'),
     url(r'^results/', SearchResultsView.as_view(), name='courses'),
     url(r'^accounts/login/$', auth_views.login, name='login'),
-    url(r'^accounts/logout/$', auth_views.logout, name='logout')
+    url(r'^accounts/logout/$', auth_views.logout, name='logout'),
+    url(r'^api/sections/$', SectionSearchApiView.as_view(), name='api_sections'),
+    url(r'^api/sections/(?P<section_id>[0-9]+)/enrollment/$', SectionEnrollmentApiView.as_view(),
+        name='api_section_enrollment'),
+    url(r'^api/schedules/(?P<schedule_id>[0-9]+)/$', ScheduleApiView.as_view(), name='api_schedule'),
+    url(r'^api/schedules/(?P<schedule_id>[0-9]+)/sections/$', ScheduleSectionApiView.as_view(), {'section_id': None},
+        name='api_schedule_sections'),
+    url(r'^api/schedules/(?P<schedule_id>[0-9]+)/sections/(?P<section_id>[0-9]+)/$', ScheduleSectionApiView.as_view(),
+        name='api_schedule_section'),
+    url(r'^api/schedules/(?P<schedule_id>[0-9]+)/sections/batch/$', ScheduleBatchApiView.as_view(),
+        name='api_schedule_batch'),
+    url(r'^api/schedules/(?P<schedule_id>[0-9]+)/audit/$', AuditApiView.as_view(), name='api_audit'),
 ]
@@ -1,12 +1,30 @@
+import calendar
+
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
 from django.views import View, generic
-from django.db.models import Q
-from django.http import HttpResponseRedirect
+from django.db import transaction
+from django.db.models import Q, prefetch_related_objects
+from django.http import Http404, HttpResponseRedirect
 from django.core.urlresolvers import reverse
 
-from .models import Section
+from .audit import RequirementAuditor
+from .facets import PAGING_PARAMETERS, get_facets
+from .models import Course, ScheduleChangeError, Section, meeting_on, with_open_seats, within_time_window
+from .pagination import CursorPaginator, InvalidCursor
+from .planner import DEFAULT_CREDIT_CAP, get_degree_plan
+from .prereqs import get_prerequisite_graph
+from .scheduler import ScheduleGenerator
+from .search import get_search_backend
+
+# The search parameters of the days that can be searched for, by day number
+DAY_PARAMETERS = ['mon', 'tue', 'wed', 'thu', 'fri']
+# The parameters of the day facets, which keep the sections that meet on a day, whatever other days they meet on
+MEETS_ON_PARAMETERS = ['meets_' + key for key in DAY_PARAMETERS]
+# The order of search results with cursor pagination; the section id makes it unique
+CURSOR_ORDERING = ('course__department__abbr_name', 'course__course_number', 'pk')
 
 
 @method_decorator(login_required, name='dispatch')
@@ -14,16 +32,15 @@ class IndexView(View):
     template_name = 'student_assistance_system/index.html'
 
     def get_requirement_sets(self, p):
-        majors_and_concentrations = [[um.major, um.concentration] for um in p.usermajor_set.all()]
+        usermajors = p.usermajor_set.select_related('major', 'concentration')
+        majors_and_concentrations = [[um.major, um.concentration] for um in usermajors]
         filtered_sets = [reqs for pair in majors_and_concentrations for reqs in pair if reqs is not None]
         return filtered_sets + list(p.minors.all())
 
     def get(self, request, *args, **kwargs):
         p = request.user.profile
-        schedules = request.user.profile.schedule_set.all()
         req_sets = self.get_requirement_sets(p)
-        most_recently_updated_schedule = max(schedules, key=lambda s: s.updated) if schedules else None
-
+        most_recently_updated_schedule = recent_schedules(p).first()
         return render(request, self.template_name, dict(schedule=most_recently_updated_schedule, req_sets=req_sets))
 
 
@@ -42,16 +59,41 @@ class SearchResultsView(generic.ListView):
     context_object_name = "sections"
     paginate_by = 10
 
+    def filter_by_keywords(self, request, sections):
+        keywords = request.get('q')
+        if keywords:
+            return get_search_backend().ranked(sections, keywords)
+        return sections
+
     def filter_by_name(self, request, sections):
         name = request.get('name')
         if name:
-            return sections.filter(Q(course__name__icontains=name))
+            return get_search_backend().filter(sections, name, ['name'])
+        return sections
+
+    def remove_cross_listed_duplicates(self, sections):
+        # A cross-listed class is offered once under each of its courses; only the first of those sections is shown
+        return sections.extra(where=[
+            'NOT EXISTS (SELECT 1 FROM {section} other INNER JOIN {course} other_course ON other.course_id = other_course.id '
+            'WHERE other_course.canonical_id = (SELECT canonical_id FROM {course} WHERE id = {section}.course_id) '
+            'AND other.meeting_mask = {section}.meeting_mask AND other.professor = {section}.professor '
+            'AND other.id < {section}.id)'.format(section=Section._meta.db_table, course=Course._meta.db_table)])
+
+    def filter_by_eligibility(self, request, sections):
+        if request.get('eligible'):
+            completed = self.request.user.profile.completedcourse_set.values_list('course_id', flat=True)
+            # Only the courses of the other filters' results are checked, so that the ids bound to the query stay few
+            graph = get_prerequisite_graph()
+            candidates = [course_id for course_id in sections.order_by().values_list('course_id', flat=True).distinct()
+                          if course_id in graph.direct]
+            ineligible = set(candidates) - set(graph.eligible(candidates, completed))
+            return sections.exclude(course__in=ineligible) if ineligible else sections
         return sections
 
     def filter_by_professor(self, request, sections):
         professor = request.get('prof')
         if professor:
-            return sections.filter(Q(professor__icontains=professor))
+            return get_search_backend().filter(sections, professor, ['professor'])
         return sections
 
     def determine_course_number(self, course):
@@ -69,17 +111,14 @@ class SearchResultsView(generic.ListView):
         upper_course_letter = self.determine_course_letter(upper_number)
         lower_course_number = self.determine_course_number(lower_number)
         upper_course_number = self.determine_course_number(upper_number)
-        sections_in_range = []
-        for section in sections:
-                section_number = self.determine_course_number(section.course.course_number)
-                section_letter = self.determine_course_letter(section.course.course_number)
-                if lower_course_number < section_number < upper_course_number:
-                    sections_in_range.append(section)
-                elif lower_course_number == section_number and section_letter >= lower_course_letter:
-                    sections_in_range.append(section)
-                elif upper_course_number == section_number and section_letter <= upper_course_letter:
-                    sections_in_range.append(section)
-        return sections_in_range
+        # Courses without a letter are stored with an empty suffix, which sorts before every letter
+        lower_course_letter = '' if lower_course_letter == '0' else lower_course_letter
+        upper_course_letter = '' if upper_course_letter == '0' else upper_course_letter
+        if not sections.ordered:
+            sections = sections.order_by('pk')
+        return sections.filter(Q(course__number_int__gt=lower_course_number, course__number_int__lt=upper_course_number) |
+                               Q(course__number_int=lower_course_number, course__number_suffix__gte=lower_course_letter) |
+                               Q(course__number_int=upper_course_number, course__number_suffix__lte=upper_course_letter))
 
     def filter_by_course_number(self, request, sections):
         lower_course_number = request.get('num1')
@@ -102,48 +141,83 @@ class SearchResultsView(generic.ListView):
             return sections.filter(Q(course__credit_hours=credit_hours))
         return sections
 
-    def add_day_to_query(self, day_query, day):
-        if day_query:
-            day_query |= Q(meeting_times__day=day)
-        else:
-            day_query = Q(meeting_times__day=day)
-        return day_query
+    def filter_by_availability(self, request, sections):
+        if request.get('open'):
+            return with_open_seats(sections)
+        return sections
 
     def filter_by_meeting_times(self, request, sections):
-        start_time = request.get('stime')
-        end_time = request.get('etime')
-        day_query = Q()
-        if request.get('mon'): day_query = self.add_day_to_query(day_query, 0)
-        if request.get('tue'): day_query = self.add_day_to_query(day_query, 1)
-        if request.get('wed'): day_query = self.add_day_to_query(day_query, 2)
-        if request.get('thu'): day_query = self.add_day_to_query(day_query, 3)
-        if request.get('fri'): day_query = self.add_day_to_query(day_query, 4)
-        sections = sections.filter(day_query).distinct()
-        if start_time and end_time:
-            sections = sections.filter(Q(meeting_times__start_time__range=(start_time, end_time)))
-            return sections.filter(Q(meeting_times__end_time__range=(start_time, end_time)))
-        elif start_time:
-            return sections.filter(Q(meeting_times__start_time=start_time))
-        elif end_time:
-            return sections.filter(Q(meeting_times__end_time=end_time))
-        else:
-            return sections
-
-    def get_context_data(self, **kwargs):
-        context = super(SearchResultsView, self).get_context_data(**kwargs)
-        context['schedules'] = self.request.user.profile.schedule_set.all()
-        return context
+        days = [day for day, key in enumerate(DAY_PARAMETERS) if request.get(key)]
+        sections = within_time_window(sections, days, request.get('stime'), request.get('etime'))
+        return meeting_on(sections, [day for day, key in enumerate(MEETS_ON_PARAMETERS) if request.get(key)])
 
     def get_queryset(self):
         get_req = self.request.GET
-        sections = Section.objects.all()
+        sections = self.remove_cross_listed_duplicates(Section.objects.all())
+        sections = self.filter_by_keywords(get_req, sections)
         sections = self.filter_by_professor(get_req, sections)
         sections = self.filter_by_name(get_req, sections)
         sections = self.filter_by_department(get_req, sections)
         sections = self.filter_by_credits(get_req, sections)
         sections = self.filter_by_meeting_times(get_req, sections)
         sections = self.filter_by_course_number(get_req, sections)
-        return sections
+        sections = self.filter_by_availability(get_req, sections)
+        sections = self.filter_by_eligibility(get_req, sections)
+        return sections.select_related('course__department').prefetch_related('meeting_times')
+
+    def search_url(self, key, value):
+        """
+        :return: The URL of the first page of the current search with a parameter changed, or of another page
+        when the parameter is the cursor
+        """
+        params = self.request.GET.copy()
+        for paging_parameter in PAGING_PARAMETERS:
+            params.pop(paging_parameter, None)
+        if 'cursor' in self.request.GET:
+            params['cursor'] = ''
+        params[key] = value
+        return '?' + params.urlencode()
+
+    def paginate_queryset(self, queryset, page_size):
+        # Cursor pagination is opted into with a cursor parameter, which is left empty for the first page
+        cursor = self.request.GET.get('cursor')
+        if cursor is None:
+            return super(SearchResultsView, self).paginate_queryset(queryset, page_size)
+        try:
+            page = CursorPaginator(queryset, CURSOR_ORDERING, page_size).page(cursor)
+        except InvalidCursor as e:
+            raise Http404(e)
+        return None, page, page.object_list, page.has_other_pages()
+
+    def facet_links(self, facets):
+        """
+        :return: A list of (title, [(label, count, url)]) pairs, one for every facet of the search results
+        """
+        days = [(day, count) for day, count in facets['day'] if day < len(DAY_PARAMETERS)]
+        return [('Department', [(abbr, count, self.search_url('dep', abbr)) for abbr, count in facets['department']]),
+                ('Credit hours', [(credits, count, self.search_url('credits', credits))
+                                  for credits, count in facets['credits']]),
+                ('Days', [(calendar.day_abbr[day], count, self.search_url(MEETS_ON_PARAMETERS[day], 'on'))
+                          for day, count in days]),
+                ('Taught by', [(professor, count, self.search_url('prof', professor))
+                               for professor, count in facets['professor']])]
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchResultsView, self).get_context_data(**kwargs)
+        facets = get_facets(self.object_list, self.request.GET,
+                            self.request.user.profile if self.request.GET.get('eligible') else None)
+        context['facets'] = self.facet_links(facets)
+        # The seats of the sections shown were read along with them, and agree with the open seats filter
+        for section in context['sections']:
+            section.open_seats = max(section.capacity - section.enrolled, 0)
+        if context['paginator'] is None:
+            page = context['page_obj']
+            context['next_url'] = page.has_next() and self.search_url('cursor', page.next_cursor)
+            context['previous_url'] = page.has_previous() and self.search_url('cursor', page.previous_cursor)
+            # Every section has one credit-hour value, so the cached facet counts add up to the number of results
+            # without counting them again for every page
+            context['result_count'] = sum(count for credits, count in facets['credits'])
+        return context
 
 
 @method_decorator(login_required, name='dispatch')
@@ -183,6 +257,74 @@ class ViewScheduleView(IndexView):
         return render(request, self.template_name, dict(schedule=schedule, req_sets=req_sets, editing=self.kwargs['editing']))
 
 
+@method_decorator(login_required, name='dispatch')
+class GenerateScheduleView(IndexView):
+    template_name = 'student_assistance_system/generate_schedule.html'
+
+    def find_courses(self, course_names):
+        """
+        Looks up courses written as department abbreviation and course number, e.g. 'EECS 393, MATH 121'
+        :return: A (courses, names that were not found) pair
+        """
+        keys = []
+        for name in course_names.split(','):
+            parts = name.upper().split()
+            if len(parts) == 2:
+                keys.append((parts[0], parts[1]))
+        query = Q(pk__in=[])
+        for department, number in keys:
+            query |= Q(department__abbr_name=department, course_number=number)
+        courses = dict(((c.department.abbr_name, c.course_number), c) for c in Course.objects.filter(query).select_related('department'))
+        missing = [name.strip() for name in course_names.split(',') if name.strip() and tuple(name.upper().split()) not in courses]
+        return [courses[key] for key in keys if key in courses], missing
+
+    def get(self, request, *args, **kwargs):
+        p = request.user.profile
+        course_names = request.GET.get('courses', '')
+        courses, missing = self.find_courses(course_names)
+        if request.GET.get('requirements'):
+            audit = RequirementAuditor(p, None).cached_audit(self.get_requirement_sets(p))
+            generator = ScheduleGenerator.for_requirements(audit)
+        elif courses:
+            generator = ScheduleGenerator.for_courses(courses)
+        else:
+            generator = None
+        results = generator.generate() if generator else None
+        if results:
+            prefetch_related_objects([section for result in results for section in result.sections], 'meeting_times')
+        return render(request, self.template_name, dict(courses=course_names, missing=missing, generator=generator, results=results))
+
+    def post(self, request, *args, **kwargs):
+        p = request.user.profile
+        context = dict(courses='', missing=[], generator=None, results=None)
+        try:
+            section_ids = [int(pk) for pk in request.POST.getlist('section')]
+        except ValueError:
+            return render(request, self.template_name, dict(context, error='Invalid section ids'), status=400)
+        try:
+            with transaction.atomic():
+                schedule = p.schedule_set.create(name=request.POST.get('name') or 'Generated Schedule')
+                # Sections may have filled up or changed since the schedule was generated
+                schedule.change_sections(section_ids)
+        except ScheduleChangeError as e:
+            return render(request, self.template_name, dict(context, error='%s' % e), status=409)
+        return HttpResponseRedirect(reverse('student_assistance_system:edit_schedule', args=(), kwargs={'schedule_id': schedule.id}))
+
+
+@method_decorator(login_required, name='dispatch')
+class DegreePlanView(IndexView):
+    template_name = 'student_assistance_system/degree_plan.html'
+
+    def get(self, request, *args, **kwargs):
+        p = request.user.profile
+        try:
+            credit_cap = min(max(int(request.GET.get('hours', DEFAULT_CREDIT_CAP)), 1), 30)
+        except ValueError:
+            credit_cap = DEFAULT_CREDIT_CAP
+        plan = get_degree_plan(p, self.get_requirement_sets(p), credit_cap)
+        return render(request, self.template_name, dict(plan=plan, hours=credit_cap))
+
+
 @method_decorator(login_required, name='dispatch')
 class RemoveSectionScheduleView(IndexView):
     template_name = 'student_assistance_system/view_schedule.html'
@@ -232,9 +374,17 @@ class ProfileView(View):
         return render(request, self.template_name)
 
 
+def recent_schedules(profile):
+    """
+    The user's schedules, most recently updated first, ordered by the (user, updated) index
+    """
+    return profile.schedule_set.order_by('-updated')
+
+
 def schedules_context_processor(request):
     u = request.user
     if u.is_anonymous():
         return dict()
     else:
-        return dict(schedules=sorted(u.profile.schedule_set.all(), lambda x, y: -cmp(x.updated, y.updated)))
+        # Only loaded when a template uses the schedules
+        return dict(schedules=SimpleLazyObject(lambda: list(recent_schedules(u.profile).only('id', 'name', 'updated', 'user'))))